@@ -1,38 +1,107 @@
 """Code to monitor temperature, display it on an LED, then control a fan"""
 
+import asyncio
 import board
 import countio
 import digitalio
+import os
+import pulseio
 import pwmio
-import time
 
 # from microcontroller import watchdog as w
 # from watchdog import WatchDogMode
 
 import adafruit_pct2075  # Temperature sensor
 from adafruit_ht16k33 import segments  # LED
-from sampler import sampler
+from animation import alternate, animator
+from autotune import STATE_RUNNING, load_gains, relay_autotune, save_gains
+from fan_control import fan_pid, pid_fan_control, simple_fan_control
+from fan_curve import load_curve
+from filters import hampel_filter
+from sample_store import sample_store
+from sampler import column_sampler
+from scheduler import periodic_task, run_tasks
+from slew import slew_limiter
+from tach import edge_tach, pulsein_source
 
 # This code is written for an Adafruit KB2040
 
 # NUM_TEMP_SAMPLES: the number of temperature samples to keep. Should be
 # an even number.
-NUM_TEMP_SAMPLES = 10
+NUM_TEMP_SAMPLES = 30
 
 # NUM_FAN_SAMPLES: the number of samples of the fan counter to keep.
 NUM_FAN_SAMPLES = 3
 
-# SAMPLE_LEN_SECONDS: # of seconds to delay before collecting a fan/temperature sample.
-# Must be < WATCHDOG_TIMEOUT_SECS
-SAMPLE_LEN_SECONDS = 3
-
-# HYSTERESIS_SECONDS: # of seconds to wait before making a change to the fan output
-HYSTERESIS_SECONDS = 60
+# Each job in the main loop runs as its own asyncio task on its own cadence.
+# None of them may block for longer than WATCHDOG_TIMEOUT_SECS.
+
+# TACH_WINDOW_SECONDS: # of seconds to count fan pulses over for each RPM
+# reading. Longer windows give finer RPM resolution.
+TACH_WINDOW_SECONDS = 3
+
+# TACH_MODE: how to measure the fan speed.
+# "count": count tach pulses over TACH_WINDOW_SECONDS with countio.
+# "period": time the last few tach pulses with pulseio, updating every
+# TACH_POLL_SECONDS with much finer resolution. Speeds too slow to time
+# within TACH_WINDOW_SECONDS are counted instead. pulseio does not enable
+# the pin's pull up, so this needs an external pull up on the tach wire.
+TACH_MODE = "count"
+
+# TACH_POLL_SECONDS: # of seconds between RPM updates in "period" mode. The
+# fan makes under 60 pulses a second, so TACH_PULSEIN_MAXLEN must hold more
+# than 2 * 60 * TACH_POLL_SECONDS pulse durations.
+TACH_POLL_SECONDS = 0.5
+TACH_PULSEIN_MAXLEN = 128
+
+# TEMP_READ_SECONDS: # of seconds between reads of the temperature sensor
+TEMP_READ_SECONDS = 0.5
+
+# CONTROL_SECONDS: # of seconds between temperature samples and fan control
+# updates.
+CONTROL_SECONDS = 1
+
+# DISPLAY_SECONDS: # of seconds to show each of temperature, RPM and fan duty
+DISPLAY_SECONDS = 3
+
+# TELEMETRY_SECONDS: # of seconds between DATA lines on the serial port
+TELEMETRY_SECONDS = 3
+
+# TASK_REPORT_SECONDS: # of seconds between reports of task deadline overruns
+TASK_REPORT_SECONDS = 300
+
+# The fan output changes on every control update, but by at most
+# DUTY_UP_PER_SECOND or DUTY_DOWN_PER_SECOND (fractions of full speed per
+# second), so the fan responds to a hot spike in seconds and slows down
+# gently. Changes smaller than DUTY_DEAD_BAND are ignored so the fan does not
+# hunt between nearly equal speeds. Keep it small: while the fan ignores a
+# change, the PID integral keeps winding toward it.
+DUTY_UP_PER_SECOND = 0.1
+DUTY_DOWN_PER_SECOND = 0.01
+DUTY_DEAD_BAND = 0.01
+# Once the fan starts it runs for at least FAN_MIN_ON_SECONDS, and once it
+# stops it stays off for at least FAN_MIN_OFF_SECONDS, so the fan does not
+# start and stop every minute near the set point. A fan output of
+# FAN_RESTART_OUTPUT or more, as on a hot spike, restarts it at once.
+FAN_MIN_ON_SECONDS = 180
+FAN_MIN_OFF_SECONDS = 120
+FAN_RESTART_OUTPUT = 0.3
 
 # SET_POINT_DEGREES_C: Input to the PID algorithm
 SET_POINT_DEGREES_C = 30
 # SET_POINT_DEGREES_C = 10  # A low set point to test the fan
 
+# TEMP_SAMPLES_PATH: file to save the temperature history to so a reset
+# does not restart the PID integral from zero: each sample records the
+# integral, and the last one seeds the controller at boot. Saving needs the
+# filesystem to be writable from code (storage.remount("/", readonly=False)
+# in boot.py), otherwise an error is printed and the history is not saved.
+# Relative to the current directory, which is / on the board.
+TEMP_SAMPLES_PATH = "temp_samples.bin"
+
+# SAVE_SAMPLES_SECONDS: # of seconds between saves of the temperature history
+SAVE_SAMPLES_SECONDS = 60
+
 # WATCHDOG_TIMEOUT_SECS: The number of seconds to check to see if the controller is hung
 WATCHDOG_TIMEOUT_SECS = 5
 
@@ -43,8 +112,31 @@ Kp = 0.8 * 0.0666
 
 # .0666 / 100000 seems to scale down to between .1 and 1
 # .2 is intended to account for rougly 20% of calculation of speed.
+# Ki is in output per degree per ms of error, as is the auto-tuned Ki.
 Ki = (0.2 * 0.0666) / 100000
 
+# FAN_CURVES_PATH: JSON file of named fan curves, and FEED_FORWARD_CURVE the
+# name of the one to use as feed-forward for the PID control: its output at
+# the current temperature is added to the PID output, so the PID only has to
+# correct what the curve gets wrong. FAN_CURVE = "30:0,35:0.3,45:1" (and
+# optionally FAN_CURVE_HYSTERESIS = "1.0") in settings.toml takes precedence.
+# With neither, there is no feed-forward.
+FAN_CURVES_PATH = "fan_curves.json"
+FEED_FORWARD_CURVE = "feed_forward"
+
+# PID_GAINS_PATH: file with the Kp and Ki found by the relay auto-tune. When
+# it exists, its gains replace Kp and Ki above. Delete it to tune again.
+PID_GAINS_PATH = "pid_gains.json"
+
+# AUTOTUNE: run the relay auto-tune at boot if no gains are saved yet. Set
+# FAN_AUTOTUNE = 1 in settings.toml to turn it on. The fan switches between
+# AUTOTUNE_LOW and AUTOTUNE_HIGH around SET_POINT_DEGREES_C until the
+# temperature has oscillated a few times, which takes some minutes, then
+# the gains are saved and PID control takes over.
+AUTOTUNE = os.getenv("FAN_AUTOTUNE", 0) in (1, "1")
+AUTOTUNE_HIGH = 1.0
+AUTOTUNE_LOW = 0.0
+
 # Wiring
 # LED and temperature sensor is on the Stemma I2C port
 # The fan PWM and speed pins are connected to D8 and D9
@@ -59,7 +151,16 @@ Ki = (0.2 * 0.0666) / 100000
 # 12V pin 2
 # The green wire on my fan (pin 3) senses a rotation of the fan
 # The blue wire on my fan (pin4) is PWM control
-speed_pin = countio.Counter(board.D9, edge=countio.Edge.RISE, pull=digitalio.Pull.UP)
+if TACH_MODE == "period":
+    speed_pulses = pulseio.PulseIn(
+        board.D9, maxlen=TACH_PULSEIN_MAXLEN, idle_state=True
+    )
+    fan_tach = edge_tach(window_s=TACH_WINDOW_SECONDS)
+    tach_source = pulsein_source(speed_pulses, fan_tach, TACH_PULSEIN_MAXLEN)
+else:
+    speed_pin = countio.Counter(
+        board.D9, edge=countio.Edge.RISE, pull=digitalio.Pull.UP
+    )
 
 # I assume the blue wire is PWM control
 # pwm_pin = digitalio.DigitalInOut(board.D9)
@@ -73,76 +174,6 @@ fan_pwm = pwmio.PWMOut(board.D7, frequency=1000)
 # freq=1000, duty_cycle 4000/8% fan spins very slowly
 
 
-def pid_fan_control(temperature, temp_samples):
-    """Try to compute a percent on using a PID algorithm
-    samples is a dictionary of {"ms":elapsed_ms, "temp":temperature, "error":error}
-    """
-    percent_on_pid = 0
-
-    error = temperature - SET_POINT_DEGREES_C
-    print("  >>>PID: Current temp=%f error=%f" % (temperature, error))
-
-    # Compute the proportional output
-    output_p = Kp * error
-
-    accumulated_error = sum(temp_samples.by_key("error"))
-
-    # Compute average sample time from history
-    # Technically this skips the last sample, but
-    # I think that's ok as we are just using it for the integral part.
-    ms_list = temp_samples.by_key("elapsed_ms")
-    if len(ms_list) > 0:
-        elapsed_ms = sum(temp_samples.by_key("elapsed_ms"))
-        average_sample_time_ms = elapsed_ms / len(ms_list)
-        # Compute the integral output
-        output_i = Ki * accumulated_error * average_sample_time_ms
-    else:
-        output_i = 0
-
-    # Clamp the influence of output_i to 20% of total
-    if output_i > 0.2:
-        output_i = 0.2
-    elif output_i < -0.2:
-        output_i = 0.2
-    percent_on_pid = output_p + output_i
-    print(
-        "  >>>PID: Proportional Output: %f  Integral Output: %f Total Output: %f"
-        % (output_p, output_i, percent_on_pid)
-    )
-
-    # Limit the output to between .1 and 1
-    if percent_on_pid < 0.1:
-        return 0
-    elif percent_on_pid > 1:
-        return 1
-    return percent_on_pid
-
-
-def simple_fan_control(temperature):
-    """Very naive algorithm to keep the CPU cool.
-
-    Defines a ttep function based on current temperature.
-
-    This works, but the fan turns on for a minute,
-    then off for a minute. It's distracting. I wish the
-    fan would just run slowly at a more or less constant speed.
-    """
-    percent_on = 0
-
-    # Control the fan in terms of percent of full speed
-    if temperature < 32:
-        percent_on = 0
-    elif temperature < 35:
-        percent_on = 0.1
-    elif temperature < 38:
-        percent_on = 0.25
-    elif temperature < 41:
-        percent_on = 0.75
-    else:
-        percent_on = 1
-    return percent_on
-
-
 # Turn on the hardware watchdog. This restarts the microcontroller if the code hangs.
 # w.timeout = WATCHDOG_TIMEOUT_SECS
 # w.mode = WatchDogMode.RESET
@@ -159,33 +190,99 @@ display.fill(0)
 # Init the temperature sensor
 pct = adafruit_pct2075.PCT2075(i2c)
 
-speed_pin.reset()
+# fan_duty is the duty cycle applied to the fan over the sample, after the
+# slew limiter or during the relay auto-tune, for fitting the thermal model.
+# pid_integral is the integral term of the PID controller after the sample.
+temp_samples = column_sampler(
+    NUM_TEMP_SAMPLES,
+    (
+        "temp",
+        "error",
+        "fan_output_simple",
+        "fan_output_pid",
+        "fan_duty",
+        "pid_integral",
+    ),
+)
+fan_speed_samples = column_sampler(NUM_FAN_SAMPLES, (), ("fan_count",))
+
+temp_store = sample_store(temp_samples, TEMP_SAMPLES_PATH, SAVE_SAMPLES_SECONDS)
+pid_integral = 0.0
+if temp_store.load():
+    print("Restored %d temperature samples" % temp_samples.count("temp"))
+    pid_integral = temp_samples.last()["pid_integral"]
+
+saved_gains = load_gains(PID_GAINS_PATH)
+if saved_gains:
+    Kp = saved_gains["kp"]
+    Ki = saved_gains["ki"]
+    print("Loaded PID gains Kp=%f Ki=%g from %s" % (Kp, Ki, PID_GAINS_PATH))
+
+# Carry on from the integral before the reset, if the samples were restored
+temp_pid = fan_pid(SET_POINT_DEGREES_C, Kp, Ki, pid_integral)
+
+try:
+    feed_forward_curve = load_curve(FAN_CURVES_PATH, FEED_FORWARD_CURVE)
+except ValueError as e:
+    print("Ignoring fan curves: %s" % e)
+    feed_forward_curve = None
+
+autotune = None
+if AUTOTUNE and saved_gains is None:
+    autotune = relay_autotune(SET_POINT_DEGREES_C, AUTOTUNE_HIGH, AUTOTUNE_LOW)
+    print("AUTOTUNE: starting the relay experiment")
+
+# Replace single bad temperature reads with the recent median before they
+# reach the fan control. The sensor resolution is 0.125 C, so changes of up
+# to 0.5 C always pass through.
+temperature_filter = hampel_filter(5, min_deviation=0.5)
+
+fan_output_stage = slew_limiter(
+    DUTY_UP_PER_SECOND,
+    DUTY_DOWN_PER_SECOND,
+    DUTY_DEAD_BAND,
+    min_on_s=FAN_MIN_ON_SECONDS,
+    min_off_s=FAN_MIN_OFF_SECONDS,
+    restart_above=FAN_RESTART_OUTPUT,
+)
+
+# Latest readings, shared between the tasks below
+temperature = None
+rpm = 0
+
+
+def count_fan():
+    """Task: convert the fan pulses counted since the last call to RPM"""
+    global rpm
+    if TACH_MODE == "period":
+        fan_speed_samples.record({"fan_count": tach_source.poll()})
+        rpm = fan_tach.rpm()
+        return
+    count = speed_pin.count
+    speed_pin.reset()
+    fan_speed_samples.record({"fan_count": count})
+    # The fan counts 2x per rotation, so instead of multiplying
+    # by 60 for 60 seconds, multiply by 30. Use the measured window rather
+    # than TACH_WINDOW_SECONDS in case the task ran late.
+    elapsed_ms = fan_speed_samples.last()["elapsed_ms"]
+    if elapsed_ms > 0:
+        rpm = count * 30000 / elapsed_ms
+    # print("Raw speed_pin count is %d or %d RPM" % (count, rpm))
 
-temp_samples = sampler(NUM_TEMP_SAMPLES)
-fan_speed_samples = sampler(3)
 
-last_fan_change_time = 0
+def read_temperature():
+    """Task: read the sensor through the spike filter"""
+    global temperature
+    temperature = temperature_filter.update(pct.temperature)
 
 
-loop_count = 0
-while True:
+def update_control():
+    """Task: record a temperature sample and update the fan output"""
     # Pet the nice watchdog.
     # w.feed()
 
-    loop_count = loop_count + 1
-
-    fan_speed_samples.start()
-    speed_pin.reset()
-    time.sleep(SAMPLE_LEN_SECONDS)
-    count = speed_pin.count
-    fan_speed_samples.record({"fan_count": count})
-
-    temperature = pct.temperature
-
-    # The fan counts 2x per rotation, so instead of multiplying
-    # by 60 for 60 seconds, multiply by 30
-    rpm = count * (30 / SAMPLE_LEN_SECONDS)
-    # print("Raw speed_pin count is %d or %d RPM" % (count, rpm))
+    if temperature is None:
+        return
 
     # Compute and save the error (temp off from desired temperature)
     # for this sample for PID control
@@ -193,7 +290,10 @@ while True:
 
     # Compute the output fan speed two different ways
     fan_output_simple = simple_fan_control(temperature)
-    fan_output_pid = pid_fan_control(temperature, temp_samples)
+    feed_forward = 0
+    if feed_forward_curve is not None:
+        feed_forward = feed_forward_curve.update(temperature)
+    fan_output_pid = pid_fan_control(temperature, temp_pid, feed_forward)
 
     # Store away the samples to average over time
     temp_samples.record(
@@ -202,23 +302,127 @@ while True:
             "error": error,
             "fan_output_simple": fan_output_simple,
             "fan_output_pid": fan_output_pid,
+            "fan_duty": fan_pwm.duty_cycle / 65535,
+            "pid_integral": temp_pid.integral,
         }
     )
 
-    print("DATA: ", temp_samples.last())
+    if autotune is not None:
+        run_autotune()
+        return
+
+    # Use PID to attempt to control the fan
+    output = fan_output_stage.update(fan_output_pid)
+    duty_cycle = max(0, min(round(65536 * output), 65535))
+    if duty_cycle != fan_pwm.duty_cycle:
+        print("Setting fan speed to %.2f" % output)
+        fan_pwm.duty_cycle = duty_cycle
+
+
+def run_autotune():
+    """Step the relay experiment, then switch to the gains it found"""
+    global autotune, temp_pid, Kp, Ki
+    output = autotune.update(temperature)
+    fan_pwm.duty_cycle = max(0, min(round(65536 * output), 65535))
+    if autotune.state == STATE_RUNNING:
+        return
+    # Slew from where the relay left the fan
+    fan_output_stage.reset(output)
+    gains = autotune.gains()
+    if gains:
+        Kp = gains["kp"]
+        Ki = gains["ki"]
+        temp_pid = fan_pid(SET_POINT_DEGREES_C, Kp, Ki)
+        print(
+            "AUTOTUNE: Ku=%f Pu=%.1f s, Kp=%f Ki=%g"
+            % (gains["ku"], gains["pu_s"], Kp, Ki)
+        )
+        save_gains(PID_GAINS_PATH, gains)
+    else:
+        print("AUTOTUNE: no oscillation, keeping Kp=%f Ki=%g" % (Kp, Ki))
+    autotune = None
+
+
+# Segments of the units shown after the readings, computed once
+CELSIUS_SEGMENTS = display.segments_for(" C")
+DUTY_SEGMENTS = display.segments_for("d")
+
+
+def show_number(value, suffix=b""):
+    """Show a reading, dropping the suffix or showing ---- if it does not fit
+
+    A failed write to the display is printed rather than raised, which
+    would stop the display animation until the next reset.
+    """
+    try:
+        try:
+            display.print_fixed(value, 0, suffix)
+        except ValueError:
+            try:
+                display.print_fixed(value)
+            except ValueError:
+                display.print_text("----")
+    except OSError as e:
+        # A glitch on the I2C bus. The next reading redraws the display.
+        print("Could not update the display: %s" % e)
+
+
+def show_temperature():
+    if temperature is not None:
+        show_number(temperature, CELSIUS_SEGMENTS)
+
+
+def show_rpm():
+    show_number(rpm)
+
 
-    # Alternate display between temp and RPM.
+def show_duty():
+    # Percent of full speed, marked with a "d"
+    show_number(100 * fan_pwm.duty_cycle / 65535, DUTY_SEGMENTS)
+
+
+# The display rotates between the readings on its own asyncio task
+display_animation = animator()
+display_animation.start(
+    alternate((show_temperature, show_rpm, show_duty), DISPLAY_SECONDS)
+)
+
+
+def send_telemetry():
+    """Task: print the last sample to the serial port and save the history"""
+    if temperature is None:
+        return
+    print("DATA: ", temp_samples.last())
     print("Temperature: %.2f C RPM: %d" % (temperature, rpm))
-    if loop_count % 2 == 0:
-        display.fill(0)
-        display.print("%d" % rpm)
-    else:
-        display.fill(0)
-        display.print("%.0f C" % temperature)
-
-    # This is quite lame control, but it keeps my cpu cool.
-    if time.time() - last_fan_change_time > HYSTERESIS_SECONDS:
-        # Use PID to attempt to control the fan
-        print("Setting fan speed to %.0f" % (fan_output_pid))
-        fan_pwm.duty_cycle = max(0, min(round(65536 * fan_output_pid), 65535))
-        last_fan_change_time = time.time()
+    temp_store.update()
+
+
+def report_tasks():
+    """Task: print the deadline accounting of every task"""
+    for task in tasks:
+        print("TASK: " + task.report())
+
+
+tasks = [
+    periodic_task(
+        "tach",
+        TACH_POLL_SECONDS if TACH_MODE == "period" else TACH_WINDOW_SECONDS,
+        count_fan,
+    ),
+    periodic_task("temperature", TEMP_READ_SECONDS, read_temperature),
+    periodic_task("control", CONTROL_SECONDS, update_control),
+    periodic_task("telemetry", TELEMETRY_SECONDS, send_telemetry),
+    periodic_task("report", TASK_REPORT_SECONDS, report_tasks),
+]
+
+
+async def main():
+    """Run the periodic tasks and the display animation together"""
+    await asyncio.gather(run_tasks(tasks), display_animation.run())
+
+
+# Start the first tach window
+fan_speed_samples.start()
+if TACH_MODE != "period":
+    speed_pin.reset()
+asyncio.run(main())
@@ -0,0 +1,57 @@
+"""Fit a thermal model to logged DATA lines and suggest Kp and Ki
+
+Streams the logs written by log_data_from_serial.py, fits a first order
+plus dead time model of the temperature response to the fan output (see
+host/sysid.py, needs NumPy) and prints PI gains for code.py.
+
+Log a step test for the best fit: hold the load steady and change the fan
+duty cycle by hand. The fit uses the duty cycle actually applied to the fan
+(fan_duty in the DATA lines), not the PID output.
+
+Usage:
+python fit_thermal_model.py monday.log [tuesday.log ...] [--interval 3]
+    [--output-key fan_duty] [--max-delay 60] [--rule simc]
+    [--closed-loop-time 30]
+"""
+
+import argparse
+import os
+import sys
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+for _path in (os.path.join(ROOT_DIR, "lib"), os.path.join(ROOT_DIR, "host")):
+    if _path not in sys.path:
+        sys.path.insert(0, _path)
+
+# pylint: disable=wrong-import-position
+import closed_loop
+import sysid
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("logs", nargs="+")
+    parser.add_argument(
+        "--interval", type=float, default=3, help="seconds between DATA lines"
+    )
+    parser.add_argument("--output-key", default=sysid.DUTY_KEY)
+    parser.add_argument("--max-delay", type=float, default=60, help="seconds")
+    parser.add_argument("--rule", choices=("simc", "ziegler_nichols"), default="simc")
+    parser.add_argument("--closed-loop-time", type=float, help="SIMC tau_c, seconds")
+    args = parser.parse_args()
+
+    try:
+        model = sysid.fit_log(args.logs, args.interval, args.output_key, args.max_delay)
+        gains = sysid.suggest_gains(model, args.rule, args.closed_loop_time)
+    except ValueError as e:
+        print("Could not fit the logs: %s" % e)
+        print("Log a step test of the fan output with a steady load.")
+        sys.exit(1)
+    print(model)
+    print("%s: Kc=%.4f Ti=%.0f s" % (args.rule, gains["kc"], gains["ti_s"]))
+    print("Kp = %.6g  # code.py now: %.6g" % (gains["kp"], closed_loop.KP))
+    print("Ki = %.6g  # code.py now: %.6g" % (gains["ki"], closed_loop.KI))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Search a grid of PID gains, hysteresis and set points for code.py
+
+Simulates every combination at once with host/batch.py (needs NumPy) and
+prints the best candidates by a metric.
+
+Each of --kp, --ki, --hysteresis and --set-point takes either a comma
+separated list of values or start:stop:count for evenly spaced values.
+
+Usage:
+python grid_search.py --kp 0.01:0.2:20 --ki 0:2e-6:20 --hysteresis 0,30,60
+    [--set-point 30] [--scenario step] [--metric toggles_per_hour]
+    [--max-temperature 40] [--top 10] [--csv results.csv]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+for _path in (os.path.join(ROOT_DIR, "lib"), os.path.join(ROOT_DIR, "host")):
+    if _path not in sys.path:
+        sys.path.insert(0, _path)
+
+# pylint: disable=wrong-import-position
+import numpy as np
+import batch
+import closed_loop
+from thermal import SCENARIOS
+
+
+def parse_values(text):
+    """Parse "a,b,c" or "start:stop:count" into a list of floats"""
+    if ":" in text:
+        start, stop, count = text.split(":")
+        return list(np.linspace(float(start), float(stop), int(count)))
+    return [float(value) for value in text.split(",")]
+
+
+def write_csv(result, path):
+    """Write the settings and metrics of every candidate as CSV"""
+    columns = ("kp", "ki", "hysteresis_s", "set_point") + batch.METRICS
+    with open(path, "w") as file:
+        file.write(",".join(columns) + "\n")
+        for i in range(len(result)):
+            row = result.row(i)
+            file.write(",".join("%.6g" % row[column] for column in columns) + "\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), default="step")
+    parser.add_argument("--kp", default=str(closed_loop.KP))
+    parser.add_argument("--ki", default=str(closed_loop.KI))
+    parser.add_argument("--hysteresis", default=str(closed_loop.HYSTERESIS_SECONDS))
+    parser.add_argument(
+        "--set-point", default=str(closed_loop.SET_POINT_DEGREES_C)
+    )
+    parser.add_argument("--hours", type=float, help="defaults to the scenario's")
+    parser.add_argument("--metric", choices=batch.METRICS, default="toggles_per_hour")
+    parser.add_argument(
+        "--max-temperature", type=float, help="only rank candidates cooler than this"
+    )
+    parser.add_argument(
+        "--settle-from", type=float, default=0, help="seconds, e.g. after a load step"
+    )
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--csv", help="file for the results of every candidate")
+    args = parser.parse_args()
+
+    settings = batch.grid(
+        parse_values(args.kp),
+        parse_values(args.ki),
+        parse_values(args.hysteresis),
+        parse_values(args.set_point),
+    )
+    start = time.perf_counter()
+    result = batch.simulate_batch(
+        SCENARIOS[args.scenario],
+        duration_s=None if args.hours is None else args.hours * 3600,
+        settle_from_s=args.settle_from,
+        **settings
+    )
+    print(
+        "Simulated %d candidates for %.1f h in %.1f s"
+        % (len(result), result.duration_s / 3600, time.perf_counter() - start)
+    )
+    where = None
+    if args.max_temperature is not None:
+        where = result.max_temperature_c < args.max_temperature
+    for i in result.best(args.metric, args.top, where):
+        row = result.row(i)
+        print(" ".join("%s=%.4g" % item for item in row.items()))
+    if args.csv:
+        write_csv(result, args.csv)
+
+
+if __name__ == "__main__":
+    main()
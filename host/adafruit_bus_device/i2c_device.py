@@ -0,0 +1,69 @@
+"""Host version of adafruit_bus_device.i2c_device
+
+The library in lib/ is only shipped as .mpy, which CPython cannot load.
+This follows the same interface. Like the native I2CDevice of CircuitPython,
+it keeps the bus and address to itself, so code that reaches for them fails
+here too instead of only on the board.
+"""
+
+
+class I2CDevice:
+    def __init__(self, i2c, device_address, probe=True):
+        self._i2c = i2c
+        self._device_address = device_address
+        if probe:
+            self.__probe_for_device()
+
+    def readinto(self, buf, *, start=0, end=None):
+        if end is None:
+            end = len(buf)
+        self._i2c.readfrom_into(self._device_address, buf, start=start, end=end)
+
+    def write(self, buf, *, start=0, end=None):
+        if end is None:
+            end = len(buf)
+        self._i2c.writeto(self._device_address, buf, start=start, end=end)
+
+    # pylint: disable-msg=too-many-arguments
+    def write_then_readinto(
+        self,
+        out_buffer,
+        in_buffer,
+        *,
+        out_start=0,
+        out_end=None,
+        in_start=0,
+        in_end=None
+    ):
+        if out_end is None:
+            out_end = len(out_buffer)
+        if in_end is None:
+            in_end = len(in_buffer)
+        self._i2c.writeto_then_readfrom(
+            self._device_address,
+            out_buffer,
+            in_buffer,
+            out_start=out_start,
+            out_end=out_end,
+            in_start=in_start,
+            in_end=in_end,
+        )
+
+    def __enter__(self):
+        while not self._i2c.try_lock():
+            pass
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._i2c.unlock()
+        return False
+
+    def __probe_for_device(self):
+        while not self._i2c.try_lock():
+            pass
+        try:
+            self._i2c.writeto(self._device_address, b"")
+        except OSError:
+            raise ValueError("No I2C device at address: 0x%x" % self._device_address)
+        finally:
+            self._i2c.unlock()
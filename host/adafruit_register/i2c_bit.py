@@ -0,0 +1,39 @@
+"""Host version of adafruit_register.i2c_bit
+
+The library in lib/ is only shipped as .mpy, which CPython cannot load.
+This follows the same interface.
+"""
+
+
+class RWBit:
+    """Single bit register that is readable and writeable."""
+
+    def __init__(self, register_address, bit, register_width=1, lsb_first=True):
+        self.bit_mask = 1 << (bit % 8)
+        self.buffer = bytearray(1 + register_width)
+        self.buffer[0] = register_address
+        if lsb_first:
+            self.byte = bit // 8 + 1
+        else:
+            self.byte = register_width - (bit // 8)
+
+    def __get__(self, obj, objtype=None):
+        with obj.i2c_device as i2c:
+            i2c.write_then_readinto(self.buffer, self.buffer, out_end=1, in_start=1)
+        return bool(self.buffer[self.byte] & self.bit_mask)
+
+    def __set__(self, obj, value):
+        with obj.i2c_device as i2c:
+            i2c.write_then_readinto(self.buffer, self.buffer, out_end=1, in_start=1)
+            if value:
+                self.buffer[self.byte] |= self.bit_mask
+            else:
+                self.buffer[self.byte] &= ~self.bit_mask
+            i2c.write(self.buffer)
+
+
+class ROBit(RWBit):
+    """Single bit register that is read-only."""
+
+    def __set__(self, obj, value):
+        raise AttributeError()
@@ -0,0 +1,65 @@
+"""Host version of adafruit_register.i2c_bits
+
+The library in lib/ is only shipped as .mpy, which CPython cannot load.
+This follows the same interface.
+"""
+
+
+class RWBits:
+    """Multibit register (less than a full byte) that is readable and writeable."""
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        num_bits,
+        register_address,
+        lowest_bit,
+        register_width=1,
+        lsb_first=True,
+        signed=False,
+    ):
+        self.bit_mask = ((1 << num_bits) - 1) << lowest_bit
+        if self.bit_mask >= 1 << (register_width * 8):
+            raise ValueError("Cannot have more bits than register size")
+        self.lowest_bit = lowest_bit
+        self.buffer = bytearray(1 + register_width)
+        self.buffer[0] = register_address
+        self.lsb_first = lsb_first
+        self.sign_bit = (1 << (num_bits - 1)) if signed else 0
+
+    def _read(self, obj):
+        with obj.i2c_device as i2c:
+            i2c.write_then_readinto(self.buffer, self.buffer, out_end=1, in_start=1)
+        reg = 0
+        order = range(len(self.buffer) - 1, 0, -1)
+        if not self.lsb_first:
+            order = reversed(order)
+        for i in order:
+            reg = (reg << 8) | self.buffer[i]
+        return reg
+
+    def __get__(self, obj, objtype=None):
+        reg = (self._read(obj) & self.bit_mask) >> self.lowest_bit
+        if reg & self.sign_bit:
+            reg -= 2 * self.sign_bit
+        return reg
+
+    def __set__(self, obj, value):
+        value <<= self.lowest_bit
+        reg = self._read(obj)
+        reg &= ~self.bit_mask
+        reg |= value & self.bit_mask
+        order = range(1, len(self.buffer))
+        if not self.lsb_first:
+            order = reversed(order)
+        for i in order:
+            self.buffer[i] = reg & 0xFF
+            reg >>= 8
+        with obj.i2c_device as i2c:
+            i2c.write(self.buffer)
+
+
+class ROBits(RWBits):
+    """Multibit register (less than a full byte) that is read-only."""
+
+    def __set__(self, obj, value):
+        raise AttributeError()
@@ -0,0 +1,324 @@
+"""Batch simulation of many fan control settings at once with NumPy
+
+simulate_batch() runs the same loop as closed_loop.simulate() with the
+"pid" controller and no feed-forward curve, for every candidate (kp, ki,
+hysteresis_s, set_point) in lock-step: each control period is one set of
+array operations across all candidates and their thermal plants, so tens
+of thousands of candidates share one pass over the scenario.
+
+The control step follows pid_fan_control and the PIDController from
+fan_pid() exactly:
+- the integral term grows by ki * 1000 * error * dt, with dt from the
+  virtual clock, and is clamped to +/-PID_INTEGRAL_LIMIT
+- the output is kp * error plus the integral, limited to 0 to 1. While the
+  output is limited, the integral keeps its old value if the new one would
+  push the output further past the limit (conditional integration)
+- outputs below PID_MIN_OUTPUT are 0 (the dead zone)
+- the target of the slew limiter only changes once more than
+  hysteresis_s has passed since the last change
+- the slew limiter moves toward the target by at most up_per_s or
+  down_per_s per second, ignoring changes smaller than dead_band unless
+  the target is 0 or 1, and holding the fan on for min_on_s after it
+  starts and off for min_off_s after it stops unless the target reaches
+  restart_above, like slew_limiter.update()
+- the duty cycle is round(65536 * output) clamped to 65535
+
+The reported metrics for each candidate are:
+settling_time_s: seconds from settle_from_s until the heatsink
+temperature last left set_point +/- settle_band_c. inf if it was outside
+the band at the end.
+overshoot_c: how far the temperature rose above the set point after
+settle_from_s, or 0.
+toggles_per_hour: fan starts plus stops per hour
+mean_duty: the mean duty cycle from 0 to 1
+max_temperature_c, mean_temperature_c: of the heatsink
+"""
+
+import numpy as np
+
+from closed_loop import (
+    CONTROL_SECONDS,
+    DUTY_DEAD_BAND,
+    DUTY_DOWN_PER_SECOND,
+    DUTY_UP_PER_SECOND,
+    FAN_MIN_OFF_SECONDS,
+    FAN_MIN_ON_SECONDS,
+    FAN_RESTART_OUTPUT,
+    HYSTERESIS_SECONDS,
+    KI,
+    KP,
+    SENSOR_RESOLUTION_C,
+    SET_POINT_DEGREES_C,
+)
+from fan_control import PID_INTEGRAL_LIMIT, PID_MIN_OUTPUT
+from thermal import thermal_plant
+from virtual_clock import virtual_clock
+
+METRICS = (
+    "settling_time_s",
+    "overshoot_c",
+    "toggles_per_hour",
+    "mean_duty",
+    "max_temperature_c",
+    "mean_temperature_c",
+)
+
+
+def grid(kp=(KP,), ki=(KI,), hysteresis_s=(HYSTERESIS_SECONDS,), set_point=(30,)):
+    """Return every combination of the settings as flat arrays
+
+    Returns:
+    a dictionary of "kp", "ki", "hysteresis_s" and "set_point" arrays,
+    ready to pass to simulate_batch(**grid(...)).
+    """
+    axes = np.meshgrid(
+        np.asarray(kp, dtype=float),
+        np.asarray(ki, dtype=float),
+        np.asarray(hysteresis_s, dtype=float),
+        np.asarray(set_point, dtype=float),
+        indexing="ij",
+    )
+    names = ("kp", "ki", "hysteresis_s", "set_point")
+    return {name: axis.ravel() for name, axis in zip(names, axes)}
+
+
+class batch_result:
+    """The settings and metrics of every candidate of a simulate_batch() run"""
+
+    def __init__(self, scenario_name, duration_s, settings, metrics):
+        self.scenario_name = scenario_name
+        self.duration_s = duration_s
+        self.kp = settings["kp"]
+        self.ki = settings["ki"]
+        self.hysteresis_s = settings["hysteresis_s"]
+        self.set_point = settings["set_point"]
+        for name in METRICS:
+            setattr(self, name, metrics[name])
+
+    def __len__(self):
+        return len(self.kp)
+
+    def row(self, i):
+        """Return the settings and metrics of candidate i as a dictionary"""
+        row = {
+            "kp": float(self.kp[i]),
+            "ki": float(self.ki[i]),
+            "hysteresis_s": float(self.hysteresis_s[i]),
+            "set_point": float(self.set_point[i]),
+        }
+        for name in METRICS:
+            row[name] = float(getattr(self, name)[i])
+        return row
+
+    def best(self, metric="mean_duty", count=10, where=None):
+        """Return the indexes of the candidates with the lowest metric
+
+        Args:
+        metric: one of METRICS
+        count: the number of indexes to return
+        where: optional boolean array of the candidates to consider
+
+        Returns:
+        a list of indexes, best first.
+        """
+        values = np.asarray(getattr(self, metric), dtype=float)
+        candidates = np.arange(len(values))
+        if where is not None:
+            candidates = candidates[np.asarray(where)]
+        order = np.argsort(values[candidates], kind="stable")
+        return [int(i) for i in candidates[order[:count]]]
+
+
+# pylint: disable=too-many-arguments,too-many-locals,too-many-statements
+def simulate_batch(
+    scenario,
+    kp=KP,
+    ki=KI,
+    hysteresis_s=HYSTERESIS_SECONDS,
+    set_point=SET_POINT_DEGREES_C,
+    control_s=CONTROL_SECONDS,
+    plant=None,
+    duration_s=None,
+    settle_band_c=1.0,
+    settle_from_s=0.0,
+    up_per_s=DUTY_UP_PER_SECOND,
+    down_per_s=DUTY_DOWN_PER_SECOND,
+    dead_band=DUTY_DEAD_BAND,
+    min_on_s=FAN_MIN_ON_SECONDS,
+    min_off_s=FAN_MIN_OFF_SECONDS,
+    restart_above=FAN_RESTART_OUTPUT,
+):
+    """Simulate pid_fan_control for many settings against one scenario
+
+    Args:
+    scenario: thermal.scenario giving the load and ambient temperature
+    kp, ki, hysteresis_s, set_point: scalars or arrays of the settings of
+    each candidate. They are broadcast to a common length.
+    control_s: the control period of code.py, shared by all candidates
+    plant: thermal_plant whose parameters and starting state every
+    candidate's plant copies. A new one at the starting ambient temperature
+    if None.
+    duration_s: virtual seconds to run. The scenario's duration if None.
+    settle_band_c, settle_from_s: how settling_time_s and overshoot_c are
+    measured, see the module docstring
+    up_per_s, down_per_s, dead_band, min_on_s, min_off_s, restart_above: the
+    slew limiter settings shared by all candidates, as in
+    closed_loop.simulate()
+
+    Returns:
+    a batch_result.
+    """
+    if plant is None:
+        plant = thermal_plant(temperature_c=scenario.ambient_c(0))
+    if duration_s is None:
+        duration_s = scenario.duration_s
+    kp, ki, hysteresis_s, set_point = (
+        np.array(a, dtype=float)
+        for a in np.broadcast_arrays(
+            np.atleast_1d(kp),
+            np.atleast_1d(ki),
+            np.atleast_1d(hysteresis_s),
+            np.atleast_1d(set_point),
+        )
+    )
+    settings = {
+        "kp": kp,
+        "ki": ki,
+        "hysteresis_s": hysteresis_s,
+        "set_point": set_point,
+    }
+    candidates = len(kp)
+    steps = int(duration_s / control_s)
+
+    # Plant state
+    temperature = np.full(candidates, float(plant.temperature))
+    rpm = np.full(candidates, float(plant.rpm))
+    passive_conductance = 1 / plant.passive_resistance_c_per_w
+
+    # Controller state
+    ki_per_s = ki * 1000
+    integral = np.zeros(candidates)
+    last_pid_ns = None
+    fan_target = np.zeros(candidates)
+    slewed = np.zeros(candidates)
+    last_slew_ns = None
+    switched_ns = np.full(candidates, np.nan)  # NaN until the first switch
+    min_on_ns = int(min_on_s * 1000000000)
+    min_off_ns = int(min_off_s * 1000000000)
+    duty = np.zeros(candidates)
+    last_change_s = np.full(candidates, -np.inf)
+    changed_once = np.zeros(candidates, dtype=bool)
+
+    # Metrics
+    temperature_sum = np.zeros(candidates)
+    duty_sum = np.zeros(candidates)
+    max_temperature = temperature.copy()
+    toggles = np.zeros(candidates)
+    overshoot = np.zeros(candidates)
+    last_outside_s = np.full(candidates, settle_from_s - control_s)
+
+    clock = virtual_clock()
+    clock.install()
+    try:
+        for step in range(steps):
+            now_s = step * control_s
+            sensed = np.round(temperature / SENSOR_RESOLUTION_C) * SENSOR_RESOLUTION_C
+            error = sensed - set_point
+
+            # pid_fan_control and PIDController.update()
+            now_ns = clock.monotonic_ns()
+            dt = 0.0 if last_pid_ns is None else (now_ns - last_pid_ns) / 1000000000
+            last_pid_ns = now_ns
+            proportional = kp * error
+            previous = integral
+            integral = np.clip(
+                integral + ki_per_s * error * dt,
+                -PID_INTEGRAL_LIMIT,
+                PID_INTEGRAL_LIMIT,
+            )
+            unclamped = proportional + integral
+            output = np.clip(unclamped, 0.0, 1.0)
+            limited = output != unclamped
+            integral = np.where(
+                limited & ((unclamped > output) == (integral > previous)),
+                previous,
+                integral,
+            )
+            output = np.where(output < PID_MIN_OUTPUT, 0.0, output)
+
+            # Hysteresis on the target of the fan output
+            may_change = ~changed_once | (now_s - last_change_s > hysteresis_s)
+            fan_target = np.where(may_change, output, fan_target)
+            last_change_s = np.where(may_change, now_s, last_change_s)
+            changed_once |= may_change
+
+            # slew_limiter.update()
+            dt = 0.0 if last_slew_ns is None else (now_ns - last_slew_ns) / 1000000000
+            last_slew_ns = now_ns
+            delta = fan_target - slewed
+            hold = (np.abs(delta) < dead_band) & (fan_target != 0) & (fan_target != 1)
+            held_ns = now_ns - switched_ns
+            stopped = slewed == 0
+            hold |= stopped & (held_ns < min_off_ns) & (fan_target < restart_above)
+            hold |= ~stopped & (delta < 0) & (held_ns < min_on_ns)
+            if up_per_s is not None:
+                delta = np.minimum(delta, up_per_s * dt)
+            if down_per_s is not None:
+                delta = np.maximum(delta, -down_per_s * dt)
+            new_slewed = np.where(hold, slewed, slewed + delta)
+            switched_ns = np.where(
+                (new_slewed > 0) != (slewed > 0), now_ns, switched_ns
+            )
+            slewed = new_slewed
+
+            new_duty = np.clip(np.round(65536 * slewed), 0, 65535) / 65535
+            toggles += (new_duty > 0) != (duty > 0)
+            duty = new_duty
+
+            # thermal_plant.step()
+            load_w = scenario.load_w(now_s)
+            ambient_c = scenario.ambient_c(now_s)
+            target_rpm = np.where(
+                duty < plant.min_duty, 0.0, plant.max_rpm * np.minimum(duty, 1.0)
+            )
+            if plant.fan_time_constant_s > 0:
+                rpm += (target_rpm - rpm) * (
+                    1 - np.exp(-control_s / plant.fan_time_constant_s)
+                )
+            else:
+                rpm = target_rpm
+            forced = np.where(
+                rpm > 0,
+                (np.maximum(rpm, 0) / plant.max_rpm) ** plant.convection_exponent
+                / plant.fan_resistance_c_per_w,
+                0.0,
+            )
+            resistance = 1 / (passive_conductance + forced)
+            target = ambient_c + load_w * resistance
+            tau_s = resistance * plant.heat_capacity_j_per_c
+            temperature += (target - temperature) * (1 - np.exp(-control_s / tau_s))
+            clock.sleep(control_s)
+
+            temperature_sum += temperature
+            duty_sum += duty
+            np.maximum(max_temperature, temperature, out=max_temperature)
+            if now_s >= settle_from_s:
+                np.maximum(overshoot, temperature - set_point, out=overshoot)
+                outside = np.abs(temperature - set_point) > settle_band_c
+                last_outside_s = np.where(outside, now_s, last_outside_s)
+    finally:
+        clock.uninstall()
+
+    end_s = (steps - 1) * control_s
+    settling_time = last_outside_s + control_s - settle_from_s
+    settling_time = np.where(last_outside_s >= end_s, np.inf, settling_time)
+    duration = steps * control_s
+    metrics = {
+        "settling_time_s": settling_time,
+        "overshoot_c": overshoot,
+        "toggles_per_hour": toggles * 3600 / max(duration, 1),
+        "mean_duty": duty_sum / max(steps, 1),
+        "max_temperature_c": max_temperature,
+        "mean_temperature_c": temperature_sum / max(steps, 1),
+    }
+    return batch_result(scenario.name, duration, settings, metrics)
@@ -0,0 +1,40 @@
+"""Host stand-in for the CircuitPython board module of an Adafruit KB2040"""
+
+import busio
+import hardware
+
+
+class Pin:
+    def __init__(self, name):
+        self.name = name
+
+    def __repr__(self):
+        return "board." + self.name
+
+
+D0 = Pin("D0")
+D1 = Pin("D1")
+D2 = Pin("D2")
+D3 = Pin("D3")
+D4 = Pin("D4")
+D5 = Pin("D5")
+D6 = Pin("D6")
+D7 = Pin("D7")
+D8 = Pin("D8")
+D9 = Pin("D9")
+D10 = Pin("D10")
+SCL = Pin("SCL")
+SDA = Pin("SDA")
+
+_i2c = None
+
+
+def I2C():  # pylint: disable=invalid-name
+    """Return the shared I2C bus of the current simulated hardware"""
+    global _i2c
+    if _i2c is None or _i2c.deinited or _i2c.hardware is not hardware.current():
+        _i2c = busio.I2C(SCL, SDA)
+    return _i2c
+
+
+STEMMA_I2C = I2C
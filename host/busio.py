@@ -0,0 +1,66 @@
+"""Host stand-in for the CircuitPython busio module
+
+I2C talks to the register models of the simulated hardware.
+"""
+
+import hardware
+
+
+class I2C:
+    def __init__(self, scl, sda, *, frequency=100000, timeout=255):
+        self.hardware = hardware.current()
+        self._locked = False
+        self.deinited = False
+
+    def deinit(self):
+        self.deinited = True
+
+    def try_lock(self):
+        if self._locked:
+            return False
+        self._locked = True
+        return True
+
+    def unlock(self):
+        self._locked = False
+
+    def _device(self, address):
+        if not self._locked:
+            raise RuntimeError("I2C bus must be locked")
+        device = self.hardware.i2c_devices.get(address)
+        if device is None:
+            raise OSError(19, "No I2C device at address: 0x%x" % address)
+        self.hardware.i2c_transactions += 1
+        return device
+
+    def scan(self):
+        return sorted(self.hardware.i2c_devices)
+
+    def writeto(self, address, buffer, *, start=0, end=None):
+        if end is None:
+            end = len(buffer)
+        self._device(address).write(bytes(buffer[start:end]))
+
+    def readfrom_into(self, address, buffer, *, start=0, end=None):
+        if end is None:
+            end = len(buffer)
+        buffer[start:end] = self._device(address).read(end - start)
+
+    def writeto_then_readfrom(
+        self,
+        address,
+        buffer_out,
+        buffer_in,
+        *,
+        out_start=0,
+        out_end=None,
+        in_start=0,
+        in_end=None
+    ):
+        if out_end is None:
+            out_end = len(buffer_out)
+        if in_end is None:
+            in_end = len(buffer_in)
+        device = self._device(address)
+        device.write(bytes(buffer_out[out_start:out_end]))
+        buffer_in[in_start:in_end] = device.read(in_end - in_start)
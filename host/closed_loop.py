@@ -0,0 +1,241 @@
+"""Closed loop simulation of code.py's fan control against a thermal_plant
+
+simulate() runs the control step of code.py once per control period: read
+the sensor (quantized to its 0.125 C resolution), compute the fan output
+with pid_fan_control (a PIDController) or simple_fan_control, record the
+sample and move the fan duty cycle toward the output through the same
+slew_limiter as code.py.
+The plant then advances to the next control period. Time is virtual, so a
+24 hour scenario takes seconds.
+
+The fixed hysteresis lockout code.py used before the slew limiter is still
+available for comparison: with hysteresis_s > 0 the target of the slew
+limiter only changes once per hysteresis period, and with up_per_s and
+down_per_s None and dead_band 0 the duty cycle follows the target at once.
+
+The sampler and the control functions are the ones code.py uses. The
+virtual_clock is installed while simulate() runs so the sampler timestamps
+and elapsed_ms follow virtual time.
+"""
+
+from array import array
+
+from fan_control import fan_pid, pid_fan_control, simple_fan_control
+from sampler import column_sampler
+from slew import slew_limiter
+from thermal import thermal_plant
+from virtual_clock import virtual_clock
+
+# The settings in code.py, checked against it by test_thermal
+SET_POINT_DEGREES_C = 30
+KP = 0.8 * 0.0666
+KI = (0.2 * 0.0666) / 100000
+DUTY_UP_PER_SECOND = 0.1
+DUTY_DOWN_PER_SECOND = 0.01
+DUTY_DEAD_BAND = 0.01
+FAN_MIN_ON_SECONDS = 180
+FAN_MIN_OFF_SECONDS = 120
+FAN_RESTART_OUTPUT = 0.3
+# code.py no longer holds the fan output for a fixed time
+HYSTERESIS_SECONDS = 0
+CONTROL_SECONDS = 1
+TELEMETRY_SECONDS = 3
+NUM_TEMP_SAMPLES = 30
+
+SENSOR_RESOLUTION_C = 0.125
+
+
+class simulation_result:
+    """Traces and summary statistics of a simulate() run"""
+
+    def __init__(self, scenario_name, controller, record_every_s):
+        self.scenario_name = scenario_name
+        self.controller = controller
+        self.record_every_s = record_every_s
+        # One entry every record_every_s
+        self.times_s = array("f")
+        self.temperatures_c = array("f")
+        self.duties = array("f")
+        self.rpms = array("f")
+        self.loads_w = array("f")
+        self.duration_s = 0.0
+        self.max_temperature_c = None
+        self.mean_temperature_c = 0.0
+        self.mean_duty = 0.0
+        self.seconds_above_set_point = 0.0
+        self.duty_changes = 0  # writes of a new duty cycle
+        self.fan_starts = 0  # changes from stopped to running
+
+    @property
+    def fan_starts_per_hour(self):
+        if self.duration_s <= 0:
+            return 0.0
+        return self.fan_starts * 3600 / self.duration_s
+
+    def summary(self):
+        """Return a one line summary"""
+        return (
+            "%s %s: %.1f h max=%.2f C mean=%.2f C above set point=%.0f%% "
+            "mean duty=%.3f duty changes=%d fan starts/h=%.2f"
+            % (
+                self.scenario_name,
+                self.controller,
+                self.duration_s / 3600,
+                self.max_temperature_c,
+                self.mean_temperature_c,
+                100 * self.seconds_above_set_point / max(self.duration_s, 1),
+                self.mean_duty,
+                self.duty_changes,
+                self.fan_starts_per_hour,
+            )
+        )
+
+
+def simulate(  # pylint: disable=too-many-arguments,too-many-locals
+    scenario,
+    controller="pid",
+    set_point=SET_POINT_DEGREES_C,
+    kp=KP,
+    ki=KI,
+    hysteresis_s=HYSTERESIS_SECONDS,
+    control_s=CONTROL_SECONDS,
+    num_samples=NUM_TEMP_SAMPLES,
+    plant=None,
+    duration_s=None,
+    record_every_s=60,
+    feed_forward_curve=None,
+    up_per_s=DUTY_UP_PER_SECOND,
+    down_per_s=DUTY_DOWN_PER_SECOND,
+    dead_band=DUTY_DEAD_BAND,
+    min_on_s=FAN_MIN_ON_SECONDS,
+    min_off_s=FAN_MIN_OFF_SECONDS,
+    restart_above=FAN_RESTART_OUTPUT,
+    data_log=None,
+):
+    """Run the control loop of code.py against a thermal plant
+
+    Args:
+    scenario: thermal.scenario giving the load and ambient temperature
+    controller: "pid" or "simple" to drive the fan with pid_fan_control or
+    simple_fan_control
+    set_point, kp, ki, hysteresis_s, control_s, num_samples: the settings
+    of code.py, defaulting to its values
+    plant: the thermal_plant. A new one at the starting ambient temperature
+    if None.
+    duration_s: virtual seconds to run. The scenario's duration if None.
+    record_every_s: seconds between the entries of the traces
+    feed_forward_curve: optional fan_curve whose output is added to the PID
+    output, as FEED_FORWARD_CURVE in code.py
+    up_per_s, down_per_s, dead_band, min_on_s, min_off_s, restart_above:
+    the slew_limiter settings, defaulting to DUTY_UP_PER_SECOND,
+    DUTY_DOWN_PER_SECOND, DUTY_DEAD_BAND, FAN_MIN_ON_SECONDS,
+    FAN_MIN_OFF_SECONDS and FAN_RESTART_OUTPUT of code.py. None rates do not
+    limit the slew.
+    data_log: optional text file to write the DATA lines that the telemetry
+    task of code.py prints, every TELEMETRY_SECONDS
+
+    Returns:
+    a simulation_result.
+    """
+    if controller not in ("pid", "simple"):
+        raise ValueError("Unsupported controller: {}".format(controller))
+    if plant is None:
+        plant = thermal_plant(temperature_c=scenario.ambient_c(0))
+    if duration_s is None:
+        duration_s = scenario.duration_s
+    result = simulation_result(scenario.name, controller, record_every_s)
+    steps = int(duration_s / control_s)
+    record_every = max(1, int(record_every_s / control_s))
+    telemetry_every = max(1, int(TELEMETRY_SECONDS / control_s))
+
+    clock = virtual_clock()
+    clock.install()
+    try:
+        temp_samples = column_sampler(
+            num_samples,
+            (
+                "temp",
+                "error",
+                "fan_output_simple",
+                "fan_output_pid",
+                "fan_duty",
+                "pid_integral",
+            ),
+        )
+        temp_samples.start()
+        pid = fan_pid(set_point, kp, ki)
+        output_stage = slew_limiter(
+            up_per_s,
+            down_per_s,
+            dead_band,
+            min_on_s=min_on_s,
+            min_off_s=min_off_s,
+            restart_above=restart_above,
+        )
+        target = 0.0
+        duty = 0.0
+        last_fan_change_s = None
+        temperature_sum = 0.0
+        duty_sum = 0.0
+        max_temperature = plant.temperature
+        for step in range(steps):
+            now_s = step * control_s
+            temperature = (
+                round(plant.temperature / SENSOR_RESOLUTION_C) * SENSOR_RESOLUTION_C
+            )
+            error = temperature - set_point
+            fan_output_simple = simple_fan_control(temperature)
+            feed_forward = 0
+            if feed_forward_curve is not None:
+                feed_forward = feed_forward_curve.update(temperature)
+            fan_output_pid = pid_fan_control(
+                temperature, pid, feed_forward, False, clock.monotonic_ns()
+            )
+            temp_samples.record(
+                {
+                    "temp": temperature,
+                    "error": error,
+                    "fan_output_simple": fan_output_simple,
+                    "fan_output_pid": fan_output_pid,
+                    "fan_duty": duty,
+                    "pid_integral": pid.integral,
+                }
+            )
+            if data_log is not None and step % telemetry_every == 0:
+                data_log.write("DATA:  %s\n" % temp_samples.last())
+            if last_fan_change_s is None or now_s - last_fan_change_s > hysteresis_s:
+                target = fan_output_pid if controller == "pid" else fan_output_simple
+                last_fan_change_s = now_s
+            output = output_stage.update(target, clock.monotonic_ns())
+            new_duty = max(0, min(round(65536 * output), 65535)) / 65535
+            if new_duty != duty:
+                result.duty_changes += 1
+                if duty == 0:
+                    result.fan_starts += 1
+            duty = new_duty
+
+            load_w = scenario.load_w(now_s)
+            if step % record_every == 0:
+                result.times_s.append(now_s)
+                result.temperatures_c.append(plant.temperature)
+                result.duties.append(duty)
+                result.rpms.append(plant.rpm)
+                result.loads_w.append(load_w)
+            plant.step(control_s, duty, load_w, scenario.ambient_c(now_s))
+            clock.sleep(control_s)
+
+            temperature_sum += plant.temperature
+            duty_sum += duty
+            if plant.temperature > max_temperature:
+                max_temperature = plant.temperature
+            if plant.temperature > set_point:
+                result.seconds_above_set_point += control_s
+    finally:
+        clock.uninstall()
+
+    result.duration_s = steps * control_s
+    result.max_temperature_c = max_temperature
+    if steps:
+        result.mean_temperature_c = temperature_sum / steps
+        result.mean_duty = duty_sum / steps
+    return result
@@ -0,0 +1,33 @@
+"""Host stand-in for the CircuitPython countio module
+
+Counter counts the tach pulses of the simulated fan.
+"""
+
+import hardware
+
+
+class Edge:
+    RISE = 1
+    FALL = 2
+    RISE_AND_FALL = 3
+
+
+class Counter:
+    def __init__(self, pin, *, edge=Edge.FALL, pull=None):
+        self._fan = hardware.current().fan
+        self._edges_per_pulse = 2 if edge == Edge.RISE_AND_FALL else 1
+        self._base = self._fan.pulses
+
+    @property
+    def count(self):
+        return (self._fan.pulses - self._base) * self._edges_per_pulse
+
+    @count.setter
+    def count(self, value):
+        self._base = self._fan.pulses - value // self._edges_per_pulse
+
+    def reset(self):
+        self.count = 0
+
+    def deinit(self):
+        pass
@@ -0,0 +1,236 @@
+"""Simulated hardware behind the host stand-ins for the CircuitPython modules
+
+The stand-in modules in this directory (board, busio, countio, pulseio,
+pwmio, ...) all talk to the simulated_hardware made current with install().
+
+The simulated hardware is:
+- a virtual clock (see virtual_clock.py)
+- an I2C bus with a PCT2075 temperature sensor at 0x37 and an HT16K33 LED
+  driver at 0x70, emulated at the register level
+- a fan whose speed follows the PWM duty cycle, feeding the tach pin
+
+The temperature comes from temperature_source, a function of the virtual
+time in seconds, so tests and the thermal simulator can drive it.
+"""
+
+from virtual_clock import virtual_clock
+
+_current = None
+
+
+def current():
+    """Return the simulated_hardware that the stand-in modules use"""
+    if _current is None:
+        raise RuntimeError("No simulated hardware installed, see hardware.install()")
+    return _current
+
+
+class simulated_fan:
+    """A PWM fan whose speed follows the duty cycle with some inertia"""
+
+    def __init__(
+        self, clock, max_rpm=1700, min_duty=0.05, time_constant_s=1.0, pulses_per_rev=2
+    ):
+        """Initializes the fan
+
+        Args:
+        clock: the virtual_clock
+        max_rpm: speed at 100% duty
+        min_duty: below this duty the fan stops
+        time_constant_s: how quickly the speed follows the duty
+        pulses_per_rev: tach pulses per revolution
+
+        Returns:
+        None.
+        """
+        self._clock = clock
+        self.max_rpm = max_rpm
+        self.min_duty = min_duty
+        self.time_constant_s = time_constant_s
+        self.pulses_per_rev = pulses_per_rev
+        self._duty = 0.0
+        self._rpm = 0.0
+        self._pulses = 0.0  # tach pulses since start, with the fraction
+        self._updated_ns = clock.monotonic_ns()
+
+    def target_rpm(self, duty):
+        """Return the speed the fan settles at for a duty cycle from 0 to 1"""
+        if duty < self.min_duty:
+            return 0.0
+        return self.max_rpm * duty
+
+    def _update(self):
+        now_ns = self._clock.monotonic_ns()
+        target = self.target_rpm(self._duty)
+        # Integrate in small steps so the pulse count follows the ramp
+        while self._updated_ns < now_ns:
+            step_ns = min(now_ns - self._updated_ns, 100000000)
+            step_s = step_ns / 1000000000
+            self._rpm += (target - self._rpm) * min(1.0, step_s / self.time_constant_s)
+            self._pulses += self._rpm / 60 * self.pulses_per_rev * step_s
+            self._updated_ns += step_ns
+
+    @property
+    def duty(self):
+        return self._duty
+
+    @duty.setter
+    def duty(self, duty):
+        self._update()
+        self._duty = duty
+
+    @property
+    def rpm(self):
+        self._update()
+        return self._rpm
+
+    @property
+    def pulses(self):
+        """The whole number of tach pulses since the fan was created"""
+        self._update()
+        return int(self._pulses)
+
+
+class pct2075_model:
+    """Register level model of a PCT2075 temperature sensor"""
+
+    def __init__(self, hardware):
+        self._hardware = hardware
+        self._pointer = 0
+        # CONF, THYST, TOS and TIDLE at their power on values
+        self.registers = {1: b"\x00", 2: b"\x4b\x00", 3: b"\x50\x00", 4: b"\x00"}
+        self.reads = 0
+
+    def temperature_register(self):
+        temperature = self._hardware.temperature()
+        counts = int(round(temperature / 0.125)) & 0x7FF
+        value = counts << 5
+        return bytes((value >> 8, value & 0xFF))
+
+    def write(self, data):
+        if not data:
+            return
+        self._pointer = data[0] & 0x07
+        if len(data) > 1 and self._pointer in self.registers:
+            size = len(self.registers[self._pointer])
+            self.registers[self._pointer] = bytes(data[1 : 1 + size])
+
+    def read(self, size):
+        self.reads += 1
+        if self._pointer == 0:
+            value = self.temperature_register()
+        else:
+            value = self.registers.get(self._pointer, b"\x00")
+        return (value * (size // len(value) + 1))[:size]
+
+
+# Segments of the digits 0-9 and the letters used by code.py
+_SEVEN_SEGMENT_CHARS = {
+    0x00: " ",
+    0x3F: "0",
+    0x06: "1",
+    0x5B: "2",
+    0x4F: "3",
+    0x66: "4",
+    0x6D: "5",
+    0x7D: "6",
+    0x07: "7",
+    0x7F: "8",
+    0x6F: "9",
+    0x39: "C",
+    0x40: "-",
+}
+
+
+class ht16k33_model:
+    """Register level model of an HT16K33 LED driver"""
+
+    def __init__(self):
+        self.ram = bytearray(16)
+        self.oscillator_on = False
+        self.display_on = False
+        self.blink_rate = 0
+        self.brightness = 15
+        self.writes = 0
+        self.bytes_written = 0
+
+    def write(self, data):
+        if not data:
+            return
+        self.writes += 1
+        self.bytes_written += len(data)
+        command = data[0]
+        if len(data) == 1 and command & 0xF0 == 0x20:
+            self.oscillator_on = bool(command & 0x01)
+        elif len(data) == 1 and command & 0xF0 == 0x80:
+            self.display_on = bool(command & 0x01)
+            self.blink_rate = (command >> 1) & 0x03
+        elif len(data) == 1 and command & 0xF0 == 0xE0:
+            self.brightness = command & 0x0F
+        elif command & 0xF0 == 0x00:
+            # Display RAM write, starting at the address in the low bits
+            address = command & 0x0F
+            for value in data[1:]:
+                self.ram[address] = value
+                address = (address + 1) % 16
+
+    def read(self, size):
+        return bytes(self.ram[:size])
+
+    def seven_segment_text(self):
+        """Decode the RAM of a 4 digit 7-segment backpack as text"""
+        text = ""
+        for position in (0, 2, 6, 8):
+            value = self.ram[position]
+            text += _SEVEN_SEGMENT_CHARS.get(value & 0x7F, "?")
+            if value & 0x80:
+                text += "."
+        return text
+
+
+class simulated_hardware:
+    """Everything the stand-in modules talk to"""
+
+    PCT2075_ADDRESS = 0x37
+    HT16K33_ADDRESS = 0x70
+
+    def __init__(self, temperature_c=25.0, end_s=None):
+        """Initializes the hardware
+
+        Args:
+        temperature_c: the temperature the sensor reads. Replace
+        temperature_source to make it change over time.
+        end_s: virtual seconds after which the clock raises
+        SimulationComplete
+
+        Returns:
+        None.
+        """
+        self.clock = virtual_clock(end_s=end_s)
+        self.fan = simulated_fan(self.clock)
+        self.pct2075 = pct2075_model(self)
+        self.ht16k33 = ht16k33_model()
+        self.i2c_devices = {
+            self.PCT2075_ADDRESS: self.pct2075,
+            self.HT16K33_ADDRESS: self.ht16k33,
+        }
+        self.i2c_transactions = 0
+        # (virtual seconds, duty_cycle) for every change of a PWM output
+        self.pwm_history = []
+        self.temperature_source = lambda now_s: temperature_c
+
+    def temperature(self):
+        return self.temperature_source(self.clock.monotonic())
+
+    def install(self):
+        """Make this the hardware the stand-in modules use, in virtual time"""
+        global _current
+        _current = self
+        self.clock.install()
+
+    def uninstall(self):
+        """Restore real time"""
+        global _current
+        self.clock.uninstall()
+        if _current is self:
+            _current = None
@@ -0,0 +1,5 @@
+"""Host stand-in for the micropython module"""
+
+
+def const(value):
+    return value
@@ -0,0 +1,58 @@
+"""Host stand-in for the CircuitPython pulseio module
+
+PulseIn records the low and high pulses of the simulated fan's tach
+output, half a period each at the speed of the fan when they are read.
+"""
+
+import hardware
+
+
+class PulseIn:
+    def __init__(self, pin, maxlen=2, *, idle_state=False):
+        self._hardware = hardware.current()
+        self.maxlen = maxlen
+        self._durations = []
+        self._paused = False
+        self._last_pulses = self._hardware.fan.pulses
+
+    def _update(self):
+        fan = self._hardware.fan
+        pulses = fan.pulses
+        new_pulses = pulses - self._last_pulses
+        self._last_pulses = pulses
+        if not new_pulses or self._paused:
+            return
+        rpm = fan.rpm
+        if rpm > 0:
+            half_period_us = 30000000 / (rpm * fan.pulses_per_rev)
+        else:
+            half_period_us = 65535
+        half_period_us = min(65535, int(half_period_us))
+        for _ in range(2 * new_pulses):
+            if len(self._durations) < self.maxlen:
+                self._durations.append(half_period_us)
+
+    def __len__(self):
+        self._update()
+        return len(self._durations)
+
+    def __getitem__(self, index):
+        self._update()
+        return self._durations[index]
+
+    def popleft(self):
+        self._update()
+        return self._durations.pop(0)
+
+    def clear(self):
+        self._durations = []
+
+    def pause(self):
+        self._paused = True
+
+    def resume(self, trigger_duration=0):
+        self._update()
+        self._paused = False
+
+    def deinit(self):
+        pass
@@ -0,0 +1,32 @@
+"""Host stand-in for the CircuitPython pwmio module
+
+PWMOut drives the simulated fan and records every duty cycle change in
+the pwm_history of the simulated hardware.
+"""
+
+import hardware
+
+
+class PWMOut:
+    def __init__(self, pin, *, duty_cycle=0, frequency=500, variable_frequency=False):
+        self._hardware = hardware.current()
+        self.pin = pin
+        self.frequency = frequency
+        self._duty_cycle = None
+        self.duty_cycle = duty_cycle
+
+    @property
+    def duty_cycle(self):
+        return self._duty_cycle
+
+    @duty_cycle.setter
+    def duty_cycle(self, value):
+        if not 0 <= value <= 65535:
+            raise ValueError("duty_cycle must be 0-65535")
+        if value != self._duty_cycle:
+            self._hardware.pwm_history.append((self._hardware.clock.monotonic(), value))
+        self._duty_cycle = value
+        self._hardware.fan.duty = value / 65535
+
+    def deinit(self):
+        pass
@@ -0,0 +1,241 @@
+"""Sweep fan control settings over recorded traces on every core
+
+Each job is one trace replayed (see traces.trace_scenario()) through
+closed_loop.simulate() with one set of settings. The jobs run in a
+concurrent.futures.ProcessPoolExecutor and each result is appended to a
+JSON Lines file as soon as it finishes, so an interrupted sweep loses at
+most the jobs that were running. Running the same sweep again skips the
+jobs already in the file. A job is identified by the trace, its size and
+modification time, the ambient temperature and the settings, so editing a
+trace or changing the ambient temperature runs the jobs again.
+"""
+
+import concurrent.futures
+import itertools
+import json
+import os
+
+import closed_loop
+from thermal import thermal_plant
+from traces import trace_scenario
+
+SETTINGS = (
+    "controller",
+    "kp",
+    "ki",
+    "hysteresis_s",
+    "set_point",
+    "up_per_s",
+    "down_per_s",
+    "dead_band",
+    "min_on_s",
+    "min_off_s",
+    "restart_above",
+)
+
+# Scenarios already read by this worker process, by trace and ambient
+_scenarios = {}
+
+
+def job_key(trace, settings, ambient_c=22.0):
+    """Return the key that identifies a job in the results file"""
+    stat = os.stat(trace)
+    return json.dumps(
+        [os.path.abspath(trace), stat.st_size, stat.st_mtime_ns, ambient_c]
+        + [settings[name] for name in SETTINGS]
+    )
+
+
+def run_job(trace, settings, ambient_c=22.0):
+    """Replay one trace with one set of settings
+
+    Runs in a worker process.
+
+    Args:
+    trace: path of a DATA log or CSV trace
+    settings: dictionary with a value for each of SETTINGS
+    ambient_c: the air temperature during the trace
+
+    Returns:
+    a dictionary of the trace, the settings and the simulation results.
+    """
+    cache_key = (trace, ambient_c)
+    scenario = _scenarios.get(cache_key)
+    if scenario is None:
+        scenario = trace_scenario(trace, thermal_plant(), ambient_c)
+        _scenarios[cache_key] = scenario
+    result = closed_loop.simulate(
+        scenario,
+        settings["controller"],
+        set_point=settings["set_point"],
+        kp=settings["kp"],
+        ki=settings["ki"],
+        hysteresis_s=settings["hysteresis_s"],
+        up_per_s=settings["up_per_s"] or None,
+        down_per_s=settings["down_per_s"] or None,
+        dead_band=settings["dead_band"],
+        min_on_s=settings["min_on_s"],
+        min_off_s=settings["min_off_s"],
+        restart_above=settings["restart_above"],
+        plant=thermal_plant(temperature_c=scenario.ambient_c(0)),
+        record_every_s=3600,
+    )
+    row = {
+        "key": job_key(trace, settings, ambient_c),
+        "trace": trace,
+        "ambient_c": ambient_c,
+    }
+    row.update(settings)
+    row.update(
+        {
+            "duration_s": result.duration_s,
+            "max_temperature_c": result.max_temperature_c,
+            "mean_temperature_c": result.mean_temperature_c,
+            "seconds_above_set_point": result.seconds_above_set_point,
+            "mean_duty": result.mean_duty,
+            "duty_changes": result.duty_changes,
+            "fan_starts_per_hour": result.fan_starts_per_hour,
+        }
+    )
+    return row
+
+
+def read_results(path):
+    """Return the rows of a results file, ignoring a torn last line"""
+    rows = []
+    if not os.path.exists(path):
+        return rows
+    with open(path) as file:
+        for line in file:
+            if not line.endswith("\n"):
+                break
+            try:
+                rows.append(json.loads(line))
+            except ValueError:
+                continue
+    return rows
+
+
+def sweep_results(path, traces, settings_list, ambient_c=22.0):
+    """Return the rows of a results file that belong to one sweep
+
+    The file may hold the results of earlier sweeps too, of other traces,
+    settings or ambient temperatures, or of traces that have changed since.
+
+    Args:
+    path: the results file
+    traces, settings_list, ambient_c: as passed to run_sweep()
+
+    Returns:
+    a list of the rows whose jobs are in the sweep.
+    """
+    keys = set(
+        job_key(trace, settings, ambient_c)
+        for trace in traces
+        for settings in settings_list
+    )
+    return [row for row in read_results(path) if row["key"] in keys]
+
+
+def _open_results(path):
+    """Open the results file to append, cutting off a torn last line"""
+    if os.path.exists(path):
+        with open(path, "rb+") as file:
+            data = file.read()
+            end = data.rfind(b"\n") + 1
+            if end < len(data):
+                file.truncate(end)
+    return open(path, "a")
+
+
+def settings_grid(  # pylint: disable=too-many-arguments
+    kp=(closed_loop.KP,),
+    ki=(closed_loop.KI,),
+    hysteresis_s=(closed_loop.HYSTERESIS_SECONDS,),
+    set_point=(closed_loop.SET_POINT_DEGREES_C,),
+    controller=("pid",),
+    up_per_s=(closed_loop.DUTY_UP_PER_SECOND,),
+    down_per_s=(closed_loop.DUTY_DOWN_PER_SECOND,),
+    dead_band=(closed_loop.DUTY_DEAD_BAND,),
+    min_on_s=(closed_loop.FAN_MIN_ON_SECONDS,),
+    min_off_s=(closed_loop.FAN_MIN_OFF_SECONDS,),
+    restart_above=(closed_loop.FAN_RESTART_OUTPUT,),
+):
+    """Return a list of settings dictionaries, one for every combination
+
+    The slew_limiter settings default to those of code.py, so the replay
+    drives the fan the way the controller does.
+    """
+    values = {
+        "controller": controller,
+        "kp": kp,
+        "ki": ki,
+        "hysteresis_s": hysteresis_s,
+        "set_point": set_point,
+        "up_per_s": up_per_s,
+        "down_per_s": down_per_s,
+        "dead_band": dead_band,
+        "min_on_s": min_on_s,
+        "min_off_s": min_off_s,
+        "restart_above": restart_above,
+    }
+    return [
+        dict(zip(SETTINGS, combination))
+        for combination in itertools.product(*(values[name] for name in SETTINGS))
+    ]
+
+
+def run_sweep(  # pylint: disable=too-many-arguments
+    traces,
+    settings_list,
+    results_path,
+    max_workers=None,
+    ambient_c=22.0,
+    progress=None,
+):
+    """Run every (trace, settings) job not already in the results file
+
+    Args:
+    traces: paths of DATA logs or CSV traces
+    settings_list: dictionaries with a value for each of SETTINGS
+    results_path: JSON Lines file to append each result to
+    max_workers: worker processes. The number of CPUs if None.
+    ambient_c: the air temperature during the traces
+    progress: optional function called with (done, total) after each job
+
+    Returns:
+    the number of jobs run. 0 if the sweep was already complete.
+    """
+    done = set(row["key"] for row in read_results(results_path))
+    jobs = []
+    for trace in traces:
+        for settings in settings_list:
+            if job_key(trace, settings, ambient_c) not in done:
+                jobs.append((trace, settings))
+    if not jobs:
+        return 0
+
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    # Keep a few jobs per worker queued rather than submitting them all
+    max_pending = 4 * max_workers
+    completed = 0
+    with _open_results(results_path) as results:
+        with concurrent.futures.ProcessPoolExecutor(max_workers) as executor:
+            pending = set()
+            next_job = 0
+            while next_job < len(jobs) or pending:
+                while next_job < len(jobs) and len(pending) < max_pending:
+                    trace, settings = jobs[next_job]
+                    pending.add(executor.submit(run_job, trace, settings, ambient_c))
+                    next_job += 1
+                finished, pending = concurrent.futures.wait(
+                    pending, return_when=concurrent.futures.FIRST_COMPLETED
+                )
+                for future in finished:
+                    results.write(json.dumps(future.result()) + "\n")
+                    results.flush()
+                    completed += 1
+                    if progress:
+                        progress(completed, len(jobs))
+    return completed
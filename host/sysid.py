@@ -0,0 +1,240 @@
+"""Fit a first order plus dead time (FOPDT) model to logged DATA lines
+
+The heatsink temperature y responds to the fan output u as
+
+    time_constant * dy/dt = -y + offset + gain * u(t - dead_time)
+
+Sampled every dt seconds this is the ARX model
+
+    y[k+1] = a * y[k] + b * u[k - d] + c
+
+with a = exp(-dt / time_constant), gain = b / (1 - a), offset = c / (1 - a)
+and dead_time = d * dt. fopdt_fit fits a, b and c by least squares for
+each candidate delay d and keeps the delay with the smallest residual.
+
+The fit only keeps the normal equations (a 3x3 matrix and a 3 vector per
+delay) and the last few samples between chunks, so logs of any length are
+streamed through in chunks of NumPy arrays without being loaded whole.
+
+suggest_gains() turns the model into PI gains with the SIMC or
+Ziegler-Nichols rules, in the units of Kp and Ki in code.py.
+
+The fan output is the duty cycle actually applied (the "fan_duty" key of
+the samples), not the PID output, which differs from it after the slew
+limiter and during the relay auto-tune.
+
+The fit needs the fan output to change for reasons other than the
+temperature, like a step test, while the load stays steady. The relay
+auto-tune switches the fan on the temperature itself, so its logs fit
+poorly. In normal closed loop operation the controller moves the output
+with the temperature and the load changes are not logged, so the fit
+mixes up cause and effect and usually fails or reports a fan that heats.
+"""
+
+import math
+
+import numpy as np
+
+from traces import DATA_INTERVAL_SECONDS, DUTY_KEY, read_data_lines
+
+
+class fopdt_model:
+    """The fitted model"""
+
+    def __init__(self, gain, time_constant_s, dead_time_s, offset, rmse, samples):
+        self.gain = gain  # change in temperature per unit of fan output
+        self.time_constant_s = time_constant_s
+        self.dead_time_s = dead_time_s
+        self.offset = offset  # the temperature the heatsink settles at with u=0
+        self.rmse = rmse  # of the one step ahead predictions
+        self.samples = samples
+
+    def __repr__(self):
+        return (
+            "fopdt_model(gain=%.3f C, time_constant_s=%.1f, dead_time_s=%.1f, "
+            "offset=%.2f C, rmse=%.3f C, samples=%d)"
+            % (
+                self.gain,
+                self.time_constant_s,
+                self.dead_time_s,
+                self.offset,
+                self.rmse,
+                self.samples,
+            )
+        )
+
+
+class fopdt_fit:
+    """Streaming least squares fit of a FOPDT model"""
+
+    def __init__(self, dt_s=DATA_INTERVAL_SECONDS, max_delay_s=60):
+        """Initializes the fit
+
+        Args:
+        dt_s: seconds between samples
+        max_delay_s: the longest dead time to try
+
+        Returns:
+        None.
+        """
+        self.dt_s = dt_s
+        self._max_delay = int(max_delay_s / dt_s)
+        delays = self._max_delay + 1
+        self._xtx = np.zeros((delays, 3, 3))
+        self._xty = np.zeros((delays, 3))
+        self._yty = np.zeros(delays)
+        self._rows = np.zeros(delays, dtype=np.int64)
+        # The samples carried over to the next chunk
+        self._y_tail = np.zeros(0)
+        self._u_tail = np.zeros(0)
+
+    def add(self, temperatures, outputs):
+        """Add a chunk of consecutive samples
+
+        Args:
+        temperatures: array of temperatures
+        outputs: array of the fan output at the same samples
+
+        Returns:
+        None.
+        """
+        y = np.concatenate((self._y_tail, np.asarray(temperatures, dtype=float)))
+        u = np.concatenate((self._u_tail, np.asarray(outputs, dtype=float)))
+        first_target = len(self._y_tail)
+        for d in range(self._max_delay + 1):
+            # Targets y[j] from y[j-1] and u[j-1-d], for the new samples only
+            start = max(first_target, d + 1)
+            if start >= len(y):
+                continue
+            target = y[start:]
+            x = np.column_stack(
+                (
+                    y[start - 1 : -1],
+                    u[start - 1 - d : len(u) - 1 - d],
+                    np.ones(len(target)),
+                )
+            )
+            self._xtx[d] += x.T @ x
+            self._xty[d] += x.T @ target
+            self._yty[d] += target @ target
+            self._rows[d] += len(target)
+        keep = self._max_delay + 1
+        self._y_tail = y[-keep:]
+        self._u_tail = u[-keep:]
+
+    def restart(self):
+        """Start a new segment, e.g. after a gap or a reset in the log"""
+        self._y_tail = np.zeros(0)
+        self._u_tail = np.zeros(0)
+
+    def result(self):
+        """Return the fopdt_model with the best dead time
+
+        Raises:
+        ValueError if there are too few samples, or the temperature does not
+        respond like a stable first order system.
+        """
+        best = None
+        for d in range(self._max_delay + 1):
+            if self._rows[d] < 4:
+                continue
+            xtx = self._xtx[d]
+            xty = self._xty[d]
+            theta = np.linalg.lstsq(xtx, xty, rcond=None)[0]
+            residual = self._yty[d] - 2 * theta @ xty + theta @ xtx @ theta
+            mse = max(residual, 0.0) / self._rows[d]
+            if best is None or mse < best[0]:
+                best = (mse, d, theta)
+        if best is None:
+            raise ValueError("Too few samples to fit")
+        mse, d, (a, b, c) = best
+        if not 0 < a < 1:
+            raise ValueError("Not a stable first order response (a=%f)" % a)
+        a, b, c = float(a), float(b), float(c)
+        return fopdt_model(
+            gain=b / (1 - a),
+            time_constant_s=-self.dt_s / math.log(a),
+            dead_time_s=d * self.dt_s,
+            offset=c / (1 - a),
+            rmse=math.sqrt(mse),
+            samples=int(self._rows[d]),
+        )
+
+
+def fit_log(
+    paths,
+    dt_s=DATA_INTERVAL_SECONDS,
+    output_key=DUTY_KEY,
+    max_delay_s=60,
+    chunk_size=10000,
+):
+    """Fit a FOPDT model to DATA logs, streaming them in chunks
+
+    Args:
+    paths: DATA logs from log_data_from_serial.py. Each starts a new
+    segment.
+    dt_s: seconds between the DATA lines (TELEMETRY_SECONDS in code.py)
+    output_key: the key of the applied fan duty cycle in the samples
+    max_delay_s: the longest dead time to try
+    chunk_size: samples per NumPy chunk
+
+    Returns:
+    the fopdt_model.
+    """
+    fit = fopdt_fit(dt_s, max_delay_s)
+    temperatures = np.zeros(chunk_size)
+    outputs = np.zeros(chunk_size)
+    for path in paths:
+        fit.restart()
+        count = 0
+        with open(path) as file:
+            for sample in read_data_lines(file):
+                temperatures[count] = sample["temp"]
+                outputs[count] = sample.get(output_key, 0.0)
+                count += 1
+                if count == chunk_size:
+                    fit.add(temperatures, outputs)
+                    count = 0
+        if count:
+            fit.add(temperatures[:count], outputs[:count])
+    return fit.result()
+
+
+def suggest_gains(model, rule="simc", closed_loop_time_s=None):
+    """Suggest PI gains for pid_fan_control from a fitted model
+
+    pid_fan_control computes Kp * error plus the integral of Ki * error
+    over time in ms, so Kp is the controller gain and Ki is the gain divided
+    by the integral time in ms. The integral term is clamped to +/-0.2.
+
+    Args:
+    model: a fopdt_model. The gain is negative when the fan cools.
+    rule: "simc" (Skogestad) or "ziegler_nichols" (reaction curve)
+    closed_loop_time_s: the SIMC tuning parameter tau_c. Defaults to the
+    dead time, or the DATA interval if there is none.
+
+    Returns:
+    a dictionary of "kp" and "ki" for code.py, and "kc" and "ti_s", the
+    controller gain and integral time.
+
+    Raises:
+    ValueError for an unknown rule or a model where the fan does not cool.
+    """
+    if model.gain >= 0:
+        raise ValueError("The fan does not lower the temperature in this model")
+    gain = -model.gain  # the error is temperature - set point
+    tau = model.time_constant_s
+    theta = model.dead_time_s
+    if rule == "simc":
+        if closed_loop_time_s is None:
+            closed_loop_time_s = theta if theta > 0 else DATA_INTERVAL_SECONDS
+        kc = tau / (gain * (closed_loop_time_s + theta))
+        ti_s = min(tau, 4 * (closed_loop_time_s + theta))
+    elif rule == "ziegler_nichols":
+        theta = max(theta, DATA_INTERVAL_SECONDS / 2)
+        kc = 0.9 * tau / (gain * theta)
+        ti_s = 3.33 * theta
+    else:
+        raise ValueError("Unsupported rule: {}".format(rule))
+    kc = float(kc)
+    return {"kc": kc, "ti_s": ti_s, "kp": kc, "ki": kc / (ti_s * 1000)}
@@ -0,0 +1,187 @@
+"""Lumped parameter thermal model of a fanless PC heatsink with a fan
+
+The heatsink is a single heat capacity C at temperature T, heated by the
+PC and cooled to the ambient air through a thermal resistance R:
+
+    C dT/dt = P - (T - T_ambient) / R
+
+Passive convection is always there. The fan adds forced convection that
+grows with its speed, and its speed follows the PWM duty cycle:
+
+    duty -> RPM -> 1 / R = 1 / R_passive + (RPM / max_rpm) ** n / R_fan
+
+Each step is integrated exactly for a constant P, R and ambient, so steps
+of a second or more stay stable.
+
+A scenario is a load in watts and an ambient temperature, both functions of
+the time in seconds, run for a duration. SCENARIOS holds a few stock ones.
+"""
+
+import math
+
+
+class thermal_plant:
+    """A heatsink heated by the PC and cooled by passive and fan convection"""
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        heat_capacity_j_per_c=1500.0,
+        passive_resistance_c_per_w=0.6,
+        fan_resistance_c_per_w=0.12,
+        convection_exponent=0.8,
+        max_rpm=1700,
+        min_duty=0.05,
+        fan_time_constant_s=1.0,
+        temperature_c=22.0,
+    ):
+        """Initializes the plant
+
+        Args:
+        heat_capacity_j_per_c: energy to warm the heatsink by 1 C
+        passive_resistance_c_per_w: thermal resistance with the fan stopped
+        fan_resistance_c_per_w: resistance of the forced convection alone at
+        full speed
+        convection_exponent: how forced convection scales with fan speed
+        max_rpm: fan speed at 100% duty
+        min_duty: below this duty the fan stops
+        fan_time_constant_s: how quickly the fan speed follows the duty
+        temperature_c: the starting heatsink temperature
+
+        Returns:
+        None.
+        """
+        self.heat_capacity_j_per_c = heat_capacity_j_per_c
+        self.passive_resistance_c_per_w = passive_resistance_c_per_w
+        self.fan_resistance_c_per_w = fan_resistance_c_per_w
+        self.convection_exponent = convection_exponent
+        self.max_rpm = max_rpm
+        self.min_duty = min_duty
+        self.fan_time_constant_s = fan_time_constant_s
+        self.temperature = temperature_c
+        self.rpm = 0.0
+
+    def rpm_for_duty(self, duty):
+        """Return the speed the fan settles at for a duty cycle from 0 to 1"""
+        if duty < self.min_duty:
+            return 0.0
+        return self.max_rpm * min(duty, 1.0)
+
+    def thermal_resistance(self, rpm):
+        """Return the heatsink to ambient resistance in C/W at a fan speed"""
+        conductance = 1 / self.passive_resistance_c_per_w
+        if rpm > 0:
+            conductance += (
+                rpm / self.max_rpm
+            ) ** self.convection_exponent / self.fan_resistance_c_per_w
+        return 1 / conductance
+
+    def steady_state(self, duty, power_w, ambient_c):
+        """Return the temperature the heatsink settles at"""
+        return ambient_c + power_w * self.thermal_resistance(self.rpm_for_duty(duty))
+
+    def step(self, dt_s, duty, power_w, ambient_c):
+        """Advance the model
+
+        Args:
+        dt_s: seconds to advance
+        duty: fan duty cycle from 0 to 1
+        power_w: heat from the PC in watts
+        ambient_c: temperature of the air
+
+        Returns:
+        the heatsink temperature at the end of the step
+        """
+        if dt_s <= 0:
+            return self.temperature
+        target_rpm = self.rpm_for_duty(duty)
+        if self.fan_time_constant_s > 0:
+            self.rpm += (target_rpm - self.rpm) * (
+                1 - math.exp(-dt_s / self.fan_time_constant_s)
+            )
+        else:
+            self.rpm = target_rpm
+        resistance = self.thermal_resistance(self.rpm)
+        target = ambient_c + power_w * resistance
+        tau_s = resistance * self.heat_capacity_j_per_c
+        self.temperature += (target - self.temperature) * (1 - math.exp(-dt_s / tau_s))
+        return self.temperature
+
+
+class scenario:
+    """A load and ambient temperature over time"""
+
+    def __init__(self, name, duration_s, load_w, ambient_c):
+        """Initializes the scenario
+
+        Args:
+        name: name to use in reports
+        duration_s: how long the scenario runs
+        load_w: function of the time in seconds returning the heat from the
+        PC in watts
+        ambient_c: function of the time in seconds returning the air
+        temperature
+
+        Returns:
+        None.
+        """
+        self.name = name
+        self.duration_s = duration_s
+        self.load_w = load_w
+        self.ambient_c = ambient_c
+
+
+DAY_SECONDS = 86400
+
+
+def office_ambient_c(t_s):
+    """Room temperature, coolest at 3:00 and warmest at 15:00"""
+    day = (t_s % DAY_SECONDS) / DAY_SECONDS
+    return 22 + 2.5 * math.sin(2 * math.pi * (day - 0.375))
+
+
+def office_load_w(t_s):
+    """An idle PC at night, busy from 9:00 to 18:00 with a 20 minute
+    compile every 90 minutes"""
+    hour = (t_s % DAY_SECONDS) / 3600
+    if hour < 9 or hour >= 18:
+        return 25.0
+    if (hour - 9) % 1.5 < 1 / 3:
+        return 95.0
+    return 55.0
+
+
+def step_load_w(t_s):
+    """Idle for an hour, then a sustained heavy load"""
+    return 25.0 if t_s < 3600 else 80.0
+
+
+SCENARIOS = {
+    "idle": scenario("idle", 6 * 3600, lambda t_s: 25.0, lambda t_s: 22.0),
+    "step": scenario("step", 6 * 3600, step_load_w, lambda t_s: 22.0),
+    "office_day": scenario("office_day", DAY_SECONDS, office_load_w, office_ambient_c),
+}
+
+
+def plant_temperature_source(plant, scenario_, fan):
+    """Return a temperature_source for hardware.simulated_hardware
+
+    The plant is advanced to the time of each read, using the duty cycle of
+    the simulated fan.
+
+    Args:
+    plant: the thermal_plant
+    scenario_: the scenario giving the load and ambient temperature
+    fan: the hardware.simulated_fan driven by code.py
+
+    Returns:
+    a function of the time in seconds returning the temperature
+    """
+    last_s = [0.0]
+
+    def source(now_s):
+        load_w = scenario_.load_w(now_s)
+        plant.step(now_s - last_s[0], fan.duty, load_w, scenario_.ambient_c(now_s))
+        last_s[0] = now_s
+        return plant.temperature
+
+    return source
@@ -0,0 +1,165 @@
+"""Read recorded temperature traces and turn them into thermal scenarios
+
+Two kinds of trace are understood:
+
+DATA logs: the output of log_data_from_serial.py, one sample dictionary
+per line as printed by the telemetry task of code.py, e.g.
+{'temp': 31.5, 'error': 1.5, 'fan_output_simple': 0.1, 'fan_output_pid': 0.12,
+'fan_duty': 0.1, 'elapsed_ms': 1000.0}
+fan_duty is the duty cycle the fan actually ran at. fan_output_pid is only
+what the PID asked for, before the slew limiter and the auto-tune relay.
+Raw serial captures with the "DATA: " prefix and other lines mixed in also
+work. Lines are TELEMETRY_SECONDS apart.
+
+CSV traces: written by simulate.py --trace, with time_s, temperature_c,
+duty and load_w columns.
+
+A DATA log has no record of the heat load, so trace_scenario() infers it by
+running the thermal_plant backwards: over each window, the load is the one
+that takes the plant from the first temperature to the last with the
+recorded fan output.
+"""
+
+import ast
+import math
+
+from thermal import scenario
+
+# TELEMETRY_SECONDS in code.py
+DATA_INTERVAL_SECONDS = 3
+# The key of the applied fan duty cycle in the samples of code.py
+DUTY_KEY = "fan_duty"
+
+
+def read_data_lines(file):
+    """Yield the sample dictionaries of a DATA log, one line at a time
+
+    Args:
+    file: an open text file, or any iterable of lines
+
+    Returns:
+    a generator of dictionaries. Lines that are not samples are skipped.
+    """
+    for line in file:
+        line = line.strip()
+        if line.startswith("DATA:"):
+            line = line[5:].strip()
+        if not line.startswith("{"):
+            continue
+        try:
+            sample = ast.literal_eval(line)
+        except (SyntaxError, ValueError):
+            continue  # e.g. a line cut short by a reset
+        if isinstance(sample, dict) and "temp" in sample:
+            yield sample
+
+
+def read_trace(path, interval_s=DATA_INTERVAL_SECONDS, duty_key=DUTY_KEY):
+    """Read a DATA log or CSV trace
+
+    Args:
+    path: the file to read
+    interval_s: seconds between the lines of a DATA log
+    duty_key: the key of a DATA log sample holding the fan duty cycle
+
+    Returns:
+    a dictionary of lists "time_s", "temperature_c" and "duty", plus
+    "load_w" for CSV traces.
+    """
+    trace = {"time_s": [], "temperature_c": [], "duty": []}
+    with open(path) as file:
+        first = file.readline()
+        if first.startswith("time_s,"):
+            columns = first.strip().split(",")
+            for name in columns:
+                trace.setdefault(name, [])
+            for line in file:
+                values = line.strip().split(",")
+                if len(values) != len(columns):
+                    continue
+                for name, value in zip(columns, values):
+                    trace[name].append(float(value))
+            return trace
+
+        file.seek(0)
+        for i, sample in enumerate(read_data_lines(file)):
+            trace["time_s"].append(i * interval_s)
+            trace["temperature_c"].append(sample["temp"])
+            trace["duty"].append(sample.get(duty_key, 0.0))
+    return trace
+
+
+def infer_load_w(trace, plant, ambient_c, window_s=60):
+    """Estimate the heat load of a trace by inverting the thermal_plant
+
+    Args:
+    trace: from read_trace()
+    plant: thermal_plant with the parameters of the PC
+    ambient_c: the air temperature during the trace
+    window_s: the load is estimated as a constant over windows this long,
+    which averages out the 0.125 C steps of the sensor
+
+    Returns:
+    a list with the load in watts at each sample of the trace.
+    """
+    times = trace["time_s"]
+    temperatures = trace["temperature_c"]
+    duties = trace["duty"]
+    count = len(times)
+    loads = [0.0] * count
+    start = 0
+    while start < count - 1:
+        end = start + 1
+        while end < count - 1 and times[end] - times[start] < window_s:
+            end += 1
+        dt_s = times[end] - times[start]
+        if dt_s <= 0:
+            # Repeated timestamps at the end of the trace: nothing to fit
+            for i in range(start + 1, end + 1):
+                loads[i] = loads[start]
+            start = end
+            continue
+        duty = sum(duties[start:end]) / (end - start)
+        resistance = plant.thermal_resistance(plant.rpm_for_duty(duty))
+        decay = math.exp(-dt_s / (resistance * plant.heat_capacity_j_per_c))
+        target = (temperatures[end] - decay * temperatures[start]) / (1 - decay)
+        load_w = max(0.0, (target - ambient_c) / resistance)
+        for i in range(start, end + 1):
+            loads[i] = load_w
+        start = end
+    return loads
+
+
+def trace_scenario(
+    path, plant, ambient_c=22.0, interval_s=DATA_INTERVAL_SECONDS, window_s=60
+):
+    """Return a thermal.scenario that replays the load of a recorded trace
+
+    Args:
+    path: a DATA log or CSV trace
+    plant: thermal_plant with the parameters of the PC, used to infer the
+    load of a DATA log
+    ambient_c: the air temperature during the trace
+    interval_s: seconds between the lines of a DATA log
+    window_s: see infer_load_w()
+
+    Returns:
+    a thermal.scenario named after the file.
+    """
+    trace = read_trace(path, interval_s)
+    if not trace["time_s"]:
+        raise ValueError("No samples in {}".format(path))
+    if "load_w" in trace:
+        loads = trace["load_w"]
+    else:
+        loads = infer_load_w(trace, plant, ambient_c, window_s)
+    times = trace["time_s"]
+    step_s = interval_s
+    if len(times) > 1 and times[-1] > times[0]:
+        step_s = (times[-1] - times[0]) / (len(times) - 1)
+
+    def load_w(t_s):
+        i = int((t_s - times[0]) / step_s)
+        return loads[min(max(i, 0), len(loads) - 1)]
+
+    return scenario(path, times[-1] - times[0] + step_s, load_w, lambda t_s: ambient_c)
@@ -0,0 +1,119 @@
+"""A virtual clock so code written for the board runs faster than real time on a host
+
+install() replaces time.monotonic(), time.monotonic_ns(), time.time() and
+time.sleep() with the virtual clock, and makes asyncio.run() use an event
+loop that advances the virtual clock instead of waiting. Everything that
+imports time or asyncio after (or before) install() sees virtual time until
+uninstall() is called.
+
+When the clock reaches end_s, it raises SimulationComplete, which stops the
+main loop of code.py.
+"""
+
+import asyncio
+import selectors
+import time
+
+
+class SimulationComplete(Exception):
+    """Raised by the virtual clock when the simulation has run long enough"""
+
+
+class virtual_clock:
+    """Monotonic time that only moves when it is advanced"""
+
+    def __init__(self, start_s=0.0, end_s=None, epoch_s=1700000000.0):
+        """Initializes the clock
+
+        Args:
+        start_s: the starting value of time.monotonic()
+        end_s: raise SimulationComplete once time.monotonic() reaches this
+        epoch_s: the value of time.time() when time.monotonic() is 0
+
+        Returns:
+        None.
+        """
+        self.now_ns = int(start_s * 1000000000)
+        self.end_ns = None if end_s is None else int(end_s * 1000000000)
+        self._epoch_s = epoch_s
+        self._finished = False
+        self._saved = None
+        self._saved_policy = None
+
+    def monotonic_ns(self):
+        return self.now_ns
+
+    def monotonic(self):
+        return self.now_ns / 1000000000
+
+    def time(self):
+        return self._epoch_s + self.now_ns / 1000000000
+
+    def sleep(self, seconds):
+        self.advance_ns(int(seconds * 1000000000))
+
+    def advance_ns(self, ns):
+        """Move the clock forward, raising SimulationComplete at end_s"""
+        if ns > 0:
+            self.now_ns += ns
+        if (
+            self.end_ns is not None
+            and self.now_ns >= self.end_ns
+            and not self._finished
+        ):
+            self._finished = True
+            raise SimulationComplete()
+
+    def install(self):
+        """Replace the time functions and asyncio event loop with virtual ones"""
+        self._saved = (time.monotonic, time.monotonic_ns, time.time, time.sleep)
+        time.monotonic = self.monotonic
+        time.monotonic_ns = self.monotonic_ns
+        time.time = self.time
+        time.sleep = self.sleep
+        self._saved_policy = asyncio.get_event_loop_policy()
+        asyncio.set_event_loop_policy(_virtual_policy(self))
+
+    def uninstall(self):
+        """Restore the real time functions and asyncio event loop"""
+        if self._saved is None:
+            return
+        time.monotonic, time.monotonic_ns, time.time, time.sleep = self._saved
+        asyncio.set_event_loop_policy(self._saved_policy)
+        self._saved = None
+
+
+class _virtual_selector(selectors.DefaultSelector):
+    """Advances the clock by the timeout instead of blocking"""
+
+    def __init__(self, clock):
+        super().__init__()
+        self._clock = clock
+
+    def select(self, timeout=None):
+        ready = super().select(0)
+        if not ready:
+            if timeout is None:
+                raise RuntimeError("Nothing is scheduled, so virtual time stops")
+            self._clock.advance_ns(int(timeout * 1000000000))
+        return ready
+
+
+class _virtual_event_loop(asyncio.SelectorEventLoop):
+    def __init__(self, clock):
+        super().__init__(_virtual_selector(clock))
+        self._clock = clock
+        # Timers due within this many seconds are run without waiting
+        self._clock_resolution = 1e-9
+
+    def time(self):
+        return self._clock.monotonic()
+
+
+class _virtual_policy(asyncio.DefaultEventLoopPolicy):
+    def __init__(self, clock):
+        super().__init__()
+        self._clock = clock
+
+    def new_event_loop(self):
+        return _virtual_event_loop(self._clock)
@@ -39,6 +39,13 @@ class HT16K33:
     :param bool auto_write: True if the display should immediately change when
         set. If False, `show` must be called explicitly.
     :param float brightness: 0.0 - 1.0 default brightness level.
+
+    `show` remembers what it last sent to each device and skips devices whose
+    buffer has not changed. With ``changed_only`` set (the default) it only
+    sends the range of bytes that changed, using the auto-increment of the
+    display RAM address, so redrawing the same digits costs no I2C traffic.
+    With ``bulk_show`` set, `show` refreshes all the chained displays with
+    one lock of the bus instead of one per display.
     """
 
     def __init__(
@@ -52,12 +59,28 @@ class HT16K33:
             self.i2c_device = []
             for addr in address:
                 self.i2c_device.append(i2c_device.I2CDevice(i2c, addr))
+            self._addresses = tuple(address)
         else:
             self.i2c_device = [i2c_device.I2CDevice(i2c, address)]
+            self._addresses = (address,)
+        # The native I2CDevice does not expose its bus or address, which a
+        # bulk_show needs to write to every device under one lock
+        self._i2c = i2c
         self._temp = bytearray(1)
         self._buffer_size = 17
         self._buffer = bytearray((self._buffer_size) * len(self.i2c_device))
+        # The buffer as last sent to each device, and whether it was sent yet
+        self._shown = bytearray(len(self._buffer))
+        self._shown_valid = [False] * len(self.i2c_device)
+        self.changed_only = True
+        self.bulk_show = False
+        # Views of the buffer of each device, so show() does not copy them
+        self._views = [
+            memoryview(self._buffer)[offset : offset + self._buffer_size]
+            for offset in range(0, len(self._buffer), self._buffer_size)
+        ]
         self._auto_write = auto_write
+        self._batch = _Batch(self)
         self.fill(0)
         for i, _ in enumerate(self.i2c_device):
             self._write_cmd(_HT16K33_OSCILATOR_ON, i)
@@ -117,15 +140,79 @@ class HT16K33:
         else:
             raise ValueError("Must set to either True or False.")
 
-    def show(self) -> None:
-        """Refresh the display and show the changes."""
-        for index, i2c_dev in enumerate(self.i2c_device):
-            with i2c_dev:
-                # Byte 0 is 0x00, address of LED data register. The remaining 16
-                # bytes are the display register data to set.
-                offset = index * self._buffer_size
-                buffer = self._buffer[offset : offset + self._buffer_size]
-                i2c_dev.write(buffer)
+    def batch(self) -> "_Batch":
+        """Defer the writes of drawing operations to one `show` at the end.
+
+        Use as ``with display.batch():``. Inside the block auto_write is off;
+        at the end of the outermost block auto_write is restored and, if it
+        was on, the display is refreshed once. Blocks may be nested. If the
+        block raises an exception auto_write is restored without a refresh.
+        """
+        return self._batch
+
+    def show(self, force: bool = False) -> None:
+        """Refresh the display and show the changes.
+
+        :param bool force: Write the whole buffer to every device even if it
+            has not changed, for example after the displays lost power.
+        """
+        if self.bulk_show and len(self.i2c_device) > 1:
+            # All the chained displays are on the same bus
+            i2c = self._i2c
+            while not i2c.try_lock():
+                pass
+            try:
+                for index in range(len(self.i2c_device)):
+                    self._show_device(index, force, i2c)
+            finally:
+                i2c.unlock()
+        else:
+            for index in range(len(self.i2c_device)):
+                self._show_device(index, force, None)
+
+    def _show_device(self, index: int, force: bool, i2c: Optional[I2C]) -> None:
+        """Write the changes in the buffer of one device.
+
+        Writes through the device's own lock, or straight to i2c if the
+        caller already holds the bus lock.
+        """
+        size = self._buffer_size
+        offset = index * size
+        first = 1
+        last = size - 1
+        if not force and self._shown_valid[index]:
+            while (
+                first < size
+                and self._buffer[offset + first] == self._shown[offset + first]
+            ):
+                first += 1
+            if first == size:
+                return
+            while self._buffer[offset + last] == self._shown[offset + last]:
+                last -= 1
+        if not self.changed_only:
+            first = 1
+            last = size - 1
+
+        # Byte 0 is 0x00, address of LED data register. The remaining 16
+        # bytes are the display register data to set. A partial write borrows
+        # the byte before the changed range for its RAM address.
+        view = self._views[index]
+        start = first - 1
+        saved = view[start]
+        view[start] = start
+        try:
+            i2c_dev = self.i2c_device[index]
+            if i2c is None:
+                with i2c_dev:
+                    i2c_dev.write(view, start=start, end=last + 1)
+            else:
+                i2c.writeto(self._addresses[index], view, start=start, end=last + 1)
+        finally:
+            view[start] = saved
+        for i in range(offset + first, offset + last + 1):
+            self._shown[i] = self._buffer[i]
+        self._shown_valid[index] = True
 
     def fill(self, color: bool) -> None:
         """Fill the whole display with the given color.
@@ -162,3 +249,29 @@ class HT16K33:
 
     def _get_buffer(self, i: int) -> int:
         return self._buffer[i + 1]  # Offset by 1 to move past register address.
+
+
+class _Batch:
+    """Context manager returned by `HT16K33.batch`. Not intended for direct use."""
+
+    # pylint: disable=protected-access
+
+    def __init__(self, display: HT16K33) -> None:
+        self._display = display
+        self._depth = 0
+        self._auto_write = False
+
+    def __enter__(self) -> HT16K33:
+        if self._depth == 0:
+            self._auto_write = self._display._auto_write
+            self._display._auto_write = False
+        self._depth += 1
+        return self._display
+
+    def __exit__(self, exc_type, exc_value, traceback) -> bool:
+        self._depth -= 1
+        if self._depth == 0:
+            self._display._auto_write = self._auto_write
+            if self._auto_write and exc_type is None:
+                self._display.show()
+        return False
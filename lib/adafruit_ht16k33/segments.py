@@ -187,6 +187,12 @@ class Seg14x4(HT16K33):
 
         self._chars = chars_per_display * len(self.i2c_device)
         self._bytes_per_char = 2
+        # Segments of each character for _render(), and the frames of the
+        # strings print_text() showed last, least recently used first
+        self._cells = [0] * self._chars
+        self._frame_cache = {}
+        self._frame_order = []
+        self.frame_cache_size = 8
         self._last_nb_scroll_time = -1
         self._nb_scroll_text = None
         self._nb_scroll_index = -1
@@ -210,6 +216,67 @@ class Seg14x4(HT16K33):
         if self._auto_write:
             self.show()
 
+    def print_text(self, text: str) -> None:
+        """Show the text on a blank display, the same as ``fill(0)`` followed by
+        ``print(text)`` but with one refresh.
+
+        The segments of the whole string are computed in one pass, and the
+        frames of the last ``frame_cache_size`` strings are kept, so showing a
+        recent string again only copies its frame into the buffer.
+
+        :param str text: The text to display
+        """
+        frame = self._frame_cache.get(text)
+        if frame is None:
+            if self._frame_order and len(self._frame_order) >= self.frame_cache_size:
+                # Reuse the frame of the least recently shown string
+                frame = self._frame_cache.pop(self._frame_order.pop(0))
+            else:
+                frame = bytearray(len(self._buffer))
+            self._render(text, frame)
+            if self.frame_cache_size > 0:
+                self._frame_cache[text] = frame
+                self._frame_order.append(text)
+        elif self._frame_order[-1] != text:
+            self._frame_order.remove(text)
+            self._frame_order.append(text)
+        self._buffer[:] = frame
+        if self._auto_write:
+            self.show()
+
+    def _char_segments(self, char: str) -> int:
+        """Return the segments of a character, high byte first."""
+        if not 32 <= ord(char) <= 127:
+            return 0
+        if char == ".":
+            return 0x4000
+        character = ord(char) * 2 - 64
+        return CHARS[character] << 8 | CHARS[1 + character]
+
+    def _render(self, text: str, frame: bytearray) -> None:
+        """Render the text into frame as fill(0) then _text(text) would.
+
+        Instead of scrolling the buffer for every character, the characters
+        go into a ring of cells that is written to the frame once.
+        """
+        cells = self._cells
+        chars = self._chars
+        for i in range(chars):
+            cells[i] = 0
+        last = chars - 1  # the cell of the newest character
+        for char in text:
+            if char == "." and not cells[last] & 0x4000:
+                cells[last] |= 0x4000
+                continue
+            last = (last + 1) % chars
+            cells[last] = self._char_segments(char)
+        for i in range(len(frame)):
+            frame[i] = 0
+        for index in range(chars):
+            segments = cells[(last + 1 + index) % chars]
+            frame[self._adjusted_index(index * 2) + 1] = segments & 0xFF
+            frame[self._adjusted_index(index * 2 + 1) + 1] = segments >> 8
+
     def print_hex(self, value: Union[int, str]) -> None:
         """Print the value as a hexidecimal string to the display.
 
@@ -286,13 +353,15 @@ class Seg14x4(HT16K33):
         :return: The output text string to be displayed
         """
 
-        auto_write = self._auto_write
-        self._auto_write = False
+        with self.batch():
+            return self._number_text(number, decimal)
+
+    def _number_text(self, number: float, decimal: int) -> str:
+        """Display a number without refreshing, see _number()."""
         stnum = str(number)
         dot = stnum.find(".")
 
         if (len(stnum) > self._chars + 1) or ((len(stnum) > self._chars) and (dot < 0)):
-            self._auto_write = auto_write
             raise ValueError(
                 "Input overflow - {0} is too large for the display!".format(number)
             )
@@ -318,11 +387,9 @@ class Seg14x4(HT16K33):
             txt = stnum[:places]
 
         if len(txt) > self._chars + 1:
-            self._auto_write = auto_write
             raise ValueError("Output string ('{0}') is too long!".format(txt))
 
         self._text(txt)
-        self._auto_write = auto_write
 
         return txt
 
@@ -494,6 +561,117 @@ class _AbstractSeg7x4(Seg14x4):
                 self._put(" ", self._chars - 1)
             self._put(char, self._chars - 1)
 
+    def _char_segments(self, char: str) -> int:
+        """Return the segments of a character that _put() would set."""
+        if self._chardict and char in self._chardict:
+            return self._chardict[char]
+        char = char.lower()
+        if char == ".":
+            return 0b10000000
+        if char in "abcdefghijklmnopqrstuvwxy":
+            return NUMBERS[ord(char) - 97 + 10]
+        if char == "-":
+            return NUMBERS[36]
+        if char in "0123456789":
+            return NUMBERS[ord(char) - 48]
+        return 0
+
+    def _render(self, text: str, frame: bytearray) -> None:
+        """Render the text into frame as fill(0) then _text(text) would."""
+        cells = self._cells
+        chars = self._chars
+        for i in range(chars):
+            cells[i] = 0
+        last = chars - 1  # the cell of the newest character
+        colon = 0
+        for char in text:
+            if char in ":;":
+                colon = 0x02 if char == ":" else 0x00
+                continue
+            if char == "." and not cells[last] & 0b10000000:
+                if self._chardict and char in self._chardict:
+                    cells[last] = self._chardict[char]
+                else:
+                    cells[last] |= 0b10000000
+                continue
+            last = (last + 1) % chars
+            cells[last] = self._char_segments(char)
+        for i in range(len(frame)):
+            frame[i] = 0
+        frame[4 + 1] = colon
+        for index in range(chars):
+            frame[self._adjusted_index(index) + 1] = cells[(last + 1 + index) % chars]
+
+    def print_int(self, value: int) -> None:
+        """Print an integer right aligned on a blank display, without formatting
+        it as a string first.
+
+        :param int value: The integer to print
+        """
+        self.print_fixed(value)
+
+    def segments_for(self, text: str) -> bytes:
+        """Return the segments of each character of text, to pass as the
+        suffix of `print_fixed`. Call it once rather than on every refresh.
+
+        :param str text: The characters, for example " C"
+        """
+        return bytes(self._char_segments(char) for char in text)
+
+    def print_fixed(self, value: float, decimals: int = 0, suffix: bytes = b"") -> None:
+        """Print a number with a fixed number of decimal places right aligned on
+        a blank display, like ``print_text("%.1f C" % value)`` but without
+        allocating strings. The digits go straight from `NUMBERS` into the buffer.
+
+        :param float value: The number to print
+        :param int decimals: The number of decimal places. The decimal point is
+            shown on the units digit.
+        :param bytes suffix: Segments to show after the number, one byte per
+            digit, from `segments_for`, for example ``segments_for(" C")``
+        :raises ValueError: if the number does not fit on the display, or is
+            not finite. The buffer is left as it was.
+        """
+        try:
+            if decimals:
+                count = round(value * 10**decimals)
+            else:
+                count = round(value)
+        except OverflowError as error:
+            raise ValueError("Cannot display {0}".format(value)) from error
+        negative = count < 0
+        if negative:
+            count = -count
+
+        digits = 1
+        rest = count // 10
+        while rest:
+            digits += 1
+            rest //= 10
+        if digits <= decimals:
+            digits = decimals + 1
+        if digits + negative + len(suffix) > self._chars:
+            raise ValueError(
+                "Input overflow - {0} is too large for the display!".format(value)
+            )
+
+        for i in range(len(self._buffer)):
+            self._buffer[i] = 0
+        index = self._chars - 1
+        for i in range(len(suffix) - 1, -1, -1):
+            self._set_buffer(self._adjusted_index(index), suffix[i])
+            index -= 1
+        for digit in range(digits):
+            segments = NUMBERS[count % 10]
+            if decimals and digit == decimals:
+                segments |= 0b10000000
+            self._set_buffer(self._adjusted_index(index), segments)
+            count //= 10
+            index -= 1
+        if negative:
+            self._set_buffer(self._adjusted_index(index), NUMBERS[36])
+        if self._auto_write:
+            self.show()
+
     def _put(self, char: str, index: int = 0) -> None:
         """Put a character at the specified place."""
         # pylint: disable=too-many-return-statements
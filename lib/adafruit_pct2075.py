@@ -103,10 +103,16 @@ class PCT2075:
 
             temperature = pct.temperature
 
+        :attr:`temperature` and :attr:`temperature_raw` read the sensor through
+        preallocated buffers, so polling them does not allocate. :meth:`read_all`
+        reads every register in one bus session for diagnostics.
+
     """
 
     def __init__(self, i2c_bus: I2C, address: int = PCT2075_DEFAULT_ADDRESS) -> None:
         self.i2c_device = i2cdevice.I2CDevice(i2c_bus, address)
+        self._pointer = bytearray(1)
+        self._raw = bytearray(2)
 
     _temperature = ROUnaryStruct(PCT2075_REGISTER_TEMP, ">h")
     mode = RWBit(PCT2075_REGISTER_CONFIG, 1, register_width=1)
@@ -134,7 +140,55 @@ class PCT2075:
     def temperature(self) -> float:
         """Returns the current temperature in degrees Celsius.
         Resolution is 0.125 degrees Celsius"""
-        return (self._temperature >> 5) * 0.125
+        return self.temperature_raw * 0.125
+
+    @property
+    def temperature_raw(self) -> int:
+        """Returns the current temperature as a signed count of 0.125 degrees
+        Celsius, read without allocating."""
+        with self.i2c_device as i2c:
+            value = self._read_register(i2c, PCT2075_REGISTER_TEMP, 2)
+        if value & 0x8000:
+            value -= 0x10000
+        return value >> 5
+
+    def _read_register(self, i2c: i2cdevice.I2CDevice, register: int, size: int) -> int:
+        """Read a 1 or 2 byte register as an unsigned integer, with the bus locked"""
+        self._pointer[0] = register
+        i2c.write_then_readinto(self._pointer, self._raw, in_end=size)
+        if size == 1:
+            return self._raw[0]
+        return self._raw[0] << 8 | self._raw[1]
+
+    def read_all(self) -> dict:
+        """Reads the TEMP, CONF, THYST, TOS and TIDLE registers in one bus session.
+
+        :return: a dictionary of the raw register values ``"temp"``, ``"conf"``,
+            ``"thyst"``, ``"tos"`` and ``"tidle"``, and the decoded
+            ``"temperature"``, ``"temperature_hysteresis"``,
+            ``"high_temperature_threshold"`` and ``"delay_between_measurements"``
+        """
+        with self.i2c_device as i2c:
+            temp = self._read_register(i2c, PCT2075_REGISTER_TEMP, 2)
+            conf = self._read_register(i2c, PCT2075_REGISTER_CONFIG, 1)
+            thyst = self._read_register(i2c, PCT2075_REGISTER_THYST, 2)
+            tos = self._read_register(i2c, PCT2075_REGISTER_TOS, 2)
+            tidle = self._read_register(i2c, PCT2075_REGISTER_TIDLE, 1)
+
+        def signed(value):
+            return value - 0x10000 if value & 0x8000 else value
+
+        return {
+            "temp": temp,
+            "conf": conf,
+            "thyst": thyst,
+            "tos": tos,
+            "tidle": tidle,
+            "temperature": (signed(temp) >> 5) * 0.125,
+            "temperature_hysteresis": (signed(thyst) >> 7) * 0.5,
+            "high_temperature_threshold": (signed(tos) >> 7) * 0.5,
+            "delay_between_measurements": (tidle & 0x1F) * 100,
+        }
 
     @property
     def high_temperature_threshold(self) -> float:
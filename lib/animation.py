@@ -0,0 +1,174 @@
+"""Library to animate an HT16K33 segment display without blocking in CircuitPython
+
+Each effect is a generator that draws one step on the display and then
+yields the number of seconds until its next step. An animator steps the
+effects that are due and returns the time until the next deadline, so the
+caller (or animator.run() as an asyncio task) can sleep until then instead
+of spinning on time.monotonic() like Seg14x4.marquee(). An effect that
+raises an exception is printed and dropped, and the others carry on.
+
+Effects:
+scroll: scroll text across the display one character at a time
+blink: alternate between text and a blank display
+alternate: rotate between functions that each draw a value, for example
+the temperature, RPM and fan duty
+"""
+
+import asyncio
+import time
+
+
+def scroll(display, text, delay_s=0.25, loop=True, space_between=False):
+    """Scroll text across the display from the right, like Seg14x4.marquee()
+
+    A "." is drawn together with the character before it, so it does not
+    take a step of its own.
+
+    Args:
+    display: a Seg14x4, Seg7x4 or BigSeg7x4
+    text: the text to scroll
+    delay_s: seconds between characters
+    loop: start again at the end of the text
+    space_between: scroll a blank between the end and the start of the text
+
+    Yields:
+    the seconds until the next step.
+    """
+    display.fill(0)
+    while True:
+        for i, char in enumerate(text):
+            display.print(char)
+            if char != "." and i + 1 < len(text) and text[i + 1] == ".":
+                continue
+            yield delay_s
+        if not loop:
+            return
+        if space_between:
+            display.print(" ")
+            yield delay_s
+
+
+def blink(display, text, on_s=0.5, off_s=0.5, count=None):
+    """Alternate between text and a blank display
+
+    Args:
+    display: a Seg14x4, Seg7x4 or BigSeg7x4
+    text: the text to blink
+    on_s, off_s: seconds the text is shown and hidden
+    count: the number of blinks. Forever if None.
+
+    Yields:
+    the seconds until the next step.
+    """
+    blinks = 0
+    while count is None or blinks < count:
+        display.print_text(text)
+        yield on_s
+        display.fill(0)
+        yield off_s
+        blinks += 1
+
+
+def alternate(draw_functions, period_s=2):
+    """Call each function in turn to draw a value on the display
+
+    Args:
+    draw_functions: functions with no arguments that draw on the display
+    period_s: seconds each value is shown
+
+    Yields:
+    the seconds until the next step.
+    """
+    while True:
+        for draw in draw_functions:
+            draw()
+            yield period_s
+
+
+class animator:
+    """Steps display effects when their deadlines come"""
+
+    __slots__ = ("_effects", "_deadlines_ns")
+
+    def __init__(self):
+        self._effects = []
+        self._deadlines_ns = []
+
+    def start(self, effect, delay_s=0, now_ns=None):
+        """Add an effect, first stepped after delay_s seconds
+
+        Args:
+        effect: a generator such as scroll(), blink() or alternate()
+        delay_s: seconds until the first step
+        now_ns: the current time.monotonic_ns(). Read from the clock if None.
+
+        Returns:
+        the effect, to pass to stop().
+        """
+        if now_ns is None:
+            now_ns = time.monotonic_ns()
+        self._effects.append(effect)
+        self._deadlines_ns.append(now_ns + int(delay_s * 1000000000))
+        return effect
+
+    def stop(self, effect=None):
+        """Remove an effect, or all of them if effect is None"""
+        if effect is None:
+            self._effects = []
+            self._deadlines_ns = []
+            return
+        for i, running in enumerate(self._effects):
+            if running is effect:
+                del self._effects[i]
+                del self._deadlines_ns[i]
+                return
+
+    def __len__(self):
+        return len(self._effects)
+
+    def step(self, now_ns=None):
+        """Step the effects whose deadlines have passed
+
+        Args:
+        now_ns: the current time.monotonic_ns(). Read from the clock if None.
+
+        Returns:
+        the seconds until the next deadline, or None if no effect is running.
+        """
+        if now_ns is None:
+            now_ns = time.monotonic_ns()
+        i = 0
+        while i < len(self._effects):
+            deadline_ns = self._deadlines_ns[i]
+            if deadline_ns <= now_ns:
+                try:
+                    delay_ns = int(next(self._effects[i]) * 1000000000)
+                except StopIteration:
+                    del self._effects[i]
+                    del self._deadlines_ns[i]
+                    continue
+                except Exception as e:  # pylint: disable=broad-except
+                    # A display fault must not stop the tasks run alongside
+                    print("Stopping an animation that failed: %r" % e)
+                    del self._effects[i]
+                    del self._deadlines_ns[i]
+                    continue
+                # Stay on the grid of deadlines unless the step came too late
+                deadline_ns += delay_ns
+                if deadline_ns <= now_ns:
+                    deadline_ns = now_ns + delay_ns
+                self._deadlines_ns[i] = deadline_ns
+            i += 1
+        if not self._deadlines_ns:
+            return None
+        return (min(self._deadlines_ns) - now_ns) / 1000000000
+
+    async def run(self, idle_s=1):
+        """Step the effects forever, sleeping until the next deadline
+
+        Args:
+        idle_s: seconds to sleep while no effect is running
+        """
+        while True:
+            delay_s = self.step()
+            await asyncio.sleep(idle_s if delay_s is None else delay_s)
@@ -0,0 +1,230 @@
+"""Library for relay auto-tuning of the fan PID gains in CircuitPython
+
+The Astrom-Hagglund relay experiment replaces the controller with a relay:
+the fan runs at 'high' while the temperature is above the set point and at
+'low' while it is below, with a little hysteresis so sensor noise does not
+chatter the relay. The temperature settles into an oscillation whose
+period Pu and amplitude a give the ultimate gain of the system:
+
+    Ku = 4 * d / (pi * sqrt(a^2 - hysteresis^2))    d = (high - low) / 2
+
+and the Ziegler-Nichols rules turn Ku and Pu into gains. pid_fan_control
+is a PI controller, so the PI rule is used: Kp = 0.45 * Ku, Ti = Pu / 1.2.
+Ki is returned in the units of Ki in code.py, per degree per ms.
+pid_fan_control clamps the integral term to +-0.2; see gains().
+
+relay_autotune keeps only running sums, so it uses a fixed few bytes of
+memory however long the experiment runs.
+
+save_gains() and load_gains() keep the result in a small JSON file so it
+is used on the next boot.
+"""
+
+import json
+import math
+import os
+import time
+
+STATE_RUNNING = "running"
+STATE_DONE = "done"
+STATE_FAILED = "failed"
+
+
+class relay_autotune:
+    """Runs the relay experiment, one temperature at a time"""
+
+    __slots__ = (
+        "set_point",
+        "_high",
+        "_low",
+        "_hysteresis",
+        "_cycles",
+        "_max_duration_ns",
+        "_start_ns",
+        "_output",
+        "_cycle_start_ns",
+        "_cycle_max",
+        "_cycle_min",
+        "_cycles_seen",
+        "_period_sum_ns",
+        "_amplitude_sum",
+        "state",
+        "ultimate_gain",
+        "ultimate_period_s",
+    )
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        set_point,
+        high=1.0,
+        low=0.0,
+        hysteresis_c=0.25,
+        cycles=3,
+        max_duration_s=4 * 3600,
+    ):
+        """Initializes the experiment
+
+        Args:
+        set_point: the temperature to oscillate around
+        high: the fan output while the temperature is above the set point
+        low: the fan output while it is below
+        hysteresis_c: the temperature must pass this far beyond the set
+        point to switch the relay. At least the sensor resolution.
+        cycles: the number of full oscillations to average, after the first
+        one which is skipped while the oscillation settles
+        max_duration_s: give up if the experiment has not finished by then
+
+        Returns:
+        None.
+        """
+        if high <= low:
+            raise ValueError("high must be greater than low")
+        self.set_point = set_point
+        self._high = high
+        self._low = low
+        self._hysteresis = hysteresis_c
+        self._cycles = cycles
+        self._max_duration_ns = int(max_duration_s * 1000000000)
+        self._start_ns = None
+        self._output = high
+        self._cycle_start_ns = None
+        self._cycle_max = None
+        self._cycle_min = None
+        self._cycles_seen = 0
+        self._period_sum_ns = 0
+        self._amplitude_sum = 0.0
+        self.state = STATE_RUNNING
+        self.ultimate_gain = None
+        self.ultimate_period_s = None
+
+    def update(self, temperature, now_ns=None):
+        """Step the relay with a new temperature
+
+        Args:
+        temperature: the current temperature
+        now_ns: time.monotonic_ns() of the reading. Read from the clock if
+        None.
+
+        Returns:
+        the fan output to set, from low to high. Once the experiment is
+        over, the output is low; check state.
+        """
+        if self.state != STATE_RUNNING:
+            return self._low
+        if now_ns is None:
+            now_ns = time.monotonic_ns()
+        if self._start_ns is None:
+            self._start_ns = now_ns
+            self._output = self._high if temperature > self.set_point else self._low
+        if now_ns - self._start_ns > self._max_duration_ns:
+            self.state = STATE_FAILED
+            return self._low
+
+        if self._cycle_start_ns is not None:
+            if temperature > self._cycle_max:
+                self._cycle_max = temperature
+            if temperature < self._cycle_min:
+                self._cycle_min = temperature
+
+        if self._output == self._low:
+            if temperature > self.set_point + self._hysteresis:
+                self._output = self._high
+                self._end_cycle(temperature, now_ns)
+        elif temperature < self.set_point - self._hysteresis:
+            self._output = self._low
+        return self._output
+
+    def _end_cycle(self, temperature, now_ns):
+        """Account for a full oscillation ending with the switch to high"""
+        if self._cycle_start_ns is not None:
+            self._cycles_seen += 1
+            # The first cycle starts from wherever the temperature was, so
+            # it is only used to settle
+            if self._cycles_seen > 1:
+                self._period_sum_ns += now_ns - self._cycle_start_ns
+                self._amplitude_sum += (self._cycle_max - self._cycle_min) / 2
+            if self._cycles_seen > self._cycles:
+                self._finish()
+                return
+        self._cycle_start_ns = now_ns
+        self._cycle_max = temperature
+        self._cycle_min = temperature
+
+    def _finish(self):
+        count = self._cycles_seen - 1
+        amplitude = self._amplitude_sum / count
+        if amplitude <= self._hysteresis:
+            self.state = STATE_FAILED
+            return
+        relay = (self._high - self._low) / 2
+        self.ultimate_gain = (
+            4 * relay / (math.pi * math.sqrt(amplitude**2 - self._hysteresis**2))
+        )
+        self.ultimate_period_s = self._period_sum_ns / count / 1000000000
+        self.state = STATE_DONE
+
+    def gains(self):
+        """Return the PI gains for pid_fan_control, or None if not done
+
+        Ki is Kp / Ti as the rule gives it. The PIDController of
+        pid_fan_control integrates the error over time as the rule assumes,
+        but clamps the integral term to +-0.2, so a large error for a long
+        time gets less integral action than Ti asks for.
+
+        Returns:
+        a dictionary of "kp" (output per degree) and "ki" (output per
+        degree per ms), plus the "ku" and "pu_s" they came from.
+        """
+        if self.state != STATE_DONE:
+            return None
+        kp = 0.45 * self.ultimate_gain
+        ti_s = self.ultimate_period_s / 1.2
+        return {
+            "kp": kp,
+            "ki": kp / (ti_s * 1000),
+            "ku": self.ultimate_gain,
+            "pu_s": self.ultimate_period_s,
+        }
+
+
+def save_gains(path, gains):
+    """Save gains to a JSON file, replacing it only once fully written
+
+    Errors writing the file, such as a read-only filesystem, are printed
+    rather than raised.
+
+    Returns:
+    True if the gains were saved.
+    """
+    temp_path = path + ".tmp"
+    try:
+        with open(temp_path, "w") as f:
+            json.dump(gains, f)
+        # The rename cannot replace a file on the board's FAT filesystem
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        os.rename(temp_path, path)
+    except OSError as e:
+        print("Could not save gains to %s: %s" % (path, e))
+        return False
+    return True
+
+
+def load_gains(path):
+    """Return the gains saved by save_gains(), or None if there are none"""
+    try:
+        os.stat(path)
+    except OSError:
+        # A reset between the remove and the rename in save_gains() leaves
+        # only the new file, which was complete before the remove
+        path = path + ".tmp"
+    try:
+        with open(path) as f:
+            gains = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(gains, dict) or "kp" not in gains or "ki" not in gains:
+        return None
+    return gains
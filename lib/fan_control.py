@@ -0,0 +1,105 @@
+"""Fan control algorithms, shared by code.py and the host simulators
+
+Each function maps the current temperature to a fan output from 0 (off) to
+1 (full speed).
+
+pid_fan_control: the output of a PIDController made by fan_pid(),
+optionally on top of a feed-forward output from a fan curve. The
+controller keeps its integral as state, so each update is O(1); code.py
+records the integral with each sample and seeds a new controller with it
+after a reset.
+
+simple_fan_control: a fan curve of the temperature.
+"""
+
+try:
+    from fan_curve import fan_curve
+    from pid import PIDController
+except ImportError:
+    # Imported as lib.fan_control, as the unit tests do
+    from .fan_curve import fan_curve
+    from .pid import PIDController
+
+# Outputs below this turn the fan off rather than spinning it too slowly
+PID_MIN_OUTPUT = 0.1
+# The integral term accounts for at most this much of the output
+PID_INTEGRAL_LIMIT = 0.2
+
+# The breakpoints of the original step function, interpolated so the fan
+# ramps between them rather than jumping.
+SIMPLE_CURVE = fan_curve(((31, 0), (32, 0.1), (35, 0.25), (38, 0.75), (41, 1)))
+
+
+def fan_pid(set_point, kp, ki, integral=0.0):
+    """Return a PIDController for pid_fan_control
+
+    Args:
+    set_point: the temperature to aim for
+    kp: proportional gain, output per degree of error
+    ki: integral gain, output per degree of error per ms, the units of Ki in
+    code.py and of the auto-tuned gains
+    integral: starting value of the integral term, such as the last
+    "pid_integral" recorded before a reset
+
+    Returns:
+    a PIDController with an output from 0 to 1 and the integral term
+    limited to +/-PID_INTEGRAL_LIMIT.
+    """
+    pid = PIDController(
+        kp,
+        ki * 1000,
+        set_point=set_point,
+        integral_min=-PID_INTEGRAL_LIMIT,
+        integral_max=PID_INTEGRAL_LIMIT,
+    )
+    pid.reset(integral)
+    return pid
+
+
+def pid_fan_control(temperature, pid, feed_forward=0, verbose=True, now_ns=None):
+    """Compute the fan output with a PID controller
+
+    Args:
+    temperature: the current temperature
+    pid: the PIDController from fan_pid()
+    feed_forward: output to add before the limits, such as a fan curve's
+    output at this temperature, so the PID terms only correct what is left
+    verbose: print the terms of the calculation
+    now_ns: time.monotonic_ns() of the temperature. Read from the clock if
+    None.
+
+    Returns:
+    0 below an output of PID_MIN_OUTPUT, otherwise the output up to 1
+    """
+    if verbose:
+        print(
+            "  >>>PID: Current temp=%f error=%f"
+            % (temperature, temperature - pid.set_point)
+        )
+    percent_on_pid = pid.update(temperature, now_ns, feed_forward)
+    if verbose:
+        print(
+            "  >>>PID: Integral Output: %f Total Output: %f"
+            % (pid.integral, percent_on_pid)
+        )
+    if percent_on_pid < PID_MIN_OUTPUT:
+        return 0
+    return percent_on_pid
+
+
+def simple_fan_control(temperature, curve=SIMPLE_CURVE):
+    """Map the temperature to a fan output with a fan curve.
+
+    This used to be a step function, which works, but the fan turns on
+    for a minute, then off for a minute. It's distracting. The curve
+    ramps between the old steps so the fan runs slowly at a more or less
+    constant speed.
+
+    Args:
+    temperature: the current temperature
+    curve: the fan_curve to use
+
+    Returns:
+    the output of the curve, from 0 to 1
+    """
+    return curve.output_at(temperature)
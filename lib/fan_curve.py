@@ -0,0 +1,158 @@
+"""Library for table driven fan curves in CircuitPython
+
+A fan curve is a table of (temperature, output) breakpoints sorted by
+temperature. The output at a temperature is found with a binary search of
+the table (CircuitPython has no bisect module) and linear interpolation
+between the two breakpoints around it. Below the first breakpoint the
+output is that of the first, above the last that of the last.
+
+A curve can have hysteresis: update() keeps the output up while the
+temperature falls, until it has dropped hysteresis_c below the highest
+recent temperature. Rising temperatures follow the curve at once.
+
+Curves are loaded from settings.toml or a JSON file:
+
+settings.toml (CircuitPython's os.getenv() only reads strings and
+integers, so the values are strings):
+FAN_CURVE = "30:0,35:0.3,45:1"
+FAN_CURVE_HYSTERESIS = "1.0"
+
+JSON, with one or more named curves:
+{"feed_forward": {"points": [[30, 0], [35, 0.3], [45, 1]], "hysteresis_c": 1.0}}
+"""
+
+import json
+import os
+from array import array
+
+
+class fan_curve:
+    """Piecewise linear map from temperature to fan output"""
+
+    __slots__ = ("_temperatures", "_outputs", "_hysteresis", "_reference")
+
+    def __init__(self, points, hysteresis_c=0.0):
+        """Initializes the curve
+
+        Args:
+        points: (temperature, output) pairs, in increasing temperature order
+        hysteresis_c: how far the temperature must fall before update()
+        lowers the output
+
+        Returns:
+        None.
+
+        Raises:
+        ValueError if there are no points or they are not in increasing
+        temperature order.
+        """
+        if not points:
+            raise ValueError("A fan curve needs at least one point")
+        self._temperatures = array("f", [point[0] for point in points])
+        self._outputs = array("f", [point[1] for point in points])
+        for i in range(1, len(self._temperatures)):
+            if self._temperatures[i] <= self._temperatures[i - 1]:
+                raise ValueError("Fan curve temperatures must increase")
+        if hysteresis_c < 0:
+            raise ValueError("hysteresis_c must not be negative")
+        self._hysteresis = hysteresis_c
+        self.reset()
+
+    def reset(self):
+        """Forget the temperatures seen by update()"""
+        self._reference = None
+
+    def points(self):
+        """Return the breakpoints as a list of (temperature, output)"""
+        return list(zip(self._temperatures, self._outputs))
+
+    @property
+    def hysteresis_c(self):
+        return self._hysteresis
+
+    def output_at(self, temperature):
+        """Return the output of the curve at a temperature, without hysteresis"""
+        temperatures = self._temperatures
+        count = len(temperatures)
+        # Find the first breakpoint above the temperature
+        low = 0
+        high = count
+        while low < high:
+            mid = (low + high) // 2
+            if temperatures[mid] <= temperature:
+                low = mid + 1
+            else:
+                high = mid
+        if low == 0:
+            return self._outputs[0]
+        if low == count:
+            return self._outputs[count - 1]
+        t0 = temperatures[low - 1]
+        o0 = self._outputs[low - 1]
+        return o0 + (self._outputs[low] - o0) * (temperature - t0) / (
+            temperatures[low] - t0
+        )
+
+    def update(self, temperature):
+        """Return the output for a new temperature, with hysteresis"""
+        reference = self._reference
+        if reference is None or temperature > reference:
+            reference = temperature
+        elif temperature < reference - self._hysteresis:
+            reference = temperature + self._hysteresis
+        self._reference = reference
+        return self.output_at(reference)
+
+
+def parse_points(text):
+    """Parse "temperature:output,..." into a list of (temperature, output)"""
+    points = []
+    for pair in text.split(","):
+        temperature, output = pair.split(":")
+        points.append((float(temperature), float(output)))
+    return points
+
+
+def load_curves(path):
+    """Load the named curves from a JSON file
+
+    Returns:
+    a dictionary of fan_curve by name. Empty if the file does not exist.
+
+    Raises:
+    ValueError if the file is not a valid set of curves.
+    """
+    try:
+        with open(path) as f:
+            data = json.load(f)
+    except OSError:
+        return {}
+    curves = {}
+    try:
+        for name in data:
+            spec = data[name]
+            curves[name] = fan_curve(spec["points"], spec.get("hysteresis_c", 0.0))
+    except (AttributeError, KeyError, TypeError, IndexError) as e:
+        raise ValueError("Bad fan curve in {}: {}".format(path, e))
+    return curves
+
+
+def load_curve(path=None, name=None, setting="FAN_CURVE"):
+    """Load a curve from settings.toml, or else from a JSON file
+
+    Args:
+    path: JSON file of named curves, see load_curves()
+    name: the name of the curve in the file
+    setting: the settings.toml key of the points. The hysteresis is read
+    from setting + "_HYSTERESIS".
+
+    Returns:
+    the fan_curve, or None if neither has one.
+    """
+    text = os.getenv(setting)
+    if text:
+        hysteresis = os.getenv(setting + "_HYSTERESIS", 0)
+        return fan_curve(parse_points(str(text)), float(str(hysteresis)))
+    if path is None:
+        return None
+    return load_curves(path).get(name)
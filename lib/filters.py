@@ -0,0 +1,213 @@
+"""Streaming filters for noisy sensor readings in CircuitPython
+
+Each filter takes one reading at a time through update(), which returns the
+filtered value, and keeps only a small preallocated state. reset() forgets
+the readings seen so far.
+
+ema_filter: exponential moving average. O(1) per reading.
+
+median_filter: median of the last k readings. The readings are kept sorted,
+so the median is found in O(1) and a reading is placed with a binary search
+and a shift of at most k values.
+
+hampel_filter: replaces spikes with the median of the last k readings. A
+reading is a spike if it is further from the median than 'threshold'
+scaled median absolute deviations (MAD). O(k) per reading.
+
+The shifts and the MAD merge make the median and Hampel filters O(k)
+rather than O(log k). An O(log k) median needs a pair of indexed heaps or
+an order statistic tree, and the MAD needs more than that, all of which
+cost more in code size and per reading overhead on a microcontroller than
+moving a handful of floats within one preallocated array. k is small (5
+in code.py), so keep it that way unless a much larger window is needed.
+
+The filters can be used on their own or attached to a key of a sampler with
+sampler.add_filter().
+"""
+
+from array import array
+
+
+class ema_filter:
+    """Exponential moving average"""
+
+    __slots__ = ("_alpha", "_value")
+
+    def __init__(self, alpha):
+        """Initializes the filter
+
+        Args:
+        alpha: weight of each new reading, between 0 (exclusive) and 1.
+        Smaller values smooth more.
+
+        Returns:
+        None.
+        """
+        if not 0 < alpha <= 1:
+            raise ValueError("alpha must be in the range (0, 1]")
+        self._alpha = alpha
+        self.reset()
+
+    def reset(self):
+        """Forget the readings seen so far"""
+        self._value = None
+
+    def update(self, value):
+        """Add a reading and return the new average"""
+        if self._value is None:
+            self._value = value
+        else:
+            self._value += self._alpha * (value - self._value)
+        return self._value
+
+
+class median_filter:
+    """Median of the last k readings"""
+
+    __slots__ = ("_window", "_sorted", "_next", "_count")
+
+    def __init__(self, k):
+        """Initializes the filter
+
+        Args:
+        k: number of readings to take the median of.
+
+        Returns:
+        None.
+        """
+        if k < 1:
+            raise ValueError("k must be at least 1")
+        self._window = array("f", [0] * k)  # readings in arrival order
+        self._sorted = array("f", [0] * k)  # the same readings, sorted
+        self.reset()
+
+    def reset(self):
+        """Forget the readings seen so far"""
+        self._next = 0
+        self._count = 0
+
+    def _position(self, value):
+        """Binary search for the first sorted position with a value >= value"""
+        low = 0
+        high = self._count
+        while low < high:
+            mid = (low + high) // 2
+            if self._sorted[mid] < value:
+                low = mid + 1
+            else:
+                high = mid
+        return low
+
+    def push(self, value):
+        """Add a reading without computing the median"""
+        sorted_ = self._sorted
+        if self._count == len(self._window):
+            # Drop the oldest reading from the sorted values
+            i = self._position(self._window[self._next])
+            for j in range(i, self._count - 1):
+                sorted_[j] = sorted_[j + 1]
+            self._count -= 1
+        self._window[self._next] = value
+        self._next = (self._next + 1) % len(self._window)
+        # The stored reading may be rounded, so search for that
+        value = self._window[self._next - 1]
+        i = self._position(value)
+        for j in range(self._count, i, -1):
+            sorted_[j] = sorted_[j - 1]
+        sorted_[i] = value
+        self._count += 1
+
+    def count(self):
+        """Return the number of readings in the window"""
+        return self._count
+
+    def median(self):
+        """Return the median of the window, or None if it is empty"""
+        count = self._count
+        if not count:
+            return None
+        if count % 2:
+            return self._sorted[count // 2]
+        return (self._sorted[count // 2 - 1] + self._sorted[count // 2]) / 2
+
+    def mad(self):
+        """Return the median absolute deviation of the window
+
+        The deviations from the median grow outwards from the middle of the
+        sorted values, so they are merged from there without sorting.
+        """
+        count = self._count
+        if not count:
+            return None
+        sorted_ = self._sorted
+        median = self.median()
+        left = count // 2 - 1
+        right = count // 2
+        lower = 0
+        deviation = 0
+        for _ in range(count // 2 + 1):
+            lower = deviation
+            if right < count and (
+                left < 0 or sorted_[right] - median <= median - sorted_[left]
+            ):
+                deviation = sorted_[right] - median
+                right += 1
+            else:
+                deviation = median - sorted_[left]
+                left -= 1
+        if count % 2:
+            return deviation
+        return (lower + deviation) / 2
+
+    def update(self, value):
+        """Add a reading and return the median of the window"""
+        self.push(value)
+        return self.median()
+
+
+class hampel_filter:
+    """Replaces spikes with the median of the last k readings"""
+
+    # Scales the MAD to the standard deviation of normally distributed data
+    _MAD_SCALE = 1.4826
+
+    __slots__ = ("_window", "_threshold", "_min_deviation")
+
+    def __init__(self, k, threshold=3.0, min_deviation=0.0):
+        """Initializes the filter
+
+        Args:
+        k: number of previous readings to compare each reading against.
+        threshold: number of scaled MADs from the median a reading must be
+        to count as a spike.
+        min_deviation: smallest deviation to treat as a spike. A quantized
+        sensor often has a MAD of 0, so set this to a few steps of
+        resolution to let small changes through.
+
+        Returns:
+        None.
+        """
+        self._window = median_filter(k)
+        self._threshold = threshold
+        self._min_deviation = min_deviation
+
+    def reset(self):
+        """Forget the readings seen so far"""
+        self._window.reset()
+
+    def update(self, value):
+        """Add a reading and return it, or the median if it is a spike"""
+        window = self._window
+        result = value
+        # Need a few readings before the median means anything
+        if window.count() >= 3:
+            median = window.median()
+            limit = self._threshold * self._MAD_SCALE * window.mad()
+            if limit < self._min_deviation:
+                limit = self._min_deviation
+            if abs(value - median) > limit:
+                result = median
+        # Keep the raw reading so a real step change is followed once it
+        # fills half of the window.
+        window.push(value)
+        return result
@@ -0,0 +1,187 @@
+"""Library for an incremental PID controller in CircuitPython
+
+The controller keeps its own state, so each call to update() is O(1) and
+does not look back through the sample history.
+
+The error is measurement - set_point: with positive gains the output rises
+when the measurement is above the set point, which is what a fan cooling a
+heatsink needs. pid_fan_control() in fan_control.py drives the fan of
+code.py with it.
+
+Features:
+- The integral is kept in output units, so changing ki does not bump the
+  output.
+- Anti-windup, either by conditional integration ("clamp": stop
+  integrating while the output is saturated in the direction of the error)
+  or by back-calculation ("back_calculation": bleed the integral by the
+  amount the output was clipped).
+- The derivative is taken on the measurement rather than the error, so a
+  set point change does not kick the output, and is low pass filtered.
+- dt is measured with time.monotonic_ns() unless the caller passes the time.
+- An optional feed-forward output, such as a fan curve's, is added before
+  the limits, so the PID terms only correct what is left.
+"""
+
+import time
+
+ANTI_WINDUP_CLAMP = "clamp"
+ANTI_WINDUP_BACK_CALCULATION = "back_calculation"
+
+
+class PIDController:
+    """PID controller with anti-windup and a filtered derivative"""
+
+    __slots__ = (
+        "kp",
+        "ki",
+        "kd",
+        "set_point",
+        "_output_min",
+        "_output_max",
+        "_integral_min",
+        "_integral_max",
+        "_derivative_time_s",
+        "_anti_windup",
+        "_tracking_time_s",
+        "_integral",
+        "_derivative",
+        "_last_measurement",
+        "_last_time_ns",
+        "_output",
+    )
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        kp,
+        ki=0.0,
+        kd=0.0,
+        set_point=0.0,
+        output_min=0.0,
+        output_max=1.0,
+        integral_min=None,
+        integral_max=None,
+        derivative_time_s=0.0,
+        anti_windup=ANTI_WINDUP_CLAMP,
+        tracking_time_s=None,
+    ):
+        """Initializes the controller
+
+        Args:
+        kp: proportional gain, output per unit of error
+        ki: integral gain, output per unit of error per second
+        kd: derivative gain, output per unit of error per second of change
+        set_point: the measurement to aim for
+        output_min, output_max: limits of the output
+        integral_min, integral_max: optional limits of the integral term,
+        for example to keep it to a fraction of the output
+        derivative_time_s: time constant of the low pass filter on the
+        derivative. 0 disables the filter.
+        anti_windup: ANTI_WINDUP_CLAMP or ANTI_WINDUP_BACK_CALCULATION
+        tracking_time_s: time constant for back-calculation. Defaults to
+        kp / ki, the integral time.
+
+        Returns:
+        None.
+        """
+        if output_min >= output_max:
+            raise ValueError("output_min must be less than output_max")
+        if anti_windup not in (ANTI_WINDUP_CLAMP, ANTI_WINDUP_BACK_CALCULATION):
+            raise ValueError("Unsupported anti_windup: {}".format(anti_windup))
+        self.kp = kp
+        self.ki = ki
+        self.kd = kd
+        self.set_point = set_point
+        self._output_min = output_min
+        self._output_max = output_max
+        self._integral_min = integral_min
+        self._integral_max = integral_max
+        self._derivative_time_s = derivative_time_s
+        self._anti_windup = anti_windup
+        if tracking_time_s is None and ki:
+            tracking_time_s = abs(kp / ki) if kp else 1.0
+        self._tracking_time_s = tracking_time_s
+        self.reset()
+
+    def reset(self, integral=0.0):
+        """Forget the controller state
+
+        Args:
+        integral: starting value of the integral term, in output units
+
+        Returns:
+        None.
+        """
+        self._integral = integral
+        self._derivative = 0.0
+        self._last_measurement = None
+        self._last_time_ns = None
+        self._output = None
+
+    @property
+    def integral(self):
+        """The integral term, in output units"""
+        return self._integral
+
+    @property
+    def output(self):
+        """The output of the last update(), or None"""
+        return self._output
+
+    def _clamp_integral(self):
+        if self._integral_max is not None and self._integral > self._integral_max:
+            self._integral = self._integral_max
+        elif self._integral_min is not None and self._integral < self._integral_min:
+            self._integral = self._integral_min
+
+    def update(self, measurement, now_ns=None, feed_forward=0.0):
+        """Compute the output for a new measurement
+
+        Args:
+        measurement: the current value of the controlled variable
+        now_ns: time.monotonic_ns() of the measurement. Read from the clock
+        if None.
+        feed_forward: output to add to the PID terms before the limits
+
+        Returns:
+        the output, between output_min and output_max
+        """
+        if now_ns is None:
+            now_ns = time.monotonic_ns()
+        error = measurement - self.set_point
+        if self._last_time_ns is None:
+            dt = 0.0
+        else:
+            dt = (now_ns - self._last_time_ns) / 1000000000
+
+        # Derivative on measurement, low pass filtered
+        if dt > 0:
+            rate = (measurement - self._last_measurement) / dt
+            if self._derivative_time_s > 0:
+                self._derivative += (rate - self._derivative) * (
+                    dt / (self._derivative_time_s + dt)
+                )
+            else:
+                self._derivative = rate
+
+        proportional = self.kp * error
+        derivative = self.kd * self._derivative
+
+        integral = self._integral
+        self._integral += self.ki * error * dt
+        self._clamp_integral()
+        unclamped = feed_forward + proportional + self._integral + derivative
+        output = min(max(unclamped, self._output_min), self._output_max)
+
+        if output != unclamped:
+            if self._anti_windup == ANTI_WINDUP_CLAMP:
+                # Only integrate if it moves the output back within limits
+                if (unclamped > output) == (self._integral > integral):
+                    self._integral = integral
+            elif self._tracking_time_s:
+                self._integral += (output - unclamped) * dt / self._tracking_time_s
+                self._clamp_integral()
+
+        self._last_measurement = measurement
+        self._last_time_ns = now_ns
+        self._output = output
+        return output
@@ -0,0 +1,154 @@
+"""Library to periodically save a column_sampler to a file in CircuitPython
+
+On start up, load() restores the samples saved before the last reset, so
+history such as the PID integral does not restart from zero.
+
+To keep flash wear down, update() does not rewrite the whole file each time.
+It writes a full snapshot once per boot, then appends only the samples
+recorded since the previous save. When the appended data grows past
+compact_bytes, the next save writes a fresh snapshot instead.
+
+The file is a sequence of chunks. Each chunk has a header of its kind
+(b"S" for a snapshot, b"D" for appended samples), its length and the
+time.monotonic_ns() when it was saved, followed by the data from
+to_bytes(). A chunk cut short by a reset during a write is ignored.
+
+On the board, the filesystem must be writable from code, which requires
+storage.remount("/", readonly=False) in boot.py.
+"""
+
+import os
+import struct
+import time
+
+_CHUNK_HEADER = ">cIq"  # kind, length, saved_at_ns
+_SNAPSHOT = b"S"
+_DELTA = b"D"
+
+
+class sample_store:
+    def __init__(self, samples, path, interval_s=60, compact_bytes=16384):
+        """Initializes the store
+
+        Args:
+        samples: the column_sampler (or tiered_sampler) to save
+        path: the file to save to
+        interval_s: the number of seconds between saves from update()
+        compact_bytes: rewrite the file as a single snapshot once this many
+        bytes of samples have been appended to it
+
+        Returns:
+        None.
+        """
+        self._samples = samples
+        self._path = path
+        self._interval_ns = int(interval_s * 1000000000)
+        self._compact_bytes = compact_bytes
+        self._last_save_ns = time.monotonic_ns()
+        # Time of the newest sample in the file, or None if the file has not
+        # been written since boot.
+        self._saved_until_ns = None
+        self._appended_bytes = 0
+
+    def load(self):
+        """Restore the samples from the file
+
+        Returns:
+        True if samples were restored, False if there is no usable file.
+        """
+        try:
+            os.stat(self._path)
+            path = self._path
+        except OSError:
+            # A reset between the remove and the rename in save() leaves
+            # only the new snapshot, which was complete before the remove
+            path = self._path + ".tmp"
+        try:
+            with open(path, "rb") as f:
+                chunks = []
+                header_size = struct.calcsize(_CHUNK_HEADER)
+                while True:
+                    header = f.read(header_size)
+                    if len(header) < header_size:
+                        break
+                    kind, size, saved_at_ns = struct.unpack(_CHUNK_HEADER, header)
+                    # The file starts with a snapshot and the rest are deltas
+                    if kind != (_DELTA if chunks else _SNAPSHOT):
+                        break
+                    data = f.read(size)
+                    if len(data) < size:
+                        # Cut short by a reset during the write
+                        break
+                    chunks.append(data)
+                    newest_ns = saved_at_ns
+        except OSError:
+            return False
+        if not chunks:
+            return False
+        try:
+            for i in range(len(chunks)):
+                self._samples.from_bytes(chunks[i], i > 0, newest_ns)
+        except ValueError as e:
+            print("Ignoring saved samples in %s: %s" % (path, e))
+            self._samples.reset()
+            return False
+        return True
+
+    def save(self):
+        """Save the samples recorded since the last save to the file
+
+        Returns:
+        None
+        """
+        now_ns = time.monotonic_ns()
+        if (
+            self._saved_until_ns is None
+            or self._appended_bytes >= self._compact_bytes
+        ):
+            # Write the snapshot beside the file and swap it in, so a reset
+            # during the write leaves the old file intact. The rename cannot
+            # replace a file on the board's FAT filesystem, so the old file
+            # is removed first and load() falls back to the .tmp file if a
+            # reset comes in between.
+            data = self._samples.to_bytes()
+            temp_path = self._path + ".tmp"
+            with open(temp_path, "wb") as f:
+                f.write(struct.pack(_CHUNK_HEADER, _SNAPSHOT, len(data), now_ns))
+                f.write(data)
+            try:
+                os.remove(self._path)
+            except OSError:
+                pass
+            os.rename(temp_path, self._path)
+            self._appended_bytes = 0
+        elif self._samples.last_timestamp_ns() != self._saved_until_ns:
+            data = self._samples.to_bytes(self._saved_until_ns)
+            with open(self._path, "ab") as f:
+                f.write(struct.pack(_CHUNK_HEADER, _DELTA, len(data), now_ns))
+                f.write(data)
+            self._appended_bytes += len(data)
+        last_ns = self._samples.last_timestamp_ns()
+        if last_ns is not None:
+            self._saved_until_ns = last_ns
+        elif self._saved_until_ns is None:
+            self._saved_until_ns = now_ns
+        self._last_save_ns = now_ns
+
+    def update(self):
+        """Save the samples if interval_s has passed since the last save
+
+        Call this every time through the main loop. Errors writing the file,
+        such as a read-only filesystem, are printed rather than raised.
+
+        Returns:
+        True if the samples were saved.
+        """
+        if time.monotonic_ns() - self._last_save_ns < self._interval_ns:
+            return False
+        try:
+            self.save()
+        except OSError as e:
+            print("Could not save samples to %s: %s" % (self._path, e))
+            self._last_save_ns = time.monotonic_ns()
+            return False
+        return True
@@ -5,9 +5,209 @@ the following keys:
 
 elapsed_ms: records the number of milliseconds elapsed since the last call
 to either record() or start()
+
+Two variants are provided:
+
+sampler: stores a copy of each dictionary passed to record(). Any keys can
+be recorded.
+
+column_sampler: the field names are declared up front and each field is
+stored in its own preallocated array, so record() does not allocate. Use
+this on boards with very little RAM.
+
+tiered_sampler: a column_sampler that also rolls its samples up into
+coarser tiers (for example 1 minute, 15 minutes and 6 hours), keeping the
+mean, min and max of each field per bucket. Memory use stays fixed.
+
+Both variants keep running aggregates for every numeric key so that
+sum(), mean(), min(), max() and count() do not walk the buffer.
+
+iter_samples(), iter_key() and window() walk the buffer in chronological
+order without copying it. They raise RuntimeError if record() or reset()
+is called while iterating.
+
+The time.monotonic_ns() timestamp of each sample is also kept, so since()
+and between() can select samples by time with a binary search.
+
+Streaming filters (see filters.py) can be attached to a key with
+add_filter(). Values of that key are passed through the filters as they
+are recorded, and the filtered value is stored.
+
+column_sampler and tiered_sampler can be saved with to_bytes() and restored
+with from_bytes(), for example across a reset. See sample_store.py to do
+this periodically.
 """
 
+import struct
 import time
+from array import array
+
+# Header of the data from column_sampler.to_bytes():
+# magic, format version, number of fields, number of records, saved_at_ns
+_SNAPSHOT_HEADER = ">4sBBHq"
+_SNAPSHOT_MAGIC = b"SMPC"
+_SNAPSHOT_VERSION = 1
+# Header of the data from tiered_sampler.to_bytes(): magic, number of parts
+_TIERED_HEADER = ">4sB"
+_TIERED_MAGIC = b"SMPT"
+
+
+def _search(timestamps_ns, first, count, t_ns):
+    """Binary search a circular buffer of increasing timestamps.
+
+    Args:
+    timestamps_ns: the buffer of timestamps, indexed by slot
+    first: the slot of the oldest sample
+    count: the number of valid samples
+    t_ns: the timestamp to look for
+
+    Returns:
+    the position (0 for the oldest sample) of the first sample at or after
+    t_ns, or count if there is none.
+    """
+    size = len(timestamps_ns)
+    low = 0
+    high = count
+    while low < high:
+        mid = (low + high) // 2
+        if timestamps_ns[(first + mid) % size] < t_ns:
+            low = mid + 1
+        else:
+            high = mid
+    return low
+
+
+class _monotonic_queue:
+    """Slot indexes of the candidates for the min or max of the window.
+
+    The values referenced by the queue are monotonic from front to back, so
+    the front is always the current min (or max). Each slot is pushed and
+    popped at most once, so updates are amortized O(1).
+    """
+
+    __slots__ = ("_values", "_slots", "_head", "_len", "_keep_max")
+
+    def __init__(self, values, keep_max):
+        self._values = values
+        self._slots = array("l", [0] * len(values))
+        self._keep_max = keep_max
+        self.reset()
+
+    def reset(self):
+        self._head = 0
+        self._len = 0
+
+    def push(self, slot):
+        values = self._values
+        value = values[slot]
+        size = len(self._slots)
+        while self._len:
+            back = values[self._slots[(self._head + self._len - 1) % size]]
+            if (back > value) if self._keep_max else (back < value):
+                break
+            self._len -= 1
+        self._slots[(self._head + self._len) % size] = slot
+        self._len += 1
+
+    def evict(self, slot):
+        # The evicted slot is always the oldest sample, so if it is still a
+        # candidate it is at the front of the queue.
+        if self._len and self._slots[self._head] == slot:
+            self._head = (self._head + 1) % len(self._slots)
+            self._len -= 1
+
+    def front(self):
+        if not self._len:
+            return None
+        return self._values[self._slots[self._head]]
+
+
+class _aggregate:
+    """Running sum, count, min and max for one key in a circular buffer.
+
+    'values' is indexed by slot and must hold the new value before add() is
+    called and the old value until evict() has been called.
+    """
+
+    __slots__ = ("values", "_present", "_min", "_max", "total", "count")
+
+    def __init__(self, values):
+        self.values = values
+        self._present = bytearray(len(values))
+        self._min = _monotonic_queue(values, False)
+        self._max = _monotonic_queue(values, True)
+        self.reset()
+
+    def reset(self):
+        for i in range(len(self._present)):
+            self._present[i] = 0
+        self._min.reset()
+        self._max.reset()
+        self.total = 0
+        self.count = 0
+
+    def add(self, slot):
+        self._present[slot] = 1
+        self.total += self.values[slot]
+        self.count += 1
+        self._min.push(slot)
+        self._max.push(slot)
+
+    def evict(self, slot):
+        if not self._present[slot]:
+            return
+        self._present[slot] = 0
+        self.total -= self.values[slot]
+        self.count -= 1
+        self._min.evict(slot)
+        self._max.evict(slot)
+
+    def resync(self):
+        """Recompute the sum to discard rounding error from add/evict."""
+        total = 0
+        for i in range(len(self._present)):
+            if self._present[i]:
+                total += self.values[i]
+        self.total = total
+
+    def minimum(self):
+        return self._min.front()
+
+    def maximum(self):
+        return self._max.front()
+
+
+class _row:
+    """Read-only view of one slot of a column_sampler.
+
+    The same view is reused for every sample yielded by
+    column_sampler.iter_samples(), so do not keep references to it.
+    """
+
+    __slots__ = ("_sampler", "_slot")
+
+    def __init__(self, sampler_):
+        self._sampler = sampler_
+        self._slot = 0
+
+    def __getitem__(self, key):
+        column = self._sampler._column(key)
+        if column is None:
+            raise KeyError(key)
+        return column[self._slot]
+
+    def __contains__(self, key):
+        return self._sampler._column(key) is not None
+
+    def get(self, key, default=None):
+        column = self._sampler._column(key)
+        if column is None:
+            return default
+        return column[self._slot]
+
+    def keys(self):
+        return self._sampler._fields + ("elapsed_ms",)
+
 
 class sampler:
     def __init__(self, max_samples):
@@ -21,6 +221,8 @@ class sampler:
         """
 
         self._max_samples = max_samples
+        self._version = 0
+        self._filters = {}  # lists of filters by key
 
         # Put all initialization into reset() so callers can restart
         # the sampler.
@@ -33,8 +235,15 @@ class sampler:
         None.
         """
         self._samples = [{} for i in range(self._max_samples)]
+        self._timestamps_ns = [0] * self._max_samples
+        self._aggregates = {}  # running aggregates by key
+        self._count = 0  # number of slots in _samples that have been recorded
+        self._version += 1  # changes on every update
         self._last = 0  # indexes the position of the last used slot in _samples
         self._next = 0  # indexes the position of the next slot to use in _samples
+        for stages in self._filters.values():
+            for stage in stages:
+                stage.reset()
         self.start()
 
     def start(self):
@@ -50,19 +259,58 @@ class sampler:
         Returns:
         None
         """
+        now_ns = time.monotonic_ns()
         sample = sample_data.copy()
-        sample["elapsed_ms"] = (
-            time.monotonic_ns() - self._last_record_time_ns
-        ) / 1000000
-        self._samples[self._next] = sample
+        sample["elapsed_ms"] = (now_ns - self._last_record_time_ns) / 1000000
+        for key, stages in self._filters.items():
+            if key in sample:
+                for stage in stages:
+                    sample[key] = stage.update(sample[key])
+
+        # Remove the sample being overwritten from the aggregates
+        slot = self._next
+        self._timestamps_ns[slot] = now_ns
+        for aggregate in self._aggregates.values():
+            aggregate.evict(slot)
+        self._samples[slot] = sample
+        for key, value in sample.items():
+            if isinstance(value, (int, float)):
+                aggregate = self._aggregates.get(key)
+                if aggregate is None:
+                    aggregate = _aggregate([0] * self._max_samples)
+                    self._aggregates[key] = aggregate
+                aggregate.values[slot] = value
+                aggregate.add(slot)
 
         # Update the indexes into our circular buffer
         self._last = self._next
         self._next = (self._next + 1) % self._max_samples
+        if self._count < self._max_samples:
+            self._count += 1
+        self._version += 1
+        if self._next == 0:
+            for aggregate in self._aggregates.values():
+                aggregate.resync()
 
         # Restart the timer
         self.start()
 
+    def add_filter(self, key, stage):
+        """Pass the values of key through a filter as they are recorded
+
+        Filters added to the same key are applied in the order they were
+        added. Their state is cleared by reset().
+
+        Args:
+        key: the key to filter
+        stage: an object with update(value), which returns the filtered
+        value, and reset(). See filters.py.
+
+        Returns:
+        None
+        """
+        self._filters.setdefault(key, []).append(stage)
+
     def last(self):
         """Retrieve the last sample.
 
@@ -90,6 +338,108 @@ class sampler:
                 result.append(filler)
         return result
 
+    def count(self, key):
+        """Return the number of recorded samples that contain key"""
+        aggregate = self._aggregates.get(key)
+        return aggregate.count if aggregate else 0
+
+    def sum(self, key):
+        """Return the sum of the values of key in the recorded samples
+
+        This is a running total, so it does not walk the buffer.
+        """
+        aggregate = self._aggregates.get(key)
+        return aggregate.total if aggregate else 0
+
+    def mean(self, key):
+        """Return the mean of the values of key, or None if there are none"""
+        aggregate = self._aggregates.get(key)
+        if not aggregate or not aggregate.count:
+            return None
+        return aggregate.total / aggregate.count
+
+    def min(self, key):
+        """Return the smallest value of key, or None if there are none"""
+        aggregate = self._aggregates.get(key)
+        return aggregate.minimum() if aggregate else None
+
+    def max(self, key):
+        """Return the largest value of key, or None if there are none"""
+        aggregate = self._aggregates.get(key)
+        return aggregate.maximum() if aggregate else None
+
+    def _iter_slots(self, n):
+        """Yield the slots of the last n samples, oldest first"""
+        return self._iter_range(self._count - min(n, self._count), self._count)
+
+    def _iter_range(self, start, stop):
+        """Yield the slots of the samples at positions start to stop - 1"""
+        version = self._version
+        first = (self._next - self._count) % self._max_samples
+        for i in range(start, stop):
+            if self._version != version:
+                raise RuntimeError("sampler changed during iteration")
+            yield (first + i) % self._max_samples
+
+    def _iter_between(self, t0_ns, t1_ns):
+        first = (self._next - self._count) % self._max_samples
+        start = _search(self._timestamps_ns, first, self._count, t0_ns)
+        stop = _search(self._timestamps_ns, first, self._count, t1_ns + 1)
+        return self._iter_range(start, stop)
+
+    def iter_samples(self):
+        """Iterate over the recorded samples, oldest first.
+
+        The stored dictionaries are yielded without copying them, so they
+        must not be modified.
+        """
+        for slot in self._iter_slots(self._max_samples):
+            yield self._samples[slot]
+
+    def iter_key(self, key):
+        """Iterate over the values of key, oldest first.
+
+        Samples that do not contain the key are skipped.
+        """
+        for slot in self._iter_slots(self._max_samples):
+            sample = self._samples[slot]
+            if key in sample:
+                yield sample[key]
+
+    def window(self, n):
+        """Iterate over the last n recorded samples, oldest first.
+
+        Like iter_samples(), the dictionaries are not copied.
+        """
+        for slot in self._iter_slots(n):
+            yield self._samples[slot]
+
+    def between(self, t0_ns, t1_ns, key=None):
+        """Iterate over the samples recorded between two times, oldest first.
+
+        Args:
+        t0_ns, t1_ns: time.monotonic_ns() values bounding the samples
+        (inclusive)
+        key: if given, yield the values of this key instead of the samples,
+        skipping samples that do not contain it.
+
+        The dictionaries are not copied, as in iter_samples().
+        """
+        for slot in self._iter_between(t0_ns, t1_ns):
+            sample = self._samples[slot]
+            if key is None:
+                yield sample
+            elif key in sample:
+                yield sample[key]
+
+    def since(self, seconds, key=None):
+        """Iterate over the samples recorded in the last 'seconds' seconds.
+
+        See between() for the meaning of key.
+        """
+        now_ns = time.monotonic_ns()
+        return self.between(now_ns - int(seconds * 1000000000), now_ns, key)
+
     def samples(self):
         """Return a copy of all data saved in the circular buffer"""
         result = []
@@ -98,3 +448,666 @@ class sampler:
             if bool(self._samples[copy_index]):
                 result.append(self._samples[copy_index].copy())
         return result
+
+
+class column_sampler:
+    """A sampler with a fixed schema backed by one preallocated array per field.
+
+    Presents the same record(), last(), by_key() and samples() interface as
+    sampler, but does not copy dictionaries or grow the heap as samples
+    are recorded.
+    """
+
+    __slots__ = (
+        "_max_samples",
+        "_fields",
+        "_typecodes",
+        "_columns",
+        "_elapsed_ms",
+        "_timestamps_ns",
+        "_aggregates",
+        "_row",
+        "_filters",
+        "_version",
+        "_count",
+        "_last",
+        "_next",
+        "_last_record_time_ns",
+    )
+
+    def __init__(self, max_samples, fields, int_fields=()):
+        """Initializes the sampler
+
+        Args:
+        max_samples: max number of samples to save
+        fields: names of the fields to store as floats (array('f'))
+        int_fields: names of the fields to store as integers (array('l'))
+
+        Returns:
+        None.
+        """
+        self._max_samples = max_samples
+        self._fields = tuple(fields) + tuple(int_fields)
+        self._typecodes = "f" * len(fields) + "l" * len(int_fields)
+        if "elapsed_ms" in self._fields:
+            raise ValueError("elapsed_ms is recorded automatically")
+        self._columns = {}
+        for name in fields:
+            self._columns[name] = array("f", [0] * max_samples)
+        for name in int_fields:
+            self._columns[name] = array("l", [0] * max_samples)
+        self._elapsed_ms = array("f", [0] * max_samples)
+        self._timestamps_ns = array("q", [0] * max_samples)
+        self._aggregates = {"elapsed_ms": _aggregate(self._elapsed_ms)}
+        for name in self._fields:
+            self._aggregates[name] = _aggregate(self._columns[name])
+        self._row = _row(self)
+        self._filters = {}  # lists of filters by field
+        self._version = 0
+
+        self.reset()
+
+    def reset(self):
+        """Reset all the data in the module (other than max_samples and fields)
+
+        The columns are not cleared, only the count of valid samples.
+
+        Returns:
+        None.
+        """
+        for aggregate in self._aggregates.values():
+            aggregate.reset()
+        self._version += 1  # changes on every update
+        self._count = 0  # number of valid samples in the columns
+        self._last = 0  # indexes the position of the last used slot
+        self._next = 0  # indexes the position of the next slot to use
+        for stages in self._filters.values():
+            for stage in stages:
+                stage.reset()
+        self.start()
+
+    def start(self):
+        """Start the timer for the next sample"""
+        self._last_record_time_ns = time.monotonic_ns()
+
+    def record(self, sample_data):
+        """Record a dictionary in the data
+
+        Args:
+        sample_data: a dictionary with a value for every declared field.
+        Keys that are not declared fields are ignored.
+
+        Returns:
+        None
+
+        Raises:
+        KeyError if a declared field is missing from sample_data.
+        """
+        index = self._next
+        for name in self._fields:
+            # Look up every field before changing anything so a missing key
+            # leaves the buffer untouched.
+            sample_data[name]
+        for aggregate in self._aggregates.values():
+            aggregate.evict(index)
+        now_ns = time.monotonic_ns()
+        for name in self._fields:
+            value = sample_data[name]
+            stages = self._filters.get(name)
+            if stages:
+                for stage in stages:
+                    value = stage.update(value)
+            self._columns[name][index] = value
+        self._elapsed_ms[index] = (now_ns - self._last_record_time_ns) / 1000000
+        self._timestamps_ns[index] = now_ns
+        for aggregate in self._aggregates.values():
+            aggregate.add(index)
+        self._advance()
+
+        # Restart the timer
+        self.start()
+
+    def _advance(self):
+        """Update the indexes into our circular buffer after a record"""
+        self._last = self._next
+        self._next = (self._next + 1) % self._max_samples
+        if self._count < self._max_samples:
+            self._count += 1
+        self._version += 1
+        if self._next == 0:
+            for aggregate in self._aggregates.values():
+                aggregate.resync()
+
+    def _record_format(self):
+        # Field values, elapsed_ms and the timestamp
+        return ">" + self._typecodes.replace("l", "i") + "fq"
+
+    def last_timestamp_ns(self):
+        """Return the time.monotonic_ns() of the last sample, or None"""
+        if self._count == 0:
+            return None
+        return self._timestamps_ns[self._last]
+
+    def to_bytes(self, after_ns=None):
+        """Pack the recorded samples into bytes.
+
+        The format is a header, the names and types of the fields, then one
+        struct packed record per sample, oldest first.
+
+        Args:
+        after_ns: if given, only pack the samples recorded after this
+        time.monotonic_ns() value, so the result can be appended to an
+        earlier snapshot with from_bytes(data, append=True).
+
+        Returns:
+        the packed samples as a bytearray
+        """
+        first = (self._next - self._count) % self._max_samples
+        start = 0
+        if after_ns is not None:
+            start = _search(self._timestamps_ns, first, self._count, after_ns + 1)
+        record_format = self._record_format()
+        record_size = struct.calcsize(record_format)
+
+        schema = bytearray()
+        for i in range(len(self._fields)):
+            name = self._fields[i].encode()
+            schema.append(ord(self._typecodes[i]))
+            schema.append(len(name))
+            schema.extend(name)
+        offset = struct.calcsize(_SNAPSHOT_HEADER) + len(schema)
+        data = bytearray(offset + record_size * (self._count - start))
+        struct.pack_into(
+            _SNAPSHOT_HEADER,
+            data,
+            0,
+            _SNAPSHOT_MAGIC,
+            _SNAPSHOT_VERSION,
+            len(self._fields),
+            self._count - start,
+            time.monotonic_ns(),
+        )
+        data[offset - len(schema) : offset] = schema
+        values = [0] * (len(self._fields) + 2)
+        for position in range(start, self._count):
+            slot = (first + position) % self._max_samples
+            for i in range(len(self._fields)):
+                values[i] = self._columns[self._fields[i]][slot]
+            values[-2] = self._elapsed_ms[slot]
+            values[-1] = self._timestamps_ns[slot]
+            struct.pack_into(record_format, data, offset, *values)
+            offset += record_size
+        return data
+
+    def from_bytes(self, data, append=False, saved_at_ns=None):
+        """Restore samples packed by to_bytes().
+
+        Timestamps are shifted so that the time the data was saved becomes
+        the current time.monotonic_ns(), so since() and between() keep
+        working after a reset. Filters are not restored.
+
+        Args:
+        data: bytes from to_bytes() of a sampler with the same fields
+        append: if True, add the samples after the ones already recorded
+        instead of replacing them
+        saved_at_ns: treat this as the time the data was saved. Pass the
+        save time of the newest of several snapshots that are appended
+        together so their timestamps line up.
+
+        Returns:
+        None
+
+        Raises:
+        ValueError if the data is not a snapshot of a sampler with the same
+        fields.
+        """
+        header_size = struct.calcsize(_SNAPSHOT_HEADER)
+        if len(data) < header_size:
+            raise ValueError("Sampler snapshot is truncated")
+        magic, version, num_fields, count, data_saved_at_ns = struct.unpack_from(
+            _SNAPSHOT_HEADER, data
+        )
+        if magic != _SNAPSHOT_MAGIC or version != _SNAPSHOT_VERSION:
+            raise ValueError("Not a sampler snapshot")
+        if num_fields != len(self._fields):
+            raise ValueError("Sampler snapshot has different fields")
+        offset = header_size
+        for i in range(num_fields):
+            name = self._fields[i].encode()
+            if (
+                data[offset] != ord(self._typecodes[i])
+                or data[offset + 1] != len(name)
+                or data[offset + 2 : offset + 2 + len(name)] != name
+            ):
+                raise ValueError("Sampler snapshot has different fields")
+            offset += 2 + len(name)
+        record_format = self._record_format()
+        record_size = struct.calcsize(record_format)
+        if len(data) < offset + record_size * count:
+            raise ValueError("Sampler snapshot is truncated")
+
+        if saved_at_ns is None:
+            saved_at_ns = data_saved_at_ns
+        shift_ns = time.monotonic_ns() - saved_at_ns
+        if not append:
+            self.reset()
+        # Only the newest samples fit if the snapshot is larger
+        if count > self._max_samples:
+            offset += record_size * (count - self._max_samples)
+            count = self._max_samples
+        for _ in range(count):
+            values = struct.unpack_from(record_format, data, offset)
+            offset += record_size
+            index = self._next
+            for aggregate in self._aggregates.values():
+                aggregate.evict(index)
+            for i in range(len(self._fields)):
+                self._columns[self._fields[i]][index] = values[i]
+            self._elapsed_ms[index] = values[-2]
+            self._timestamps_ns[index] = values[-1] + shift_ns
+            for aggregate in self._aggregates.values():
+                aggregate.add(index)
+            self._advance()
+
+    def add_filter(self, key, stage):
+        """Pass the values of a field through a filter as they are recorded
+
+        Filters added to the same field are applied in the order they were
+        added. Their state is cleared by reset().
+
+        Args:
+        key: the field to filter
+        stage: an object with update(value), which returns the filtered
+        value, and reset(). See filters.py.
+
+        Returns:
+        None
+
+        Raises:
+        KeyError if key is not a field.
+        """
+        if key not in self._columns:
+            raise KeyError(key)
+        self._filters.setdefault(key, []).append(stage)
+
+    def _sample_at(self, index):
+        sample = {}
+        for name in self._fields:
+            sample[name] = self._columns[name][index]
+        sample["elapsed_ms"] = self._elapsed_ms[index]
+        return sample
+
+    def _column(self, key):
+        if key == "elapsed_ms":
+            return self._elapsed_ms
+        return self._columns.get(key)
+
+    def last(self):
+        """Retrieve the last sample.
+
+        Returns:
+        A dictionary with the values stored by the last call to record(),
+        or an empty dictionary if nothing has been recorded.
+        """
+        if self._count == 0:
+            return {}
+        return self._sample_at(self._last)
+
+    def by_key(self, key, filler=None):
+        """Retrieve all data by key.
+
+        Returns: an array of all values that match the specified key in the
+        recorded samples.
+
+        If 'filler' is None, the method will skip slots that have not been
+        recorded yet. Otherwise, those slots are returned as 'filler'
+        """
+        result = []
+        if filler:
+            result.extend([filler] * (self._max_samples - self._count))
+        column = self._column(key)
+        if column is None:
+            if filler:
+                result.extend([filler] * self._count)
+            return result
+        first = (self._next - self._count) % self._max_samples
+        for i in range(self._count):
+            result.append(column[(first + i) % self._max_samples])
+        return result
+
+    def count(self, key):
+        """Return the number of recorded samples that contain key"""
+        aggregate = self._aggregates.get(key)
+        return aggregate.count if aggregate else 0
+
+    def sum(self, key):
+        """Return the sum of the values of key in the recorded samples
+
+        This is a running total, so it does not walk the buffer.
+        """
+        aggregate = self._aggregates.get(key)
+        return aggregate.total if aggregate else 0
+
+    def mean(self, key):
+        """Return the mean of the values of key, or None if there are none"""
+        aggregate = self._aggregates.get(key)
+        if not aggregate or not aggregate.count:
+            return None
+        return aggregate.total / aggregate.count
+
+    def min(self, key):
+        """Return the smallest value of key, or None if there are none"""
+        aggregate = self._aggregates.get(key)
+        return aggregate.minimum() if aggregate else None
+
+    def max(self, key):
+        """Return the largest value of key, or None if there are none"""
+        aggregate = self._aggregates.get(key)
+        return aggregate.maximum() if aggregate else None
+
+    def _iter_slots(self, n):
+        """Yield the slots of the last n samples, oldest first"""
+        return self._iter_range(self._count - min(n, self._count), self._count)
+
+    def _iter_range(self, start, stop):
+        """Yield the slots of the samples at positions start to stop - 1"""
+        version = self._version
+        first = (self._next - self._count) % self._max_samples
+        for i in range(start, stop):
+            if self._version != version:
+                raise RuntimeError("sampler changed during iteration")
+            yield (first + i) % self._max_samples
+
+    def _iter_between(self, t0_ns, t1_ns):
+        first = (self._next - self._count) % self._max_samples
+        start = _search(self._timestamps_ns, first, self._count, t0_ns)
+        stop = _search(self._timestamps_ns, first, self._count, t1_ns + 1)
+        return self._iter_range(start, stop)
+
+    def iter_samples(self):
+        """Iterate over the recorded samples, oldest first.
+
+        Each sample is yielded as the same read-only view object, which
+        supports [key], get(), 'in' and keys(). Copy values out of it
+        rather than keeping the view.
+        """
+        row = self._row
+        for slot in self._iter_slots(self._max_samples):
+            row._slot = slot
+            yield row
+
+    def iter_key(self, key):
+        """Iterate over the values of key, oldest first.
+
+        Nothing is yielded if key is not a field.
+        """
+        column = self._column(key)
+        if column is None:
+            return
+        for slot in self._iter_slots(self._max_samples):
+            yield column[slot]
+
+    def window(self, n):
+        """Iterate over the last n recorded samples, oldest first.
+
+        Samples are yielded as views, as in iter_samples().
+        """
+        row = self._row
+        for slot in self._iter_slots(n):
+            row._slot = slot
+            yield row
+
+    def between(self, t0_ns, t1_ns, key=None):
+        """Iterate over the samples recorded between two times, oldest first.
+
+        Args:
+        t0_ns, t1_ns: time.monotonic_ns() values bounding the samples
+        (inclusive)
+        key: if given, yield the values of this field instead of the
+        samples. Nothing is yielded if key is not a field.
+
+        Samples are yielded as views, as in iter_samples().
+        """
+        if key is None:
+            row = self._row
+            for slot in self._iter_between(t0_ns, t1_ns):
+                row._slot = slot
+                yield row
+            return
+        column = self._column(key)
+        if column is None:
+            return
+        for slot in self._iter_between(t0_ns, t1_ns):
+            yield column[slot]
+
+    def since(self, seconds, key=None):
+        """Iterate over the samples recorded in the last 'seconds' seconds.
+
+        See between() for the meaning of key.
+        """
+        now_ns = time.monotonic_ns()
+        return self.between(now_ns - int(seconds * 1000000000), now_ns, key)
+
+    def samples(self):
+        """Return a copy of all data saved in the circular buffer"""
+        result = []
+        first = (self._next - self._count) % self._max_samples
+        for i in range(self._count):
+            result.append(self._sample_at((first + i) % self._max_samples))
+        return result
+
+
+class _bucket:
+    """Accumulates the mean, min and max of each field for one tier"""
+
+    __slots__ = ("_sums", "_mins", "_maxs", "_out", "_names", "count", "elapsed_ms")
+
+    def __init__(self, names):
+        self._names = names
+        self._sums = array("f", [0] * len(names))
+        self._mins = array("f", [0] * len(names))
+        self._maxs = array("f", [0] * len(names))
+        # Reused for every closed bucket so closing does not allocate
+        self._out = {"num_samples": 0}
+        for mean_name, min_name, max_name in names:
+            self._out[mean_name] = 0
+            self._out[min_name] = 0
+            self._out[max_name] = 0
+        self.clear()
+
+    def clear(self):
+        self.count = 0
+        self.elapsed_ms = 0
+
+    def add(self, row, names, weight, elapsed_ms):
+        """Fold in one row whose field names are given by 'names'"""
+        for i in range(len(names)):
+            mean_name, min_name, max_name = names[i]
+            low = row[min_name]
+            high = row[max_name]
+            if self.count == 0:
+                self._sums[i] = 0
+                self._mins[i] = low
+                self._maxs[i] = high
+            else:
+                if low < self._mins[i]:
+                    self._mins[i] = low
+                if high > self._maxs[i]:
+                    self._maxs[i] = high
+            self._sums[i] += row[mean_name] * weight
+        self.count += weight
+        self.elapsed_ms += elapsed_ms
+
+    def close(self):
+        """Return the finished bucket as a dictionary and start a new one
+
+        The dictionary is reused, so it is only valid until the next close().
+        """
+        out = self._out
+        for i in range(len(self._names)):
+            mean_name, min_name, max_name = self._names[i]
+            out[mean_name] = self._sums[i] / self.count
+            out[min_name] = self._mins[i]
+            out[max_name] = self._maxs[i]
+        out["num_samples"] = self.count
+        self.clear()
+        return out
+
+
+class tiered_sampler(column_sampler):
+    """A column_sampler that also keeps coarser, downsampled history.
+
+    Recorded samples are kept at full resolution as in column_sampler. They
+    are also folded into the first tier, and each full bucket of a tier is
+    folded into the next one, in the manner of an RRD database.
+
+    Each tier is a column_sampler with these keys for every field 'name':
+      name: the mean over the bucket
+      name_min, name_max: the min and max over the bucket
+      num_samples: the number of full resolution samples in the bucket
+    so the usual by_key(), iter_key(), window() and aggregate methods work
+    on it. Use tier() to look one up by its resolution.
+    """
+
+    __slots__ = (
+        "_spans_ms",
+        "_tiers",
+        "_buckets",
+        "_fine_row",
+        "_fine_names",
+        "_tier_names",
+    )
+
+    def __init__(self, max_samples, fields, tiers=((60, 60), (900, 96), (21600, 28))):
+        """Initializes the sampler
+
+        Args:
+        max_samples: max number of full resolution samples to save
+        fields: names of the fields to store (as floats)
+        tiers: (seconds_per_bucket, num_buckets) for each tier, from the
+        finest to the coarsest. The default keeps an hour at 1 minute,
+        a day at 15 minutes and a week at 6 hours.
+
+        Returns:
+        None.
+        """
+        self._spans_ms = []
+        self._tiers = []
+        self._buckets = []
+        self._fine_names = tuple((name, name, name) for name in fields)
+        self._tier_names = tuple(
+            (name, name + "_min", name + "_max") for name in fields
+        )
+        tier_fields = []
+        for name in self._tier_names:
+            tier_fields.extend(name)
+        for seconds, num_buckets in tiers:
+            self._spans_ms.append(seconds * 1000)
+            self._tiers.append(
+                column_sampler(num_buckets, tier_fields, ("num_samples",))
+            )
+            self._buckets.append(_bucket(self._tier_names))
+        super().__init__(max_samples, fields)
+        self._fine_row = _row(self)
+
+    def reset(self):
+        """Reset all the data in the module, including the tiers
+
+        Returns:
+        None.
+        """
+        super().reset()
+        for tier in self._tiers:
+            tier.reset()
+        for bucket in self._buckets:
+            bucket.clear()
+
+    def record(self, sample_data):
+        """Record a dictionary in the data and roll it up into the tiers
+
+        Args:
+        sample_data: a dictionary with a value for every declared field.
+
+        Returns:
+        None
+        """
+        super().record(sample_data)
+        if self._tiers:
+            row = self._fine_row
+            row._slot = self._last
+            self._fold(0, row, self._fine_names, 1, self._elapsed_ms[self._last])
+
+    def _fold(self, level, row, names, weight, elapsed_ms):
+        bucket = self._buckets[level]
+        bucket.add(row, names, weight, elapsed_ms)
+        if bucket.elapsed_ms < self._spans_ms[level]:
+            return
+        elapsed_ms = bucket.elapsed_ms
+        tier = self._tiers[level]
+        tier.record(bucket.close())
+        if level + 1 < len(self._tiers):
+            row = tier._row
+            row._slot = tier._last
+            weight = row["num_samples"]
+            self._fold(level + 1, row, self._tier_names, weight, elapsed_ms)
+
+    def tiers(self):
+        """Return the resolutions of the tiers in seconds, finest first"""
+        return [span_ms // 1000 for span_ms in self._spans_ms]
+
+    def tier(self, seconds):
+        """Return the tier with the given resolution.
+
+        For example tier(60).by_key("temp")[-60:] is the last hour of
+        temperatures at 1 minute resolution.
+
+        Args:
+        seconds: the seconds per bucket of the tier
+
+        Returns:
+        a column_sampler holding the buckets of the tier
+
+        Raises:
+        KeyError if there is no tier with that resolution.
+        """
+        for i in range(len(self._spans_ms)):
+            if self._spans_ms[i] == seconds * 1000:
+                return self._tiers[i]
+        raise KeyError(seconds)
+
+    def to_bytes(self, after_ns=None):
+        """Pack the recorded samples and all the tiers into bytes.
+
+        See column_sampler.to_bytes(). Partly filled buckets are not saved.
+        """
+        parts = [super().to_bytes(after_ns)]
+        for tier in self._tiers:
+            parts.append(tier.to_bytes(after_ns))
+        data = bytearray(struct.pack(_TIERED_HEADER, _TIERED_MAGIC, len(parts)))
+        for part in parts:
+            data.extend(struct.pack(">I", len(part)))
+            data.extend(part)
+        return data
+
+    def from_bytes(self, data, append=False, saved_at_ns=None):
+        """Restore samples and tiers packed by to_bytes().
+
+        See column_sampler.from_bytes().
+        """
+        offset = struct.calcsize(_TIERED_HEADER)
+        if len(data) < offset:
+            raise ValueError("Sampler snapshot is truncated")
+        magic, num_parts = struct.unpack_from(_TIERED_HEADER, data)
+        if magic != _TIERED_MAGIC or num_parts != len(self._tiers) + 1:
+            raise ValueError("Sampler snapshot has different tiers")
+        if not append:
+            self.reset()
+        for i in range(num_parts):
+            (size,) = struct.unpack_from(">I", data, offset)
+            offset += 4
+            part = data[offset : offset + size]
+            offset += size
+            if i == 0:
+                super().from_bytes(part, True, saved_at_ns)
+            else:
+                self._tiers[i - 1].from_bytes(part, True, saved_at_ns)
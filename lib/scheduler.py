@@ -0,0 +1,117 @@
+"""Library to run functions periodically as asyncio tasks in CircuitPython
+
+Each periodic_task calls its function every period_s seconds on its own
+asyncio task, so slow and fast jobs in the main loop no longer share one
+tick. Deadlines are kept on a fixed grid (start + n * period), so the
+cadence does not drift by the time the function takes.
+
+Each task keeps deadline accounting:
+runs: the number of times the function was called
+overruns: the number of deadlines missed because the function ran past
+the next deadline or the event loop started it late. Missed deadlines are
+skipped rather than run back to back.
+max_late_ms: the longest a call started after its deadline
+max_run_ms: the longest a call took
+"""
+
+import asyncio
+import time
+
+
+class periodic_task:
+    """Calls a function every period_s seconds from an asyncio task"""
+
+    __slots__ = (
+        "name",
+        "_period_ns",
+        "_function",
+        "_deadline_ns",
+        "runs",
+        "overruns",
+        "max_late_ms",
+        "max_run_ms",
+    )
+
+    def __init__(self, name, period_s, function):
+        """Initializes the task
+
+        Args:
+        name: name to use in reports
+        period_s: the number of seconds between calls
+        function: the function to call, with no arguments
+
+        Returns:
+        None.
+        """
+        if period_s <= 0:
+            raise ValueError("period_s must be greater than 0")
+        self.name = name
+        self._period_ns = int(period_s * 1000000000)
+        self._function = function
+        self._deadline_ns = None
+        self.reset_stats()
+
+    def reset_stats(self):
+        """Clear the deadline accounting"""
+        self.runs = 0
+        self.overruns = 0
+        self.max_late_ms = 0
+        self.max_run_ms = 0
+
+    def run_once(self):
+        """Call the function if its deadline has passed
+
+        Returns:
+        the number of seconds until the next deadline.
+        """
+        now_ns = time.monotonic_ns()
+        if self._deadline_ns is None:
+            self._deadline_ns = now_ns
+        if now_ns < self._deadline_ns:
+            return (self._deadline_ns - now_ns) / 1000000000
+
+        late_ms = (now_ns - self._deadline_ns) / 1000000
+        self._function()
+        end_ns = time.monotonic_ns()
+        run_ms = (end_ns - now_ns) / 1000000
+
+        self.runs += 1
+        if late_ms > self.max_late_ms:
+            self.max_late_ms = late_ms
+        if run_ms > self.max_run_ms:
+            self.max_run_ms = run_ms
+
+        # Stay on the grid of deadlines, skipping any that were missed
+        self._deadline_ns += self._period_ns
+        if end_ns >= self._deadline_ns:
+            missed = (end_ns - self._deadline_ns) // self._period_ns + 1
+            self.overruns += missed
+            self._deadline_ns += missed * self._period_ns
+        return (self._deadline_ns - end_ns) / 1000000000
+
+    async def run(self):
+        """Call the function every period forever"""
+        while True:
+            await asyncio.sleep(self.run_once())
+
+    def report(self):
+        """Return a one line summary of the deadline accounting"""
+        return "%s: runs=%d overruns=%d max_late_ms=%.1f max_run_ms=%.1f" % (
+            self.name,
+            self.runs,
+            self.overruns,
+            self.max_late_ms,
+            self.max_run_ms,
+        )
+
+
+async def run_tasks(tasks):
+    """Run periodic tasks concurrently forever
+
+    Args:
+    tasks: a list of periodic_task
+
+    Returns:
+    Never returns unless a task raises an exception.
+    """
+    await asyncio.gather(*[task.run() for task in tasks])
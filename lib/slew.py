@@ -0,0 +1,123 @@
+"""Library to limit how fast the fan output changes in CircuitPython
+
+slew_limiter sits between the fan control and the PWM output. It is updated
+on every control tick and moves its output toward the target by at most
+up_per_s or down_per_s per second, so the fan spins up quickly on a hot
+spike but slows down gently. Changes smaller than dead_band are ignored so
+the fan does not hunt audibly between nearly equal speeds, except that
+targets of exactly 0 (off) and 1 (full speed) are always followed.
+
+The dead band does not help around 0: the fan control drops straight to 0
+below its dead zone, so a slowly ramped output would pass through the
+minimum duty of the fan and start it again a minute later. min_on_s and
+min_off_s stop that: once the output starts from 0 it does not fall
+below where it is until it has been on for min_on_s, and once it reaches
+0 it stays there for min_off_s unless the target reaches restart_above, so
+a hot spike right after a stop still starts the fan at once.
+"""
+
+import time
+
+
+class slew_limiter:
+    """Rate limited output with a dead band"""
+
+    __slots__ = (
+        "_up_per_s",
+        "_down_per_s",
+        "_dead_band",
+        "_min_on_ns",
+        "_min_off_ns",
+        "_restart_above",
+        "_output",
+        "_last_ns",
+        "_switched_ns",
+    )
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        up_per_s=None,
+        down_per_s=None,
+        dead_band=0.0,
+        output=0.0,
+        min_on_s=0,
+        min_off_s=0,
+        restart_above=1.0,
+    ):
+        """Initializes the limiter
+
+        Args:
+        up_per_s: the most the output may rise in a second. None for no
+        limit.
+        down_per_s: the most the output may fall in a second. None for no
+        limit.
+        dead_band: ignore targets closer than this to the output
+        output: the starting output
+        min_on_s: seconds the output holds after starting from 0 before it
+        may fall
+        min_off_s: seconds the output stays at 0 after it stops, unless the
+        target is at least restart_above
+        restart_above: the target that ends the min_off_s hold early
+
+        Returns:
+        None.
+        """
+        if (up_per_s is not None and up_per_s <= 0) or (
+            down_per_s is not None and down_per_s <= 0
+        ):
+            raise ValueError("Rates must be greater than 0")
+        self._up_per_s = up_per_s
+        self._down_per_s = down_per_s
+        self._dead_band = dead_band
+        self._min_on_ns = int(min_on_s * 1000000000)
+        self._min_off_ns = int(min_off_s * 1000000000)
+        self._restart_above = restart_above
+        self.reset(output)
+
+    def reset(self, output=0.0):
+        """Jump to an output, for example one set by other means"""
+        self._output = output
+        self._last_ns = None
+        self._switched_ns = None  # when the output last started or stopped
+
+    @property
+    def output(self):
+        return self._output
+
+    def update(self, target, now_ns=None):
+        """Move the output toward the target
+
+        Args:
+        target: the output the fan control asks for
+        now_ns: the current time.monotonic_ns(). Read from the clock if None.
+
+        Returns:
+        the new output.
+        """
+        if now_ns is None:
+            now_ns = time.monotonic_ns()
+        if self._last_ns is None:
+            dt = 0.0
+        else:
+            dt = (now_ns - self._last_ns) / 1000000000
+        self._last_ns = now_ns
+
+        delta = target - self._output
+        if abs(delta) < self._dead_band and target != 0 and target != 1:
+            return self._output
+        if self._switched_ns is not None:
+            held_ns = now_ns - self._switched_ns
+            if self._output == 0:
+                if held_ns < self._min_off_ns and target < self._restart_above:
+                    return self._output
+            elif delta < 0 and held_ns < self._min_on_ns:
+                return self._output
+        if self._up_per_s is not None and delta > self._up_per_s * dt:
+            delta = self._up_per_s * dt
+        if self._down_per_s is not None and delta < -self._down_per_s * dt:
+            delta = -self._down_per_s * dt
+        running = self._output > 0
+        self._output += delta
+        if (self._output > 0) != running:
+            self._switched_ns = now_ns
+        return self._output
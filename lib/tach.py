@@ -0,0 +1,231 @@
+"""Library to measure fan speed from the timestamps of tach edges in CircuitPython
+
+Counting tach pulses over a fixed window (countio) has to wait for the
+window and only resolves 60 / (window_s * pulses_per_rev) RPM. edge_tach
+instead keeps the timestamps of the last few rising edges and computes RPM
+from the mean period between them, which is both faster and finer.
+
+At very low speeds there are too few edges in the window for a useful
+period, so edge_tach falls back to counting the edges in the window.
+
+Edges come from a source that is polled from the main loop:
+
+pulsein_source: reads pulse durations from a pulseio.PulseIn on the tach
+pin and turns them into edge timestamps.
+
+simulated_pulse_source: generates the edges of a fan spinning at a set
+speed, to test on a host without hardware.
+"""
+
+import time
+from array import array
+
+
+class edge_tach:
+    """RPM from the period between the last few rising tach edges"""
+
+    __slots__ = (
+        "_edges",
+        "_next",
+        "_count",
+        "_pulses_per_rev",
+        "_window_ns",
+        "_min_edges",
+    )
+
+    def __init__(self, num_edges=9, pulses_per_rev=2, window_s=3, min_edges=3):
+        """Initializes the tach
+
+        Args:
+        num_edges: number of edge timestamps to keep. The RPM is computed
+        from the mean of up to num_edges - 1 periods.
+        pulses_per_rev: tach pulses per fan revolution (2 for PC fans)
+        window_s: only edges within this many seconds are used
+        min_edges: below this many edges in the window, count them instead
+        of measuring the period
+
+        Returns:
+        None.
+        """
+        if min_edges < 2 or num_edges < min_edges:
+            raise ValueError("Need 2 <= min_edges <= num_edges")
+        self._edges = array("q", [0] * num_edges)
+        self._pulses_per_rev = pulses_per_rev
+        self._window_ns = int(window_s * 1000000000)
+        self._min_edges = min_edges
+        self.reset()
+
+    def reset(self):
+        """Forget the edges seen so far"""
+        self._next = 0
+        self._count = 0
+
+    def add_edge(self, t_ns):
+        """Record a rising edge at time.monotonic_ns() t_ns"""
+        self._edges[self._next] = t_ns
+        self._next = (self._next + 1) % len(self._edges)
+        if self._count < len(self._edges):
+            self._count += 1
+
+    def _edge(self, age):
+        """Return the timestamp of an edge. age 0 is the newest."""
+        return self._edges[(self._next - 1 - age) % len(self._edges)]
+
+    def rpm(self, now_ns=None):
+        """Return the fan speed in RPM
+
+        Args:
+        now_ns: the current time.monotonic_ns(). Read from the clock if None.
+        """
+        if now_ns is None:
+            now_ns = time.monotonic_ns()
+        start_ns = now_ns - self._window_ns
+        in_window = 0
+        while in_window < self._count and self._edge(in_window) >= start_ns:
+            in_window += 1
+
+        if in_window < self._min_edges:
+            # Too slow to measure a period, so count the edges instead
+            return in_window * 60000000000 / (self._window_ns * self._pulses_per_rev)
+
+        newest_ns = self._edge(0)
+        period_ns = (newest_ns - self._edge(in_window - 1)) / (in_window - 1)
+        # If the fan is slowing down, the time since the last edge is a
+        # better bound on the current period than the history.
+        if now_ns - newest_ns > period_ns:
+            period_ns = now_ns - newest_ns
+        if period_ns <= 0:
+            return 0
+        return 60000000000 / (period_ns * self._pulses_per_rev)
+
+
+class pulsein_source:
+    """Feeds an edge_tach from a pulseio.PulseIn on the tach pin
+
+    Create the PulseIn with idle_state=True: the tach output is pulled up
+    and the fan pulls it low, so the recorded pulses alternate low, high,
+    low... and each low pulse ends with a rising edge.
+
+    PulseIn records durations rather than times, so the edges are placed by
+    adding the durations to a running clock. The clock starts from the time
+    of the poll that first sees pulses, and restarts if the fan stops.
+    """
+
+    # A PulseIn duration saturates at 65535 us
+    _MAX_PULSE_US = 65535
+
+    __slots__ = ("_pulses", "_tach", "_durations", "_clock_ns", "_low")
+
+    def __init__(self, pulses, tach, maxlen=128):
+        """Initializes the source
+
+        Args:
+        pulses: a pulseio.PulseIn created with idle_state=True
+        tach: the edge_tach to add edges to
+        maxlen: the maxlen the PulseIn was created with
+
+        Returns:
+        None.
+        """
+        self._pulses = pulses
+        self._tach = tach
+        self._durations = array("L", [0] * maxlen)
+        self._clock_ns = None  # time of the end of the last pulse read
+        self._low = True  # whether the next pulse read is a low pulse
+
+    def poll(self, now_ns=None):
+        """Add the edges recorded since the last poll to the tach
+
+        Call this often enough that the PulseIn does not fill up.
+
+        Args:
+        now_ns: the current time.monotonic_ns(). Read from the clock if None.
+
+        Returns:
+        the number of rising edges added.
+        """
+        if now_ns is None:
+            now_ns = time.monotonic_ns()
+        pulses = self._pulses
+        count = 0
+        total_us = 0
+        while len(pulses) and count < len(self._durations):
+            duration = pulses.popleft()
+            self._durations[count] = duration
+            total_us += duration
+            count += 1
+
+        if count == 0:
+            # Restart the clock once the fan has clearly stopped
+            if (
+                self._clock_ns is not None
+                and now_ns - self._clock_ns > 2 * self._MAX_PULSE_US * 1000
+            ):
+                self._clock_ns = None
+                self._low = True
+            return 0
+
+        clock_ns = self._clock_ns
+        if clock_ns is None or clock_ns + total_us * 1000 > now_ns:
+            # Assume the pulses just read ended now
+            clock_ns = now_ns - total_us * 1000
+        edges = 0
+        for i in range(count):
+            duration = self._durations[i]
+            clock_ns += duration * 1000
+            if self._low:
+                if duration < self._MAX_PULSE_US:
+                    self._tach.add_edge(clock_ns)
+                    edges += 1
+            self._low = not self._low
+        self._clock_ns = clock_ns
+        return edges
+
+
+class simulated_pulse_source:
+    """Feeds an edge_tach with the edges of a simulated fan
+
+    Set rpm to change the speed of the fan.
+    """
+
+    __slots__ = ("_tach", "_pulses_per_rev", "_next_edge_ns", "rpm")
+
+    def __init__(self, tach, rpm=0, pulses_per_rev=2):
+        """Initializes the source
+
+        Args:
+        tach: the edge_tach to add edges to
+        rpm: the starting speed of the fan
+        pulses_per_rev: tach pulses per fan revolution
+
+        Returns:
+        None.
+        """
+        self._tach = tach
+        self._pulses_per_rev = pulses_per_rev
+        self._next_edge_ns = None
+        self.rpm = rpm
+
+    def poll(self, now_ns=None):
+        """Add the edges the fan made up to now_ns to the tach
+
+        Args:
+        now_ns: the current time.monotonic_ns(). Read from the clock if None.
+
+        Returns:
+        the number of rising edges added.
+        """
+        if now_ns is None:
+            now_ns = time.monotonic_ns()
+        if self.rpm <= 0:
+            self._next_edge_ns = None
+            return 0
+        period_ns = int(60000000000 / (self.rpm * self._pulses_per_rev))
+        if self._next_edge_ns is None:
+            self._next_edge_ns = now_ns + period_ns
+        edges = 0
+        while self._next_edge_ns <= now_ns:
+            self._tach.add_edge(self._next_edge_ns)
+            self._next_edge_ns += period_ns
+            edges += 1
+        return edges
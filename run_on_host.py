@@ -0,0 +1,150 @@
+"""Run code.py on a Linux host against simulated hardware, in virtual time
+
+The modules in host/ stand in for the CircuitPython modules code.py and the
+drivers import (board, busio, countio, pwmio, ...) and talk to the
+simulated hardware in host/hardware.py. The clock is virtual, so asyncio
+sleeps take no real time and minutes of the control loop run in seconds.
+
+Usage:
+python run_on_host.py [--seconds 600] [--temperature 40] [--scenario step]
+    [--quiet]
+
+With --scenario, the temperature comes from the thermal model in
+host/thermal.py, heated by the scenario's load and cooled by the fan.
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import runpy
+import sys
+import tempfile
+import time
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+HOST_DIR = os.path.join(ROOT_DIR, "host")
+LIB_DIR = os.path.join(ROOT_DIR, "lib")
+CODE_PY = os.path.join(ROOT_DIR, "code.py")
+
+# host/ comes first so its pure Python adafruit_register and
+# adafruit_bus_device replace the .mpy builds in lib/
+for _path in (LIB_DIR, HOST_DIR):
+    if _path not in sys.path:
+        sys.path.insert(0, _path)
+
+import hardware  # pylint: disable=wrong-import-position
+import thermal  # pylint: disable=wrong-import-position
+from virtual_clock import SimulationComplete  # pylint: disable=wrong-import-position
+
+
+class host_run:
+    """The results of run_code_py()"""
+
+    def __init__(self, hardware_, output, virtual_s, wall_s):
+        self.hardware = hardware_
+        self.output = output
+        self.virtual_s = virtual_s
+        self.wall_s = wall_s
+
+    @property
+    def speedup(self):
+        """How many times faster than real time the run was"""
+        if self.wall_s <= 0:
+            return float("inf")
+        return self.virtual_s / self.wall_s
+
+    def lines(self, prefix):
+        """Return the lines of output starting with prefix"""
+        return [line for line in self.output.splitlines() if line.startswith(prefix)]
+
+
+def run_code_py(seconds, hardware_=None, path=CODE_PY, stdout=None, workdir=None):
+    """Run code.py until the virtual clock reaches seconds
+
+    Args:
+    seconds: virtual seconds to run for
+    hardware_: a hardware.simulated_hardware. A new one at 25 C is created
+    if None. Its clock is given an end of seconds.
+    path: the program to run
+    stdout: file to send the output of the program to as well as capturing
+    it, for example sys.stdout
+    workdir: directory to run in, for files the program saves. A temporary
+    directory if None.
+
+    Returns:
+    a host_run.
+    """
+    if hardware_ is None:
+        hardware_ = hardware.simulated_hardware()
+    hardware_.clock.end_ns = hardware_.clock.now_ns + int(seconds * 1000000000)
+    output = io.StringIO()
+    target = output if stdout is None else _tee(output, stdout)
+    start_ns = hardware_.clock.now_ns
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmpdir:
+        os.chdir(tmpdir if workdir is None else workdir)
+        hardware_.install()
+        wall_start = time.perf_counter()
+        try:
+            with contextlib.redirect_stdout(target):
+                runpy.run_path(path, run_name="__main__")
+        except SimulationComplete:
+            pass
+        finally:
+            wall_s = time.perf_counter() - wall_start
+            hardware_.uninstall()
+            os.chdir(cwd)
+    virtual_s = (hardware_.clock.now_ns - start_ns) / 1000000000
+    return host_run(hardware_, output.getvalue(), virtual_s, wall_s)
+
+
+class _tee:
+    def __init__(self, *files):
+        self._files = files
+
+    def write(self, text):
+        for file in self._files:
+            file.write(text)
+        return len(text)
+
+    def flush(self):
+        for file in self._files:
+            file.flush()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--seconds", type=float, default=600)
+    parser.add_argument("--temperature", type=float, default=40)
+    parser.add_argument("--scenario", choices=sorted(thermal.SCENARIOS))
+    parser.add_argument("--quiet", action="store_true", help="hide code.py output")
+    args = parser.parse_args()
+
+    sim = hardware.simulated_hardware(temperature_c=args.temperature)
+    if args.scenario:
+        scenario = thermal.SCENARIOS[args.scenario]
+        plant = thermal.thermal_plant(temperature_c=scenario.ambient_c(0))
+        sim.temperature_source = thermal.plant_temperature_source(
+            plant, scenario, sim.fan
+        )
+    result = run_code_py(
+        args.seconds, sim, stdout=None if args.quiet else sys.stdout
+    )
+    print(
+        "Ran %.0f s in %.2f s (%.0fx real time)"
+        % (result.virtual_s, result.wall_s, result.speedup)
+    )
+    print(
+        "I2C transactions: %d  PWM changes: %d  fan: %.0f RPM  display: %r"
+        % (
+            sim.i2c_transactions,
+            len(sim.pwm_history),
+            sim.fan.rpm,
+            sim.ht16k33.seven_segment_text(),
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
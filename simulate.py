@@ -0,0 +1,112 @@
+"""Simulate the fan control of code.py against a thermal model of the PC
+
+Runs pid_fan_control or simple_fan_control in a closed loop with the
+heatsink model in host/thermal.py, in virtual time, and prints a summary.
+
+Usage:
+python simulate.py [--scenario office_day] [--controller pid|simple|both]
+    [--kp 0.0533] [--ki 1.33e-07] [--set-point 30] [--hysteresis 0]
+    [--up-per-s 0.1] [--down-per-s 0.01] [--dead-band 0.02]
+    [--min-on 180] [--min-off 120]
+    [--hours 24] [--trace trace.csv]
+
+A rate of 0 turns off that slew limit, so
+--hysteresis 60 --up-per-s 0 --down-per-s 0 --dead-band 0 --min-on 0 --min-off 0
+simulates the fixed 60 second lockout code.py used before.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+for _path in (os.path.join(ROOT_DIR, "lib"), os.path.join(ROOT_DIR, "host")):
+    if _path not in sys.path:
+        sys.path.insert(0, _path)
+
+# pylint: disable=wrong-import-position
+import closed_loop
+from thermal import SCENARIOS
+
+
+def write_trace(result, path):
+    """Write the traces of a simulation_result as CSV"""
+    with open(path, "w") as file:
+        file.write("time_s,temperature_c,duty,rpm,load_w\n")
+        for i, t_s in enumerate(result.times_s):
+            file.write(
+                "%.0f,%.3f,%.4f,%.0f,%.1f\n"
+                % (
+                    t_s,
+                    result.temperatures_c[i],
+                    result.duties[i],
+                    result.rpms[i],
+                    result.loads_w[i],
+                )
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), default="office_day")
+    parser.add_argument(
+        "--controller", choices=("pid", "simple", "both"), default="both"
+    )
+    parser.add_argument("--kp", type=float, default=closed_loop.KP)
+    parser.add_argument("--ki", type=float, default=closed_loop.KI)
+    parser.add_argument(
+        "--set-point", type=float, default=closed_loop.SET_POINT_DEGREES_C
+    )
+    parser.add_argument(
+        "--hysteresis", type=float, default=closed_loop.HYSTERESIS_SECONDS
+    )
+    parser.add_argument(
+        "--up-per-s", type=float, default=closed_loop.DUTY_UP_PER_SECOND
+    )
+    parser.add_argument(
+        "--down-per-s", type=float, default=closed_loop.DUTY_DOWN_PER_SECOND
+    )
+    parser.add_argument(
+        "--dead-band", type=float, default=closed_loop.DUTY_DEAD_BAND
+    )
+    parser.add_argument(
+        "--min-on", type=float, default=closed_loop.FAN_MIN_ON_SECONDS
+    )
+    parser.add_argument(
+        "--min-off", type=float, default=closed_loop.FAN_MIN_OFF_SECONDS
+    )
+    parser.add_argument(
+        "--restart-above", type=float, default=closed_loop.FAN_RESTART_OUTPUT
+    )
+    parser.add_argument("--hours", type=float, help="defaults to the scenario's")
+    parser.add_argument("--trace", help="CSV file for the trace of the last run")
+    args = parser.parse_args()
+
+    scenario = SCENARIOS[args.scenario]
+    controllers = ("pid", "simple") if args.controller == "both" else (args.controller,)
+    for controller in controllers:
+        start = time.perf_counter()
+        result = closed_loop.simulate(
+            scenario,
+            controller,
+            set_point=args.set_point,
+            kp=args.kp,
+            ki=args.ki,
+            hysteresis_s=args.hysteresis,
+            up_per_s=args.up_per_s or None,
+            down_per_s=args.down_per_s or None,
+            dead_band=args.dead_band,
+            min_on_s=args.min_on,
+            min_off_s=args.min_off,
+            restart_above=args.restart_above,
+            duration_s=None if args.hours is None else args.hours * 3600,
+        )
+        print(result.summary())
+        print("  (%.2f s)" % (time.perf_counter() - start))
+    if args.trace:
+        write_trace(result, args.trace)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""Replay recorded traces through many fan control settings on every core
+
+The traces are DATA logs from log_data_from_serial.py or CSV traces from
+simulate.py --trace. Each result is appended to the results file (JSON
+Lines) as it finishes; run the same command again to resume an
+interrupted sweep.
+
+Each of --kp, --ki, --hysteresis, --set-point and the slew_limiter
+settings --up-per-s, --down-per-s, --dead-band, --min-on, --min-off and
+--restart-above takes either a comma separated list of values or
+start:stop:count for evenly spaced values. A rate of 0 does not limit the
+slew.
+
+Usage:
+python sweep_traces.py monday.log tuesday.log --kp 0.02:0.2:10
+    --ki 0,1e-7,1e-6 [--hysteresis 0,60] [--set-point 30]
+    [--min-on 0,180] [--controller pid] [--ambient 22] [--workers 8]
+    [--results sweep_results.jsonl] [--top 10]
+"""
+
+import argparse
+import os
+import sys
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+for _path in (os.path.join(ROOT_DIR, "lib"), os.path.join(ROOT_DIR, "host")):
+    if _path not in sys.path:
+        sys.path.insert(0, _path)
+
+# pylint: disable=wrong-import-position
+import closed_loop
+import sweep
+
+
+def parse_values(text):
+    """Parse "a,b,c" or "start:stop:count" into a list of floats"""
+    if ":" in text:
+        start, stop, count = text.split(":")
+        start, stop, count = float(start), float(stop), int(count)
+        if count == 1:
+            return [start]
+        return [start + (stop - start) * i / (count - 1) for i in range(count)]
+    return [float(value) for value in text.split(",")]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("traces", nargs="+")
+    parser.add_argument("--kp", default=str(closed_loop.KP))
+    parser.add_argument("--ki", default=str(closed_loop.KI))
+    parser.add_argument("--hysteresis", default=str(closed_loop.HYSTERESIS_SECONDS))
+    parser.add_argument(
+        "--set-point", default=str(closed_loop.SET_POINT_DEGREES_C)
+    )
+    parser.add_argument("--up-per-s", default=str(closed_loop.DUTY_UP_PER_SECOND))
+    parser.add_argument(
+        "--down-per-s", default=str(closed_loop.DUTY_DOWN_PER_SECOND)
+    )
+    parser.add_argument("--dead-band", default=str(closed_loop.DUTY_DEAD_BAND))
+    parser.add_argument("--min-on", default=str(closed_loop.FAN_MIN_ON_SECONDS))
+    parser.add_argument("--min-off", default=str(closed_loop.FAN_MIN_OFF_SECONDS))
+    parser.add_argument(
+        "--restart-above", default=str(closed_loop.FAN_RESTART_OUTPUT)
+    )
+    parser.add_argument("--controller", default="pid", help="pid, simple or both")
+    parser.add_argument("--ambient", type=float, default=22.0)
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--results", default="sweep_results.jsonl")
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    if args.controller == "both":
+        controllers = ("pid", "simple")
+    else:
+        controllers = (args.controller,)
+    settings_list = sweep.settings_grid(
+        parse_values(args.kp),
+        parse_values(args.ki),
+        parse_values(args.hysteresis),
+        parse_values(args.set_point),
+        controllers,
+        parse_values(args.up_per_s),
+        parse_values(args.down_per_s),
+        parse_values(args.dead_band),
+        parse_values(args.min_on),
+        parse_values(args.min_off),
+        parse_values(args.restart_above),
+    )
+
+    def progress(done, total):
+        print("\r%d/%d jobs" % (done, total), end="", file=sys.stderr)
+
+    ran = sweep.run_sweep(
+        args.traces,
+        settings_list,
+        args.results,
+        args.workers,
+        args.ambient,
+        progress,
+    )
+    print(file=sys.stderr)
+    print("Ran %d jobs, results in %s" % (ran, args.results))
+
+    # Rank the settings by fan starts, summed over the traces, among those
+    # that kept every trace within 10 C of the set point
+    totals = {}
+    for row in sweep.sweep_results(
+        args.results, args.traces, settings_list, args.ambient
+    ):
+        key = tuple(row[name] for name in sweep.SETTINGS)
+        total = totals.setdefault(key, [0.0, 0.0, True])
+        total[0] += row["fan_starts_per_hour"]
+        total[1] += row["mean_duty"]
+        if row["max_temperature_c"] > row["set_point"] + 10:
+            total[2] = False
+    ranked = sorted(
+        (value[0], value[1], key) for key, value in totals.items() if value[2]
+    )
+    for starts, duty, key in ranked[: args.top]:
+        settings = " ".join("%s=%s" % item for item in zip(sweep.SETTINGS, key))
+        print("%s fan_starts_per_hour=%.2f mean_duty=%.3f" % (settings, starts, duty))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""test_animation - the display effects and animator in lib/animation.py"""
+
+import contextlib
+import io
+import unittest
+
+import run_on_host  # pylint: disable=unused-import # puts host/ on sys.path
+import board
+import hardware
+from adafruit_ht16k33 import segments
+from lib.animation import alternate, animator, blink, scroll
+
+SECOND_NS = 1000000000
+
+
+class TestEffects(unittest.TestCase):
+
+    def setUp(self):
+        self.sim = hardware.simulated_hardware()
+        self.sim.install()
+        self.display = segments.Seg7x4(board.I2C())
+
+    def tearDown(self):
+        self.sim.uninstall()
+
+    def text(self):
+        return self.sim.ht16k33.seven_segment_text()
+
+    def test_scroll(self):
+        effect = scroll(self.display, "12.3", delay_s=0.5, loop=False)
+        self.assertEqual(0.5, next(effect))
+        self.assertEqual("   1", self.text())
+        # The dot is drawn with the 2
+        next(effect)
+        self.assertEqual("  12.", self.text())
+        next(effect)
+        self.assertEqual(" 12.3", self.text())
+        with self.assertRaises(StopIteration):
+            next(effect)
+
+    def test_blink(self):
+        effect = blink(self.display, "42", on_s=1, off_s=0.25, count=1)
+        self.assertEqual(1, next(effect))
+        self.assertEqual("  42", self.text())
+        self.assertEqual(0.25, next(effect))
+        self.assertEqual("    ", self.text())
+        with self.assertRaises(StopIteration):
+            next(effect)
+
+    def test_alternate(self):
+        draws = []
+        effect = alternate((lambda: draws.append("a"), lambda: draws.append("b")), 3)
+        for _ in range(3):
+            self.assertEqual(3, next(effect))
+        self.assertEqual(["a", "b", "a"], draws)
+
+
+class TestAnimator(unittest.TestCase):
+
+    def test_deadlines(self):
+        draws = []
+        animation = animator()
+        animation.start(alternate((lambda: draws.append("a"),), 2), now_ns=0)
+        fast = animation.start(
+            alternate((lambda: draws.append("b"),), 0.5), 0.25, now_ns=0
+        )
+        self.assertEqual(0.25, animation.step(0))
+        self.assertEqual(["a"], draws)
+        self.assertEqual(0.5, animation.step(SECOND_NS // 4))
+        self.assertEqual(["a", "b"], draws)
+        # Nothing is due yet
+        self.assertEqual(0.25, animation.step(SECOND_NS // 2))
+        self.assertEqual(["a", "b"], draws)
+        # Missed deadlines are not caught up
+        self.assertEqual(0.5, animation.step(3 * SECOND_NS))
+        self.assertEqual(["a", "b", "a", "b"], draws)
+        animation.stop(fast)
+        self.assertEqual(1, len(animation))
+        self.assertEqual(1, animation.step(3 * SECOND_NS))
+
+    def test_finished_effects(self):
+        animation = animator()
+        animation.start(iter((1,)), now_ns=0)
+        self.assertEqual(1, animation.step(0))
+        self.assertIsNone(animation.step(SECOND_NS))
+        self.assertEqual(0, len(animation))
+
+    def test_failing_effect(self):
+        def failing():
+            yield 1
+            raise ValueError("Input overflow")
+
+        draws = []
+        animation = animator()
+        animation.start(failing(), now_ns=0)
+        animation.start(alternate((lambda: draws.append("a"),), 2), now_ns=0)
+        self.assertEqual(1, animation.step(0))
+        with contextlib.redirect_stdout(io.StringIO()) as output:
+            self.assertEqual(1, animation.step(SECOND_NS))
+        self.assertIn("Input overflow", output.getvalue())
+        self.assertEqual(1, len(animation))
+        self.assertEqual(2, animation.step(2 * SECOND_NS))
+        self.assertEqual(["a", "a"], draws)
+
+
+if __name__ == "__main__":
+    unittest.main()
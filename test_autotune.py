@@ -0,0 +1,153 @@
+"""test_autotune - some unit tests for the autotune module"""
+
+import math
+import os
+import tempfile
+import unittest
+from lib.autotune import (
+    STATE_DONE,
+    STATE_FAILED,
+    STATE_RUNNING,
+    load_gains,
+    relay_autotune,
+    save_gains,
+)
+
+import run_on_host  # puts host/ on sys.path
+import hardware
+import thermal
+
+SECOND = 1000000000
+
+
+def run_relay(tuner, plant, load_w, seconds):
+    """Run the relay experiment against a thermal plant, once a second"""
+    for t in range(seconds):
+        temperature = round(plant.temperature * 8) / 8
+        duty = tuner.update(temperature, t * SECOND)
+        if tuner.state != STATE_RUNNING:
+            return t
+        plant.step(1, duty, load_w, 22)
+    return seconds
+
+
+class TestRelayAutotune(unittest.TestCase):
+
+    def test_relay(self):
+        tuner = relay_autotune(30, hysteresis_c=0.25)
+        self.assertEqual(1.0, tuner.update(31, 0))
+        self.assertEqual(1.0, tuner.update(29.9, SECOND))
+        self.assertEqual(0.0, tuner.update(29.5, 2 * SECOND))
+        self.assertEqual(0.0, tuner.update(30.2, 3 * SECOND))
+        self.assertEqual(1.0, tuner.update(30.5, 4 * SECOND))
+        self.assertIsNone(tuner.gains())
+
+    def test_square_wave(self):
+        # A temperature that swings +/-1 C every 60 s
+        tuner = relay_autotune(30, hysteresis_c=0.25, cycles=3)
+        t = 0
+        while tuner.state == STATE_RUNNING and t < 1000:
+            tuner.update(30 + math.sin(2 * math.pi * t / 60), t * SECOND)
+            t += 1
+        self.assertEqual(STATE_DONE, tuner.state)
+        self.assertAlmostEqual(60, tuner.ultimate_period_s, delta=1)
+        expected_ku = 4 * 0.5 / (math.pi * math.sqrt(1 - 0.25**2))
+        self.assertAlmostEqual(expected_ku, tuner.ultimate_gain, delta=0.01)
+        gains = tuner.gains()
+        self.assertAlmostEqual(0.45 * expected_ku, gains["kp"], delta=0.01)
+        self.assertAlmostEqual(
+            gains["kp"] / (tuner.ultimate_period_s / 1.2 * 1000), gains["ki"]
+        )
+
+    def test_thermal_plant(self):
+        plant = thermal.thermal_plant(temperature_c=32)
+        tuner = relay_autotune(30)
+        seconds = run_relay(tuner, plant, 55, 3600)
+        self.assertEqual(STATE_DONE, tuner.state)
+        self.assertLess(seconds, 3600)
+        self.assertGreater(tuner.gains()["kp"], 0)
+
+    def test_no_oscillation(self):
+        # Too little heat to ever rise above the set point
+        plant = thermal.thermal_plant(temperature_c=22)
+        tuner = relay_autotune(30, max_duration_s=600)
+        run_relay(tuner, plant, 5, 3600)
+        self.assertEqual(STATE_FAILED, tuner.state)
+        self.assertIsNone(tuner.gains())
+        self.assertEqual(0.0, tuner.update(40, 700 * SECOND))
+
+
+class TestGainsFile(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "gains.json")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_round_trip(self):
+        self.assertIsNone(load_gains(self.path))
+        self.assertTrue(save_gains(self.path, {"kp": 0.5, "ki": 1e-5}))
+        self.assertEqual({"kp": 0.5, "ki": 1e-5}, load_gains(self.path))
+        self.assertTrue(save_gains(self.path, {"kp": 0.25, "ki": 1e-6}))
+        self.assertEqual(0.25, load_gains(self.path)["kp"])
+
+    def test_reset_during_rename(self):
+        self.assertTrue(save_gains(self.path, {"kp": 0.5, "ki": 1e-5}))
+        # The old file was removed but the new one not yet renamed
+        os.rename(self.path, self.path + ".tmp")
+        self.assertEqual({"kp": 0.5, "ki": 1e-5}, load_gains(self.path))
+        self.assertTrue(save_gains(self.path, {"kp": 0.25, "ki": 1e-6}))
+        self.assertFalse(os.path.exists(self.path + ".tmp"))
+        self.assertEqual(0.25, load_gains(self.path)["kp"])
+
+    def test_bad_file(self):
+        with open(self.path, "w") as f:
+            f.write('{"kp": 0.5')
+        self.assertIsNone(load_gains(self.path))
+        with open(self.path, "w") as f:
+            f.write('{"kp": 0.5}')
+        self.assertIsNone(load_gains(self.path))
+
+    def test_read_only(self):
+        path = os.path.join(self.directory.name, "missing", "gains.json")
+        self.assertFalse(save_gains(path, {"kp": 0.5, "ki": 1e-5}))
+
+
+class TestAutotuneOnHost(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        os.environ["FAN_AUTOTUNE"] = "1"
+
+    def tearDown(self):
+        del os.environ["FAN_AUTOTUNE"]
+        self.directory.cleanup()
+
+    def test_code_py(self):
+        sim = hardware.simulated_hardware()
+        plant = thermal.thermal_plant(temperature_c=32)
+        steady = thermal.scenario("steady", 3600, lambda t_s: 55, lambda t_s: 22)
+        sim.temperature_source = thermal.plant_temperature_source(
+            plant, steady, sim.fan
+        )
+        result = run_on_host.run_code_py(1800, sim, workdir=self.directory.name)
+        self.assertEqual(1, len(result.lines("AUTOTUNE: Ku=")))
+        gains = load_gains(os.path.join(self.directory.name, "pid_gains.json"))
+        self.assertIsNotNone(gains)
+        # The relay switched the fan fully on and off
+        duties = set(duty for _, duty in sim.pwm_history)
+        self.assertIn(0, duties)
+        self.assertIn(65535, duties)
+
+        # The next boot uses the saved gains instead of tuning again
+        result = run_on_host.run_code_py(
+            10, hardware.simulated_hardware(40), workdir=self.directory.name
+        )
+        self.assertEqual(0, len(result.lines("AUTOTUNE")))
+        self.assertEqual(1, len(result.lines("Loaded PID gains Kp=%f" % gains["kp"])))
+
+
+if __name__ == "__main__":
+    unittest.main()
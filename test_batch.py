@@ -0,0 +1,73 @@
+"""test_batch - the NumPy batch simulator in host/batch.py"""
+
+import unittest
+
+import run_on_host  # pylint: disable=unused-import # puts host/ on sys.path
+import closed_loop
+from thermal import SCENARIOS, scenario
+
+try:
+    import numpy as np
+    import batch
+except ImportError:
+    np = None
+
+
+@unittest.skipUnless(np, "needs numpy")
+class TestBatch(unittest.TestCase):
+
+    def test_grid(self):
+        settings = batch.grid(kp=[1, 2], ki=[0, 1, 2], set_point=[30])
+        self.assertEqual(6, len(settings["kp"]))
+        self.assertEqual([1, 1, 1, 2, 2, 2], list(settings["kp"]))
+        self.assertEqual([0, 1, 2, 0, 1, 2], list(settings["ki"]))
+
+    def test_matches_closed_loop(self):
+        # Includes a set point that float32 cannot hold exactly and gains
+        # that reach the dead zone, the output clamp and the integral clamp
+        settings = batch.grid(
+            kp=[0.02, 0.0533, 0.3],
+            ki=[0, 1.33e-7, 1e-5],
+            hysteresis_s=[0, 60],
+            set_point=[30, 30.3],
+        )
+        step = SCENARIOS["step"]
+        result = batch.simulate_batch(step, duration_s=2 * 3600, **settings)
+        for i in range(len(result)):
+            row = result.row(i)
+            expected = closed_loop.simulate(
+                step,
+                kp=row["kp"],
+                ki=row["ki"],
+                hysteresis_s=row["hysteresis_s"],
+                set_point=row["set_point"],
+                duration_s=2 * 3600,
+            )
+            self.assertEqual(expected.mean_duty, row["mean_duty"])
+            self.assertAlmostEqual(
+                expected.max_temperature_c, row["max_temperature_c"], places=9
+            )
+            self.assertAlmostEqual(
+                expected.mean_temperature_c, row["mean_temperature_c"], places=9
+            )
+
+    def test_metrics(self):
+        hot = scenario("hot", 3600, lambda t_s: 80, lambda t_s: 22)
+        result = batch.simulate_batch(
+            hot, kp=[0.0, 2.0], ki=0, hysteresis_s=0, set_point=30
+        )
+        # Without gain the fan never runs or settles
+        self.assertEqual(0, result.toggles_per_hour[0])
+        self.assertEqual(0, result.mean_duty[0])
+        self.assertEqual(np.inf, result.settling_time_s[0])
+        # A strong proportional gain holds near the set point
+        self.assertEqual(1, result.toggles_per_hour[1])
+        self.assertGreater(result.mean_duty[1], 0)
+        self.assertLess(result.settling_time_s[1], 600)
+        self.assertLess(result.overshoot_c[1], 1)
+        self.assertEqual([1], result.best("max_temperature_c", 1))
+        self.assertEqual([], result.best("mean_duty", 1, result.kp > 2))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+"""test_fan_control - some unit tests for the fan_control module"""
+
+import unittest
+from lib.fan_control import fan_pid, pid_fan_control, simple_fan_control
+from lib.fan_curve import fan_curve
+
+
+class TestPidFanControl(unittest.TestCase):
+
+    def control(self, pid, temperature, t_s, feed_forward=0):
+        return pid_fan_control(
+            temperature, pid, feed_forward, False, int(t_s * 1000000000)
+        )
+
+    def test_proportional(self):
+        self.assertAlmostEqual(0.5, self.control(fan_pid(30, 0.1, 0), 35, 0))
+
+    def test_dead_zone_and_clamp(self):
+        pid = fan_pid(30, 0.1, 0)
+        self.assertEqual(0, self.control(pid, 30.5, 0))
+        self.assertEqual(1, self.control(pid, 50, 1))
+
+    def test_integral(self):
+        pid = fan_pid(30, 0.1, 1e-5)
+        self.assertAlmostEqual(0.2, self.control(pid, 32, 0))
+        for t_s in range(1, 6):
+            output = self.control(pid, 32, t_s)
+        # 0.1 * 2 + 1e-5 * 2 * 5000
+        self.assertAlmostEqual(0.3, output)
+        self.assertAlmostEqual(0.1, pid.integral)
+
+    def test_integral_clamp(self):
+        pid = fan_pid(30, 0.1, 1)
+        for t_s in range(5):
+            self.control(pid, 35, t_s)
+        self.assertAlmostEqual(0.2, pid.integral)
+        self.assertAlmostEqual(0.7, self.control(pid, 35, 5))
+        pid = fan_pid(30, 0.1, 1)
+        for t_s in range(5):
+            output = self.control(pid, 25, t_s, 1)
+        # Clamped to -0.2, not flipped to +0.2: 1 - 0.5 - 0.2
+        self.assertAlmostEqual(-0.2, pid.integral)
+        self.assertAlmostEqual(0.3, output)
+
+    def test_feed_forward(self):
+        pid = fan_pid(30, 0.1, 0)
+        self.assertAlmostEqual(0.6, self.control(pid, 31, 0, 0.5))
+        # The limits apply to the total
+        self.assertEqual(1, self.control(pid, 31, 1, 1))
+        self.assertEqual(0, self.control(pid, 29, 2, 0.15))
+
+
+class TestSimpleFanControl(unittest.TestCase):
+
+    def test_curve(self):
+        self.assertEqual(0, simple_fan_control(20))
+        self.assertEqual(0, simple_fan_control(31))
+        self.assertAlmostEqual(0.1, simple_fan_control(32))
+        # Between the old steps the output ramps
+        self.assertAlmostEqual(0.5, simple_fan_control(36.5))
+        self.assertAlmostEqual(1, simple_fan_control(41))
+        self.assertAlmostEqual(1, simple_fan_control(60))
+
+    def test_other_curve(self):
+        curve = fan_curve(((30, 0), (40, 1)))
+        self.assertAlmostEqual(0.25, simple_fan_control(32.5, curve))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,120 @@
+"""test_fan_curve - some unit tests for the fan_curve module"""
+
+import os
+import random
+import tempfile
+import unittest
+from lib.fan_curve import fan_curve, load_curve, load_curves, parse_points
+
+
+class TestFanCurve(unittest.TestCase):
+
+    def test_interpolation(self):
+        curve = fan_curve(((30, 0), (35, 0.5), (45, 1)))
+        self.assertEqual(0, curve.output_at(20))
+        self.assertEqual(0, curve.output_at(30))
+        self.assertAlmostEqual(0.25, curve.output_at(32.5))
+        self.assertAlmostEqual(0.5, curve.output_at(35))
+        self.assertAlmostEqual(0.75, curve.output_at(40))
+        self.assertEqual(1, curve.output_at(45))
+        self.assertEqual(1, curve.output_at(80))
+
+    def test_search(self):
+        # The binary search agrees with a linear scan
+        points = [(20 + i * 1.5, random.random()) for i in range(20)]
+        curve = fan_curve(points)
+        points = curve.points()
+        for _ in range(200):
+            t = random.uniform(15, 55)
+            expected = points[-1][1]
+            if t <= points[0][0]:
+                expected = points[0][1]
+            for (t0, o0), (t1, o1) in zip(points, points[1:]):
+                if t0 <= t < t1:
+                    expected = o0 + (o1 - o0) * (t - t0) / (t1 - t0)
+            self.assertAlmostEqual(expected, curve.output_at(t), places=5)
+
+    def test_single_point(self):
+        curve = fan_curve(((30, 0.4),))
+        self.assertAlmostEqual(0.4, curve.output_at(10))
+        self.assertAlmostEqual(0.4, curve.output_at(50))
+
+    def test_bad_points(self):
+        with self.assertRaises(ValueError):
+            fan_curve(())
+        with self.assertRaises(ValueError):
+            fan_curve(((35, 0), (30, 1)))
+        with self.assertRaises(ValueError):
+            fan_curve(((30, 0), (30, 1)))
+        with self.assertRaises(ValueError):
+            fan_curve(((30, 0),), hysteresis_c=-1)
+
+    def test_hysteresis(self):
+        curve = fan_curve(((30, 0), (40, 1)), hysteresis_c=2)
+        self.assertAlmostEqual(0.5, curve.update(35))
+        # Rising follows the curve at once
+        self.assertAlmostEqual(0.6, curve.update(36))
+        # Falling less than the hysteresis holds the output
+        self.assertAlmostEqual(0.6, curve.update(34.5))
+        self.assertAlmostEqual(0.6, curve.update(35.5))
+        # Then follows the curve 2 C behind
+        self.assertAlmostEqual(0.5, curve.update(33))
+        self.assertAlmostEqual(0.3, curve.update(31))
+        curve.reset()
+        self.assertAlmostEqual(0.1, curve.update(31))
+
+    def test_no_hysteresis(self):
+        curve = fan_curve(((30, 0), (40, 1)))
+        self.assertAlmostEqual(0.5, curve.update(35))
+        self.assertAlmostEqual(0.4, curve.update(34))
+
+
+class TestLoadCurve(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "fan_curves.json")
+
+    def tearDown(self):
+        self.directory.cleanup()
+        os.environ.pop("FAN_CURVE", None)
+        os.environ.pop("FAN_CURVE_HYSTERESIS", None)
+
+    def test_parse_points(self):
+        self.assertEqual([(30, 0), (35.5, 0.25)], parse_points("30:0, 35.5:0.25"))
+
+    def test_json(self):
+        with open(self.path, "w") as f:
+            f.write(
+                '{"quiet": {"points": [[30, 0], [50, 1]], "hysteresis_c": 1.5},'
+                ' "loud": {"points": [[25, 0.5]]}}'
+            )
+        curves = load_curves(self.path)
+        self.assertEqual(1.5, curves["quiet"].hysteresis_c)
+        self.assertEqual(0, curves["loud"].hysteresis_c)
+        self.assertAlmostEqual(0.5, curves["quiet"].output_at(40))
+        self.assertIs(None, load_curve(self.path, "missing"))
+        self.assertAlmostEqual(0.5, load_curve(self.path, "loud").output_at(0))
+
+    def test_bad_json(self):
+        with open(self.path, "w") as f:
+            f.write('{"quiet": {"hysteresis_c": 1.5}}')
+        with self.assertRaises(ValueError):
+            load_curves(self.path)
+
+    def test_missing_file(self):
+        self.assertEqual({}, load_curves(self.path))
+        self.assertIsNone(load_curve(self.path, "quiet"))
+        self.assertIsNone(load_curve())
+
+    def test_settings(self):
+        # os.getenv() reads settings.toml on the board
+        os.environ["FAN_CURVE"] = "30:0,40:1"
+        os.environ["FAN_CURVE_HYSTERESIS"] = "0.5"
+        curve = load_curve(self.path, "quiet")
+        self.assertEqual(0.5, curve.hysteresis_c)
+        self.assertAlmostEqual(0.5, curve.output_at(35))
+
+
+if __name__ == "__main__":
+    unittest.main()
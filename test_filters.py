@@ -0,0 +1,74 @@
+"""test_filters - some unit tests for the filters module"""
+
+import random
+import statistics
+import unittest
+from lib.filters import ema_filter, median_filter, hampel_filter
+
+
+class TestEmaFilter(unittest.TestCase):
+
+    def test_update(self):
+        ema = ema_filter(0.5)
+        self.assertEqual(10, ema.update(10))
+        self.assertEqual(15, ema.update(20))
+        self.assertEqual(17.5, ema.update(20))
+        ema.reset()
+        self.assertEqual(4, ema.update(4))
+
+    def test_alpha(self):
+        with self.assertRaises(ValueError):
+            ema_filter(0)
+        with self.assertRaises(ValueError):
+            ema_filter(1.5)
+
+
+class TestMedianFilter(unittest.TestCase):
+
+    def test_against_reference(self):
+        rng = random.Random(3)
+        for k in (1, 2, 5, 8):
+            median = median_filter(k)
+            history = []
+            for _ in range(100):
+                # Quarter degree steps are exact as floats
+                value = rng.randint(-40, 40) / 4
+                history.append(value)
+                window = history[-k:]
+                self.assertEqual(statistics.median(window), median.update(value))
+                deviations = [abs(v - statistics.median(window)) for v in window]
+                self.assertEqual(statistics.median(deviations), median.mad())
+
+    def test_reset(self):
+        median = median_filter(3)
+        self.assertIsNone(median.median())
+        median.update(1)
+        median.update(100)
+        median.reset()
+        self.assertEqual(0, median.count())
+        self.assertEqual(5, median.update(5))
+
+
+class TestHampelFilter(unittest.TestCase):
+
+    def test_rejects_spike(self):
+        hampel = hampel_filter(5, min_deviation=0.5)
+        readings = [30, 30.125, 30, 30.125, 30, 85, 30.125, 30]
+        self.assertEqual([30, 30.125, 30, 30.125, 30, 30, 30.125, 30],
+                         [hampel.update(reading) for reading in readings])
+
+    def test_follows_step(self):
+        hampel = hampel_filter(5, min_deviation=0.5)
+        outputs = [hampel.update(reading) for reading in [30] * 5 + [40] * 5]
+        # The step is treated as a spike until it is most of the window
+        self.assertEqual(30, outputs[5])
+        self.assertEqual(40, outputs[-1])
+
+    def test_passes_small_changes(self):
+        hampel = hampel_filter(5, min_deviation=0.5)
+        readings = [30, 30, 30, 30, 30.25, 30.5, 30.5, 30.75]
+        self.assertEqual(readings, [hampel.update(reading) for reading in readings])
+
+
+if __name__ == "__main__":
+    unittest.main()
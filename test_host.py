@@ -0,0 +1,112 @@
+"""test_host - run code.py against the simulated hardware in host/"""
+
+import ast
+import os
+import tempfile
+import unittest
+
+from run_on_host import run_code_py
+import hardware
+import pulseio
+from lib.tach import edge_tach, pulsein_source
+
+
+class TestRunOnHost(unittest.TestCase):
+
+    def test_code_py(self):
+        sim = hardware.simulated_hardware(temperature_c=40)
+        result = run_code_py(300, sim)
+        self.assertEqual(300, result.virtual_s)
+        # Much faster than real time
+        self.assertGreater(result.speedup, 10)
+
+        # 40 C is well above the set point, so the fan was turned on
+        self.assertGreater(len(sim.pwm_history), 0)
+        self.assertGreater(sim.pwm_history[-1][1], 0)
+        self.assertGreater(sim.fan.rpm, 0)
+        self.assertGreater(sim.pct2075.reads, 0)
+        self.assertTrue(sim.ht16k33.oscillator_on)
+        self.assertNotEqual("    ", sim.ht16k33.seven_segment_text())
+        data = result.lines("DATA:")
+        self.assertGreaterEqual(len(data), 99)
+        self.assertIn("'temp': 40.0", data[-1])
+        self.assertEqual(1, len(result.lines("TASK: telemetry")))
+
+    def test_temperature_source(self):
+        sim = hardware.simulated_hardware()
+        sim.temperature_source = lambda now_s: 20 + now_s / 10
+        result = run_code_py(60, sim)
+        self.assertIn("'temp': 25.", result.lines("DATA:")[-1])
+
+    def test_out_of_range_readings(self):
+        # Readings too wide for the display must not stop the controller
+        for temperature_c, text in ((105.0, " 105"), (-12.0, " -12")):
+            sim = hardware.simulated_hardware(temperature_c)
+            shown = []
+            write = sim.ht16k33.write
+
+            def record(data, write=write, sim=sim, shown=shown):
+                write(data)
+                shown.append(sim.ht16k33.seven_segment_text())
+
+            sim.ht16k33.write = record
+            result = run_code_py(60, sim)
+            self.assertEqual(60, result.virtual_s)
+            self.assertGreaterEqual(len(result.lines("DATA:")), 19)
+            self.assertIn(text, shown)
+            self.assertEqual(0, len(result.lines("Stopping an animation")))
+
+    def test_display_error(self):
+        # One failed write to the display must not freeze it
+        sim = hardware.simulated_hardware(40)
+        writes = []
+        write = sim.ht16k33.write
+
+        def flaky(data):
+            # Fail the third write of digits, once the display is running
+            if len(data) > 1:
+                writes.append(data)
+                if len(writes) == 3:
+                    raise OSError(5, "Input/output error")
+            write(data)
+
+        sim.ht16k33.write = flaky
+        result = run_code_py(60, sim)
+        self.assertEqual(1, len(result.lines("Could not update the display")))
+        self.assertEqual(0, len(result.lines("Stopping an animation")))
+        self.assertGreater(len(writes), 10)
+
+    def test_saves_samples(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            run_code_py(120, hardware.simulated_hardware(40), workdir=tmpdir)
+            self.assertTrue(os.path.exists(os.path.join(tmpdir, "temp_samples.bin")))
+            result = run_code_py(10, hardware.simulated_hardware(40), workdir=tmpdir)
+        self.assertEqual(1, len(result.lines("Restored 30 temperature samples")))
+        # The PID integral carries on from the last saved sample, a minute
+        # into the first run, rather than restarting from 0
+        sample = ast.literal_eval(result.lines("DATA:")[-1][5:].strip())
+        self.assertGreater(sample["pid_integral"], 0.07)
+
+
+class TestHostModules(unittest.TestCase):
+
+    def setUp(self):
+        self.sim = hardware.simulated_hardware()
+        self.sim.install()
+
+    def tearDown(self):
+        self.sim.uninstall()
+
+    def test_pulsein(self):
+        self.sim.fan.duty = 0.5
+        self.sim.clock.sleep(10)
+        tach = edge_tach()
+        pulses = pulseio.PulseIn(None, maxlen=128, idle_state=True)
+        source = pulsein_source(pulses, tach)
+        self.sim.clock.sleep(0.5)
+        source.poll()
+        self.assertAlmostEqual(850, tach.rpm(), delta=10)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,216 @@
+"""test_ht16k33 - the HT16K33 display library against the simulated driver"""
+
+import unittest
+
+import run_on_host  # pylint: disable=unused-import # puts host/ on sys.path
+import board
+import hardware
+from adafruit_ht16k33 import segments
+
+
+class TestShow(unittest.TestCase):
+
+    def setUp(self):
+        self.sim = hardware.simulated_hardware()
+        self.second = hardware.ht16k33_model()
+        self.sim.i2c_devices[0x71] = self.second
+        self.sim.install()
+
+    def tearDown(self):
+        self.sim.uninstall()
+
+    def test_skips_unchanged(self):
+        display = segments.Seg7x4(board.I2C())
+        display.print("850")
+        writes = self.sim.ht16k33.writes
+        display.fill(0)
+        display.print("850")
+        # fill(0) changed the digits and print() put them back
+        self.assertEqual(writes + 2, self.sim.ht16k33.writes)
+        display.show()
+        self.assertEqual(writes + 2, self.sim.ht16k33.writes)
+        self.assertEqual(" 850", self.sim.ht16k33.seven_segment_text())
+
+    def test_writes_changed_range(self):
+        display = segments.Seg7x4(board.I2C())
+        display.print("1234")
+        written = self.sim.ht16k33.bytes_written
+        display.print("1235")
+        # The RAM address and the last digit
+        self.assertEqual(written + 2, self.sim.ht16k33.bytes_written)
+        self.assertEqual("1235", self.sim.ht16k33.seven_segment_text())
+
+        display.changed_only = False
+        display.print("1236")
+        self.assertEqual(written + 2 + 17, self.sim.ht16k33.bytes_written)
+        self.assertEqual("1236", self.sim.ht16k33.seven_segment_text())
+
+    def test_force(self):
+        display = segments.Seg7x4(board.I2C())
+        display.print("42")
+        self.sim.ht16k33.ram[:] = bytes(16)
+        display.show()
+        self.assertEqual("    ", self.sim.ht16k33.seven_segment_text())
+        display.show(force=True)
+        self.assertEqual("  42", self.sim.ht16k33.seven_segment_text())
+
+    def test_chained(self):
+        display = segments.Seg7x4(board.I2C(), address=(0x70, 0x71))
+        display.print("12345678")
+        self.assertEqual("1234", self.sim.ht16k33.seven_segment_text())
+        self.assertEqual("5678", self.second.seven_segment_text())
+        writes = self.sim.ht16k33.writes
+        display.set_digit_raw(7, segments.NUMBERS[9])
+        self.assertEqual(writes, self.sim.ht16k33.writes)
+        self.assertEqual("5679", self.second.seven_segment_text())
+
+    def test_bulk_show(self):
+        i2c = board.I2C()
+        display = segments.Seg7x4(i2c, address=(0x70, 0x71), auto_write=False)
+        display.bulk_show = True
+        locks = []
+        try_lock = i2c.try_lock
+        i2c.try_lock = lambda: locks.append(1) or try_lock()
+        display.print("12345678")
+        display.show()
+        self.assertEqual(1, len(locks))
+        self.assertEqual("1234", self.sim.ht16k33.seven_segment_text())
+        self.assertEqual("5678", self.second.seven_segment_text())
+        self.assertTrue(i2c.try_lock())
+
+
+class TestBatch(unittest.TestCase):
+
+    def setUp(self):
+        self.sim = hardware.simulated_hardware()
+        self.sim.install()
+
+    def tearDown(self):
+        self.sim.uninstall()
+
+    def test_one_write(self):
+        display = segments.Seg7x4(board.I2C())
+        display.print("1234")
+        writes = self.sim.ht16k33.writes
+        with display.batch():
+            display.fill(0)
+            with display.batch():
+                display.print("32 C")
+            self.assertEqual(writes, self.sim.ht16k33.writes)
+            self.assertFalse(display.auto_write)
+        self.assertEqual(writes + 1, self.sim.ht16k33.writes)
+        self.assertEqual("32 C", self.sim.ht16k33.seven_segment_text())
+        self.assertTrue(display.auto_write)
+
+    def test_exception(self):
+        display = segments.Seg7x4(board.I2C())
+        writes = self.sim.ht16k33.writes
+        with self.assertRaises(ValueError):
+            with display.batch():
+                display.print(12345)
+        self.assertEqual(writes, self.sim.ht16k33.writes)
+        self.assertTrue(display.auto_write)
+        display = segments.Seg7x4(board.I2C(), auto_write=False)
+        writes = self.sim.ht16k33.writes
+        with display.batch():
+            display.print("1")
+        self.assertFalse(display.auto_write)
+        self.assertEqual(writes, self.sim.ht16k33.writes)
+
+
+class TestPrintText(unittest.TestCase):
+
+    TEXTS = ("", "850", "32 C", "1.5", "1..5", ".", "12345", "-7.", "ab:c", "H\ti")
+
+    def setUp(self):
+        self.sim = hardware.simulated_hardware()
+        self.sim.i2c_devices[0x71] = hardware.ht16k33_model()
+        self.sim.install()
+
+    def tearDown(self):
+        self.sim.uninstall()
+
+    def assert_matches_print(self, display):
+        # pylint: disable=protected-access
+        for text in self.TEXTS:
+            display.fill(1)
+            display.fill(0)
+            display.print(text)
+            expected = bytes(display._buffer)
+            display.fill(1)
+            display.print_text(text)
+            self.assertEqual(expected, bytes(display._buffer), text)
+
+    def test_matches_print(self):
+        i2c = board.I2C()
+        for address in (0x70, (0x70, 0x71)):
+            self.assert_matches_print(segments.Seg7x4(i2c, address, auto_write=False))
+            self.assert_matches_print(segments.Seg14x4(i2c, address, auto_write=False))
+
+    def test_frame_cache(self):
+        display = segments.Seg7x4(board.I2C())
+        display.frame_cache_size = 2
+        display.print_text("1")
+        display.print_text("2")
+        display.print_text("1")
+        display.print_text("3")
+        # "2" was the least recently shown, so it made way for "3"
+        # pylint: disable=protected-access
+        self.assertEqual(["1", "3"], sorted(display._frame_cache))
+        self.assertEqual("   3", self.sim.ht16k33.seven_segment_text())
+        writes = self.sim.ht16k33.writes
+        display.print_text("3")
+        self.assertEqual(writes, self.sim.ht16k33.writes)
+
+
+class TestPrintNumber(unittest.TestCase):
+
+    def setUp(self):
+        self.sim = hardware.simulated_hardware()
+        self.sim.i2c_devices[0x71] = hardware.ht16k33_model()
+        self.sim.install()
+
+    def tearDown(self):
+        self.sim.uninstall()
+
+    def test_matches_print_text(self):
+        i2c = board.I2C()
+        for address in (0x70, (0x70, 0x71)):
+            display = segments.Seg7x4(i2c, address, auto_write=False)
+            cases = (
+                ((850,), "%d" % 850),
+                ((0,), "0"),
+                ((-42,), "-42"),
+                ((31.6, 0, display.segments_for(" C")), "32 C"),
+                ((-5.25, 1), "-5.2"),
+                ((0.05, 2), "0.05"),
+                ((7.0, 1, display.segments_for("C")), "7.0C"),
+            )
+            for args, text in cases:
+                display.print_text(text)
+                expected = bytes(display._buffer)  # pylint: disable=protected-access
+                display.fill(1)
+                display.print_fixed(*args)
+                # pylint: disable=protected-access
+                self.assertEqual(expected, bytes(display._buffer), text)
+
+    def test_overflow(self):
+        display = segments.Seg7x4(board.I2C())
+        display.print_int(-999)
+        self.assertEqual("-999", self.sim.ht16k33.seven_segment_text())
+        suffix = display.segments_for(" C")
+        for args in (
+            (12345,),
+            (-1000,),
+            (100, 0, suffix),
+            (1, 3, suffix[1:]),
+            (float("inf"),),
+            (float("nan"),),
+        ):
+            with self.assertRaises(ValueError):
+                display.print_fixed(*args)
+        self.assertEqual("-999", self.sim.ht16k33.seven_segment_text())
+
+
+if __name__ == "__main__":
+    unittest.main()
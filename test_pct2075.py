@@ -0,0 +1,47 @@
+"""test_pct2075 - the PCT2075 driver against the simulated sensor"""
+
+import unittest
+
+import run_on_host  # pylint: disable=unused-import # puts host/ on sys.path
+import board
+import hardware
+import adafruit_pct2075
+
+
+class TestPCT2075(unittest.TestCase):
+
+    def setUp(self):
+        self.sim = hardware.simulated_hardware(temperature_c=31.375)
+        self.sim.install()
+        self.pct = adafruit_pct2075.PCT2075(board.I2C())
+
+    def tearDown(self):
+        self.sim.uninstall()
+
+    def test_temperature(self):
+        self.assertEqual(251, self.pct.temperature_raw)
+        self.assertEqual(31.375, self.pct.temperature)
+        self.sim.temperature_source = lambda now_s: -10.5
+        self.assertEqual(-84, self.pct.temperature_raw)
+        self.assertEqual(-10.5, self.pct.temperature)
+        # Agrees with the register library
+        # pylint: disable=protected-access
+        self.assertEqual(-84, self.pct._temperature >> 5)
+
+    def test_read_all(self):
+        self.pct.high_temperature_threshold = 60
+        self.pct.temperature_hysteresis = 55.5
+        self.pct.delay_between_measurements = 500
+        transactions = self.sim.i2c_transactions
+        registers = self.pct.read_all()
+        self.assertEqual(transactions + 5, self.sim.i2c_transactions)
+        self.assertEqual(251 << 5, registers["temp"])
+        self.assertEqual(31.375, registers["temperature"])
+        self.assertEqual(60, registers["high_temperature_threshold"])
+        self.assertEqual(55.5, registers["temperature_hysteresis"])
+        self.assertEqual(500, registers["delay_between_measurements"])
+        self.assertEqual(self.pct.mode, registers["conf"] >> 1 & 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
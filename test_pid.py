@@ -0,0 +1,140 @@
+"""test_pid - some unit tests for the pid module"""
+
+import random
+import unittest
+from lib.pid import PIDController, ANTI_WINDUP_BACK_CALCULATION
+
+
+def reference_pid(measurements, times_s, kp, ki, kd, set_point, low, high,
+                  tau=0.0, back_calculation=False, tracking_time_s=None):
+    """Straightforward position-form PID used to check PIDController"""
+    outputs = []
+    integral = 0.0
+    filtered_rate = 0.0
+    for n, (measurement, t) in enumerate(zip(measurements, times_s)):
+        error = measurement - set_point
+        dt = t - times_s[n - 1] if n else 0.0
+        if dt > 0:
+            rate = (measurement - measurements[n - 1]) / dt
+            alpha = dt / (tau + dt) if tau > 0 else 1.0
+            filtered_rate = filtered_rate + alpha * (rate - filtered_rate)
+        candidate = integral + ki * error * dt
+        unclamped = kp * error + candidate + kd * filtered_rate
+        output = min(max(unclamped, low), high)
+        if back_calculation:
+            integral = candidate + (output - unclamped) * dt / tracking_time_s
+        elif output == unclamped or (unclamped > high) != (candidate > integral):
+            integral = candidate
+        outputs.append(output)
+    return outputs
+
+
+class TestPIDController(unittest.TestCase):
+
+    def run_controller(self, pid, measurements, times_s):
+        return [pid.update(m, int(t * 1000000000)) for m, t in zip(measurements, times_s)]
+
+    def random_trace(self, seed):
+        rng = random.Random(seed)
+        measurements = []
+        times_s = []
+        t = 0.0
+        temperature = 30.0
+        for _ in range(300):
+            # Irregular loop timing
+            t += rng.choice((3, 3, 3, 3.5, 4, 6))
+            temperature += rng.uniform(-0.5, 0.6)
+            measurements.append(round(temperature * 8) / 8)
+            times_s.append(t)
+        return measurements, times_s
+
+    def test_against_reference_clamp(self):
+        measurements, times_s = self.random_trace(4)
+        pid = PIDController(0.05, 0.002, 0.3, set_point=32, derivative_time_s=10)
+        expected = reference_pid(measurements, times_s, 0.05, 0.002, 0.3, 32, 0, 1,
+                                 tau=10)
+        for e, a in zip(expected, self.run_controller(pid, measurements, times_s)):
+            self.assertAlmostEqual(e, a, places=9)
+
+    def test_against_reference_back_calculation(self):
+        measurements, times_s = self.random_trace(5)
+        pid = PIDController(0.05, 0.002, set_point=32,
+                            anti_windup=ANTI_WINDUP_BACK_CALCULATION)
+        expected = reference_pid(measurements, times_s, 0.05, 0.002, 0, 32, 0, 1,
+                                 back_calculation=True, tracking_time_s=25)
+        for e, a in zip(expected, self.run_controller(pid, measurements, times_s)):
+            self.assertAlmostEqual(e, a, places=9)
+
+    def test_hand_computed(self):
+        pid = PIDController(0.1, 0.01, 0.5, set_point=30)
+        # No dt yet, so only 0.1 * 2
+        self.assertAlmostEqual(0.2, pid.update(32, 0))
+        # 0.1 * 3 + 0.01 * 3 * 2 + 0.5 * (33 - 32) / 2
+        self.assertAlmostEqual(0.61, pid.update(33, 2000000000))
+        # 0.1 * 3 + (0.06 + 0.01 * 3 * 1) + 0.5 * 0
+        self.assertAlmostEqual(0.39, pid.update(33, 3000000000))
+        self.assertAlmostEqual(0.09, pid.integral)
+
+    def test_derivative_filter(self):
+        pid = PIDController(0, kd=1.0, set_point=30, output_min=-10, output_max=10,
+                            derivative_time_s=2)
+        self.assertEqual(0, pid.update(30, 0))
+        # A rate of 1 per s, filtered by 2 / (2 + 2)
+        self.assertAlmostEqual(0.5, pid.update(32, 2000000000))
+        self.assertAlmostEqual(0.25, pid.update(32, 4000000000))
+
+    def test_feed_forward(self):
+        pid = PIDController(0.1, set_point=30)
+        self.assertAlmostEqual(0.7, pid.update(32, 0, feed_forward=0.5))
+        self.assertEqual(1, pid.update(40, 1000000000, feed_forward=0.5))
+
+    def test_proportional(self):
+        pid = PIDController(0.1, set_point=30)
+        self.assertAlmostEqual(0.5, pid.update(35, 0))
+        self.assertEqual(0, pid.update(20, 1000000000))
+        self.assertEqual(1, pid.update(50, 2000000000))
+
+    def test_anti_windup(self):
+        # A long time far above the set point must not wind up the integral
+        pid = PIDController(0.1, 0.01, set_point=30)
+        for t in range(100):
+            self.assertEqual(1, pid.update(45, t * 3000000000))
+        self.assertTrue(pid.integral < 0.01)
+        # So the output drops as soon as the temperature does
+        self.assertAlmostEqual(0, pid.update(30, 300000000000), places=2)
+
+    def test_integral_limits(self):
+        pid = PIDController(0, 0.1, set_point=30, output_min=-1, integral_min=-0.2,
+                            integral_max=0.2)
+        for t in range(10):
+            pid.update(35, t * 1000000000)
+        self.assertAlmostEqual(0.2, pid.integral)
+        for t in range(10, 30):
+            pid.update(25, t * 1000000000)
+        self.assertAlmostEqual(-0.2, pid.integral)
+
+    def test_no_set_point_kick(self):
+        pid = PIDController(0, kd=1.0, set_point=30, output_min=-10, output_max=10)
+        pid.update(31, 0)
+        pid.update(31, 1000000000)
+        pid.set_point = 20
+        self.assertEqual(0, pid.update(31, 2000000000))
+        self.assertEqual(1, pid.update(32, 3000000000))
+
+    def test_reset(self):
+        pid = PIDController(0.1, 0.01, set_point=30)
+        pid.update(35, 0)
+        pid.update(35, 10000000000)
+        pid.reset(integral=0.1)
+        self.assertIsNone(pid.output)
+        self.assertAlmostEqual(0.6, pid.update(35, 20000000000))
+
+    def test_arguments(self):
+        with self.assertRaises(ValueError):
+            PIDController(1, output_min=1, output_max=0)
+        with self.assertRaises(ValueError):
+            PIDController(1, anti_windup="none")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,112 @@
+"""test_sample_store - some unit tests for the sample_store module"""
+
+import os
+import tempfile
+import unittest
+from lib import sampler as sampler_module
+from lib import sample_store as sample_store_module
+from lib.sampler import column_sampler
+from lib.sample_store import sample_store
+from test_sampler import FakeTime
+
+
+class TestSampleStore(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeTime()
+        self.real_time = sampler_module.time
+        sampler_module.time = self.clock
+        sample_store_module.time = self.clock
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'samples.bin')
+
+    def tearDown(self):
+        sampler_module.time = self.real_time
+        sample_store_module.time = self.real_time
+        self.directory.cleanup()
+
+    def record(self, samples, values):
+        for val in values:
+            self.clock.sleep(3)
+            samples.record({'val': val})
+
+    def test_missing_file(self):
+        samples = column_sampler(5, ('val',))
+        self.assertFalse(sample_store(samples, self.path).load())
+
+    def test_deltas(self):
+        samples = column_sampler(5, ('val',))
+        store = sample_store(samples, self.path, interval_s=6)
+        self.record(samples, [1, 2])
+        self.assertTrue(store.update())
+        size = os.path.getsize(self.path)
+        self.record(samples, [3])
+        self.assertFalse(store.update())
+        self.record(samples, [4])
+        self.assertTrue(store.update())
+        # Only the new samples were appended
+        self.assertTrue(os.path.getsize(self.path) - size < len(samples.to_bytes()))
+
+        self.clock.now_ns = 0
+        restored = column_sampler(5, ('val',))
+        self.assertTrue(sample_store(restored, self.path).load())
+        self.assertEqual([1, 2, 3, 4], restored.by_key('val'))
+        self.assertEqual([3, 4], list(restored.since(3, 'val')))
+
+    def test_compaction(self):
+        samples = column_sampler(3, ('val',))
+        store = sample_store(samples, self.path, compact_bytes=1)
+        self.record(samples, [1])
+        store.save()
+        self.record(samples, [2])
+        store.save()
+        appended = os.path.getsize(self.path)
+        self.record(samples, [3, 4])
+        store.save()
+        # The deltas were replaced by a new snapshot
+        self.assertTrue(os.path.getsize(self.path) < appended + 40)
+        restored = column_sampler(3, ('val',))
+        sample_store(restored, self.path).load()
+        self.assertEqual([2, 3, 4], restored.by_key('val'))
+
+    def test_truncated_write(self):
+        samples = column_sampler(5, ('val',))
+        store = sample_store(samples, self.path)
+        self.record(samples, [1, 2])
+        store.save()
+        self.record(samples, [3])
+        store.save()
+        with open(self.path, 'rb+') as f:
+            f.truncate(os.path.getsize(self.path) - 2)
+        restored = column_sampler(5, ('val',))
+        self.assertTrue(sample_store(restored, self.path).load())
+        self.assertEqual([1, 2], restored.by_key('val'))
+
+    def test_reset_during_rename(self):
+        samples = column_sampler(5, ('val',))
+        store = sample_store(samples, self.path)
+        self.record(samples, [1, 2])
+        store.save()
+        # The old file was removed but the new snapshot not yet renamed
+        os.rename(self.path, self.path + '.tmp')
+        restored = column_sampler(5, ('val',))
+        restored_store = sample_store(restored, self.path)
+        self.assertTrue(restored_store.load())
+        self.assertEqual([1, 2], restored.by_key('val'))
+        self.record(restored, [3])
+        restored_store.save()
+        self.assertFalse(os.path.exists(self.path + '.tmp'))
+        restored = column_sampler(5, ('val',))
+        self.assertTrue(sample_store(restored, self.path).load())
+        self.assertEqual([1, 2, 3], restored.by_key('val'))
+
+    def test_read_only(self):
+        samples = column_sampler(5, ('val',))
+        store = sample_store(samples, os.path.join(self.path, 'missing', 'x.bin'),
+                             interval_s=1)
+        self.record(samples, [1])
+        self.assertFalse(store.update())
+
+
+if __name__ == "__main__":
+    unittest.main()
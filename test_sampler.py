@@ -1,8 +1,24 @@
 """test_sampler - some unit tests for the sampler module"""
 
+import random
 import time
 import unittest
-from lib.sampler import sampler
+from lib import sampler as sampler_module
+from lib.sampler import sampler, column_sampler, tiered_sampler
+from lib.filters import ema_filter, median_filter
+
+
+class FakeTime:
+    """Stands in for the time module so tests can step the clock"""
+
+    def __init__(self):
+        self.now_ns = 0
+
+    def monotonic_ns(self):
+        return self.now_ns
+
+    def sleep(self, seconds):
+        self.now_ns += int(seconds * 1000000000)
 
 
 class TestSampler(unittest.TestCase):
@@ -97,5 +113,364 @@ class TestSampler(unittest.TestCase):
         self.assertTrue('elapsed_ms' in last_sample)
         self.assertTrue(last_sample['elapsed_ms'] < 1000)
 
+
+class TestColumnSampler(unittest.TestCase):
+
+    def test_reset(self):
+        samples = column_sampler(10, ('val',))
+        self.assertEqual({}, samples.last())
+
+        samples.record({'val': 1})
+        last_sample = samples.last()
+        self.assertEqual(2, len(last_sample))
+        self.assertEqual(1, last_sample['val'])
+        self.assertTrue('elapsed_ms' in last_sample)
+
+        samples.reset()
+        self.assertEqual({}, samples.last())
+        self.assertEqual([], samples.samples())
+
+    def test_max_samples(self):
+        samples = column_sampler(3, ('val',))
+        self.assertEqual(0, len(samples.samples()))
+        for val in range(1, 5):
+            samples.record({'val': val})
+        entries = samples.samples()
+        self.assertEqual(3, len(entries))
+        self.assertEqual([2, 3, 4], [entry['val'] for entry in entries])
+
+    def test_by_key(self):
+        samples = column_sampler(3, ('val',), ('count',))
+        self.assertEqual([], samples.by_key('val'))
+        samples.record({'val': 1.5, 'count': 10})
+        self.assertEqual([1.5], samples.by_key('val'))
+        self.assertEqual([-1, -1, 10], samples.by_key('count', filler=-1))
+        samples.record({'val': 2.5, 'count': 20})
+        samples.record({'val': 3.5, 'count': 30})
+        samples.record({'val': 4.5, 'count': 40})
+        self.assertEqual([2.5, 3.5, 4.5], samples.by_key('val'))
+        self.assertEqual([20, 30, 40], samples.by_key('count'))
+        self.assertEqual(3, len(samples.by_key('elapsed_ms')))
+        self.assertEqual([], samples.by_key('missing'))
+
+    def test_schema(self):
+        samples = column_sampler(3, ('val',))
+        with self.assertRaises(KeyError):
+            samples.record({'other': 1})
+        # Keys outside the schema are ignored
+        samples.record({'val': 1, 'other': 2})
+        self.assertEqual(['elapsed_ms', 'val'], sorted(samples.last()))
+        with self.assertRaises(AttributeError):
+            samples.extra = 1
+
+    def test_elapsed_ms(self):
+        samples = column_sampler(3, ('val',))
+        time.sleep(1.1)
+        samples.record({'val': 1})
+        elapsed_ms = samples.last()['elapsed_ms']
+        self.assertTrue(elapsed_ms >= 1000)
+        self.assertTrue(elapsed_ms < 2000)
+
+
+class TestAggregates(unittest.TestCase):
+
+    def check_aggregates(self, samples, key):
+        values = samples.by_key(key)
+        self.assertEqual(len(values), samples.count(key))
+        if not values:
+            self.assertEqual(0, samples.sum(key))
+            self.assertIsNone(samples.mean(key))
+            self.assertIsNone(samples.min(key))
+            self.assertIsNone(samples.max(key))
+            return
+        self.assertAlmostEqual(sum(values), samples.sum(key), places=3)
+        self.assertAlmostEqual(sum(values) / len(values), samples.mean(key), places=3)
+        self.assertEqual(min(values), samples.min(key))
+        self.assertEqual(max(values), samples.max(key))
+
+    def test_empty(self):
+        for samples in (sampler(3), column_sampler(3, ('val',))):
+            self.check_aggregates(samples, 'val')
+            self.check_aggregates(samples, 'missing')
+
+    def test_sampler(self):
+        rng = random.Random(1)
+        samples = sampler(5)
+        for _ in range(50):
+            data = {'val': rng.randint(-10, 10), 'label': 'x'}
+            if rng.random() < 0.3:
+                data['sparse'] = rng.uniform(-1, 1)
+            samples.record(data)
+            self.check_aggregates(samples, 'val')
+            self.check_aggregates(samples, 'sparse')
+        self.assertEqual(0, samples.count('label'))
+
+    def test_column_sampler(self):
+        rng = random.Random(2)
+        samples = column_sampler(7, ('val',), ('count',))
+        for _ in range(50):
+            samples.record({'val': rng.randint(-100, 100) / 4,
+                            'count': rng.randint(0, 3)})
+            self.check_aggregates(samples, 'val')
+            self.check_aggregates(samples, 'count')
+        self.assertEqual(7, samples.count('elapsed_ms'))
+
+    def test_reset(self):
+        for samples in (sampler(3), column_sampler(3, ('val',))):
+            samples.record({'val': 5})
+            samples.reset()
+            self.check_aggregates(samples, 'val')
+            samples.record({'val': 2})
+            self.assertEqual(2, samples.sum('val'))
+
+
+class TestIterators(unittest.TestCase):
+
+    def test_iter_key(self):
+        for samples in (sampler(3), column_sampler(3, ('val',))):
+            self.assertEqual([], list(samples.iter_key('val')))
+            for val in range(1, 5):
+                samples.record({'val': val})
+                self.assertEqual(samples.by_key('val'), list(samples.iter_key('val')))
+            self.assertEqual([], list(samples.iter_key('missing')))
+
+    def test_iter_samples(self):
+        for samples in (sampler(3), column_sampler(3, ('val',))):
+            for val in range(1, 5):
+                samples.record({'val': val})
+            self.assertEqual([2, 3, 4], [s['val'] for s in samples.iter_samples()])
+            for sample in samples.iter_samples():
+                self.assertTrue('elapsed_ms' in sample)
+
+    def test_window(self):
+        for samples in (sampler(4), column_sampler(4, ('val',))):
+            self.assertEqual([], list(samples.window(2)))
+            for val in range(1, 7):
+                samples.record({'val': val})
+            self.assertEqual([5, 6], [s['val'] for s in samples.window(2)])
+            self.assertEqual([3, 4, 5, 6], [s['val'] for s in samples.window(10)])
+
+    def test_modified_during_iteration(self):
+        for samples in (sampler(3), column_sampler(3, ('val',))):
+            samples.record({'val': 1})
+            samples.record({'val': 2})
+            values = samples.iter_key('val')
+            self.assertEqual(1, next(values))
+            samples.record({'val': 3})
+            with self.assertRaises(RuntimeError):
+                next(values)
+            values = samples.iter_samples()
+            next(values)
+            samples.reset()
+            with self.assertRaises(RuntimeError):
+                next(values)
+
+
+class TestTieredSampler(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeTime()
+        self.real_time = sampler_module.time
+        sampler_module.time = self.clock
+
+    def tearDown(self):
+        sampler_module.time = self.real_time
+
+    def test_drop_in(self):
+        samples = tiered_sampler(3, ('val',))
+        for val in range(1, 5):
+            self.clock.sleep(3)
+            samples.record({'val': val})
+        self.assertEqual([2, 3, 4], samples.by_key('val'))
+        self.assertEqual(9, samples.sum('val'))
+        self.assertEqual(4, samples.last()['val'])
+
+    def test_rollup(self):
+        samples = tiered_sampler(10, ('val',), tiers=((60, 5), (300, 4)))
+        self.assertEqual([60, 300], samples.tiers())
+        minute = samples.tier(60)
+        five_minutes = samples.tier(300)
+        # 20 samples at 3 seconds fill one minute
+        for i in range(20):
+            self.clock.sleep(3)
+            samples.record({'val': i})
+        self.assertEqual([9.5], minute.by_key('val'))
+        self.assertEqual([0], minute.by_key('val_min'))
+        self.assertEqual([19], minute.by_key('val_max'))
+        self.assertEqual([20], minute.by_key('num_samples'))
+        self.assertEqual([], five_minutes.by_key('val'))
+
+        # Four more minutes of constant 100 close the first 5 minute bucket
+        for i in range(80):
+            self.clock.sleep(3)
+            samples.record({'val': 100})
+        self.assertEqual([9.5, 100, 100, 100, 100], minute.by_key('val'))
+        self.assertEqual(1, five_minutes.count('val'))
+        self.assertAlmostEqual((190 + 8000) / 100, five_minutes.last()['val'], places=3)
+        self.assertEqual(0, five_minutes.last()['val_min'])
+        self.assertEqual(100, five_minutes.last()['val_max'])
+        self.assertEqual(100, five_minutes.last()['num_samples'])
+
+        # The minute tier is a fixed size ring
+        for i in range(20):
+            self.clock.sleep(3)
+            samples.record({'val': 50})
+        self.assertEqual([100, 100, 100, 100, 50], minute.by_key('val'))
+
+        with self.assertRaises(KeyError):
+            samples.tier(30)
+
+    def test_reset(self):
+        samples = tiered_sampler(10, ('val',), tiers=((6, 5),))
+        for i in range(4):
+            self.clock.sleep(3)
+            samples.record({'val': i})
+        self.assertEqual(2, samples.tier(6).count('val'))
+        samples.reset()
+        self.assertEqual(0, samples.tier(6).count('val'))
+        self.assertEqual([], samples.by_key('val'))
+
+
+class TestTimeQueries(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeTime()
+        self.real_time = sampler_module.time
+        sampler_module.time = self.clock
+
+    def tearDown(self):
+        sampler_module.time = self.real_time
+
+    def test_since(self):
+        for samples in (sampler(5), column_sampler(5, ('val',))):
+            self.assertEqual([], list(samples.since(60)))
+            # Irregular loop timing
+            for val, delay in ((1, 3), (2, 3), (3, 10), (4, 1), (5, 20), (6, 3)):
+                self.clock.sleep(delay)
+                samples.record({'val': val})
+            self.assertEqual([6], list(samples.since(2, 'val')))
+            self.assertEqual([5, 6], list(samples.since(3, 'val')))
+            self.assertEqual([4, 5, 6], list(samples.since(23, 'val')))
+            self.assertEqual([3, 4, 5, 6], list(samples.since(24, 'val')))
+            # The oldest samples have been overwritten
+            self.assertEqual([2, 3, 4, 5, 6], list(samples.since(100, 'val')))
+            self.assertEqual([5, 6], [s['val'] for s in samples.since(3)])
+            self.clock.sleep(2)
+            self.assertEqual([], list(samples.since(1)))
+
+    def test_between(self):
+        for samples in (sampler(10), column_sampler(10, ('val',))):
+            self.clock.now_ns = 0
+            for val in range(10):
+                self.clock.sleep(1)
+                samples.record({'val': val})
+            second = 1000000000
+            self.assertEqual([2, 3, 4],
+                             list(samples.between(3 * second, 5 * second, 'val')))
+            self.assertEqual([2, 3],
+                             list(samples.between(2 * second + 1, 4 * second + 10, 'val')))
+            self.assertEqual([], list(samples.between(20 * second, 30 * second, 'val')))
+            self.assertEqual([], list(samples.between(0, second - 1, 'val')))
+            self.assertEqual([], list(samples.between(0, second, 'missing')))
+
+
+class TestFilters(unittest.TestCase):
+
+    def test_add_filter(self):
+        for samples in (sampler(5), column_sampler(5, ('val', 'raw'))):
+            samples.add_filter('val', median_filter(3))
+            samples.add_filter('val', ema_filter(0.5))
+            for val in (10, 10, 50, 10):
+                samples.record({'val': val, 'raw': val})
+            self.assertEqual([10, 10, 50, 10], samples.by_key('raw'))
+            # The spike is removed by the median before the average
+            self.assertEqual([10, 10, 10, 10], samples.by_key('val'))
+
+            samples.reset()
+            samples.record({'val': 20, 'raw': 20})
+            self.assertEqual([20], samples.by_key('val'))
+
+    def test_unknown_field(self):
+        samples = column_sampler(5, ('val',))
+        with self.assertRaises(KeyError):
+            samples.add_filter('other', ema_filter(0.5))
+
+
+class TestSnapshot(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeTime()
+        self.real_time = sampler_module.time
+        sampler_module.time = self.clock
+
+    def tearDown(self):
+        sampler_module.time = self.real_time
+
+    def test_round_trip(self):
+        samples = column_sampler(4, ('temp', 'error'), ('count',))
+        for i in range(6):
+            self.clock.sleep(3)
+            samples.record({'temp': 30 + i / 4, 'error': i / 2, 'count': i})
+        data = samples.to_bytes()
+
+        # Restore after a reset, when the clock has started again
+        self.clock.now_ns = 5000000000
+        restored = column_sampler(4, ('temp', 'error'), ('count',))
+        restored.from_bytes(data)
+        self.assertEqual(samples.samples(), restored.samples())
+        self.assertEqual(samples.sum('error'), restored.sum('error'))
+        self.assertEqual(5, restored.max('count'))
+        self.assertEqual([4, 5], list(restored.since(3, 'count')))
+
+        # New samples follow the restored ones
+        self.clock.sleep(3)
+        restored.record({'temp': 40, 'error': 5, 'count': 6})
+        self.assertEqual([3, 4, 5, 6], restored.by_key('count'))
+
+    def test_append(self):
+        samples = column_sampler(10, ('val',))
+        for i in range(3):
+            self.clock.sleep(1)
+            samples.record({'val': i})
+        data = samples.to_bytes()
+        after_ns = samples.last_timestamp_ns()
+        for i in range(3, 5):
+            self.clock.sleep(1)
+            samples.record({'val': i})
+        delta = samples.to_bytes(after_ns)
+        self.assertTrue(len(delta) < len(data))
+
+        restored = column_sampler(3, ('val',))
+        restored.from_bytes(data)
+        restored.from_bytes(delta, append=True)
+        self.assertEqual([2, 3, 4], restored.by_key('val'))
+
+    def test_schema_mismatch(self):
+        samples = column_sampler(3, ('val',))
+        samples.record({'val': 1})
+        data = samples.to_bytes()
+        with self.assertRaises(ValueError):
+            column_sampler(3, ('other',)).from_bytes(data)
+        with self.assertRaises(ValueError):
+            column_sampler(3, (), ('val',)).from_bytes(data)
+        with self.assertRaises(ValueError):
+            column_sampler(3, ('val',)).from_bytes(data[:-1])
+        with self.assertRaises(ValueError):
+            column_sampler(3, ('val',)).from_bytes(b'junk')
+
+    def test_tiered(self):
+        samples = tiered_sampler(5, ('val',), tiers=((6, 4),))
+        for i in range(8):
+            self.clock.sleep(3)
+            samples.record({'val': i})
+        restored = tiered_sampler(5, ('val',), tiers=((6, 4),))
+        restored.from_bytes(samples.to_bytes())
+        self.assertEqual([3, 4, 5, 6, 7], restored.by_key('val'))
+        self.assertEqual(samples.tier(6).samples(), restored.tier(6).samples())
+        with self.assertRaises(ValueError):
+            tiered_sampler(5, ('val',), tiers=((6, 4), (60, 4))).from_bytes(
+                samples.to_bytes())
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,71 @@
+"""test_scheduler - some unit tests for the scheduler module"""
+
+import asyncio
+import unittest
+from lib import scheduler as scheduler_module
+from lib.scheduler import periodic_task, run_tasks
+from test_sampler import FakeTime
+
+
+class TestPeriodicTask(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeTime()
+        self.real_time = scheduler_module.time
+        scheduler_module.time = self.clock
+
+    def tearDown(self):
+        scheduler_module.time = self.real_time
+
+    def test_deadlines(self):
+        calls = []
+        task = periodic_task("test", 2, lambda: calls.append(self.clock.now_ns))
+        self.assertEqual(2, task.run_once())
+        self.assertEqual([0], calls)
+        self.clock.sleep(1)
+        self.assertEqual(1, task.run_once())
+        self.assertEqual(1, len(calls))
+        # Started half a second late, the next deadline stays on the grid
+        self.clock.sleep(1.5)
+        self.assertEqual(1.5, task.run_once())
+        self.assertEqual(2, task.runs)
+        self.assertEqual(0, task.overruns)
+        self.assertEqual(500, task.max_late_ms)
+
+    def test_overrun(self):
+        task = periodic_task("slow", 1, lambda: self.clock.sleep(2.5))
+        # The call runs past two more deadlines, which are skipped
+        self.assertEqual(0.5, task.run_once())
+        self.assertEqual(2, task.overruns)
+        self.assertEqual(2500, task.max_run_ms)
+        self.assertIn("slow: runs=1 overruns=2", task.report())
+        task.reset_stats()
+        self.assertEqual(0, task.overruns)
+
+    def test_period(self):
+        with self.assertRaises(ValueError):
+            periodic_task("bad", 0, lambda: None)
+
+
+class TestRunTasks(unittest.TestCase):
+
+    def test_cadence(self):
+        calls = {"fast": 0, "slow": 0}
+
+        def fast():
+            calls["fast"] += 1
+
+        def slow():
+            calls["slow"] += 1
+            if calls["slow"] == 3:
+                raise StopAsyncIteration
+
+        tasks = [periodic_task("fast", 0.01, fast), periodic_task("slow", 0.05, slow)]
+        with self.assertRaises(StopAsyncIteration):
+            asyncio.run(run_tasks(tasks))
+        # The slow task ran at 0, 50 and 100 ms
+        self.assertTrue(calls["fast"] >= 5)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+"""test_slew - some unit tests for the slew module"""
+
+import unittest
+from lib.slew import slew_limiter
+
+SECOND = 1000000000
+
+
+class TestSlewLimiter(unittest.TestCase):
+
+    def test_unlimited(self):
+        stage = slew_limiter()
+        self.assertEqual(0.7, stage.update(0.7, 0))
+        self.assertEqual(0.2, stage.update(0.2, SECOND))
+
+    def test_rates(self):
+        stage = slew_limiter(up_per_s=0.25, down_per_s=0.05)
+        # No time has passed on the first update
+        self.assertEqual(0, stage.update(1, 0))
+        self.assertAlmostEqual(0.25, stage.update(1, SECOND))
+        self.assertAlmostEqual(0.75, stage.update(1, 3 * SECOND))
+        self.assertAlmostEqual(1, stage.update(1, 10 * SECOND))
+        # Down is slower
+        self.assertAlmostEqual(0.95, stage.update(0, 11 * SECOND))
+        self.assertAlmostEqual(0.85, stage.update(0, 13 * SECOND))
+        # Moving toward a nearby target stops at the target
+        self.assertAlmostEqual(0.84, stage.update(0.84, 14 * SECOND))
+
+    def test_dead_band(self):
+        stage = slew_limiter(dead_band=0.05, output=0.5)
+        self.assertEqual(0.5, stage.update(0.53, 0))
+        self.assertEqual(0.5, stage.update(0.47, SECOND))
+        self.assertEqual(0.6, stage.update(0.6, 2 * SECOND))
+        # Off and full speed are always reached
+        stage.reset(0.03)
+        self.assertEqual(0, stage.update(0, 3 * SECOND))
+        stage.reset(0.98)
+        self.assertEqual(1, stage.update(1, 4 * SECOND))
+
+    def test_min_on_off(self):
+        stage = slew_limiter(down_per_s=0.5, min_on_s=10, min_off_s=5)
+        self.assertEqual(0.2, stage.update(0.2, 0))
+        # Started, so it holds rather than falling toward 0
+        self.assertEqual(0.2, stage.update(0, 9 * SECOND))
+        self.assertEqual(0.2, stage.update(0.1, 9 * SECOND))
+        self.assertEqual(0, stage.update(0, 10 * SECOND))
+        # Stopped, so it stays off unless full speed is needed
+        self.assertEqual(0, stage.update(0.5, 14 * SECOND))
+        self.assertEqual(0.5, stage.update(0.5, 15 * SECOND))
+        stage.update(0, 25 * SECOND)
+        self.assertEqual(1, stage.update(1, 26 * SECOND))
+
+    def test_restart_above(self):
+        stage = slew_limiter(min_off_s=120, restart_above=0.3)
+        stage.update(0.5, 0)
+        self.assertEqual(0, stage.update(0, SECOND))
+        # Too cool to cut the hold short
+        self.assertEqual(0, stage.update(0.29, 2 * SECOND))
+        # but a hot spike starts the fan at once
+        self.assertEqual(0.3, stage.update(0.3, 3 * SECOND))
+
+    def test_reset(self):
+        stage = slew_limiter(up_per_s=0.1)
+        stage.update(1, 0)
+        stage.update(1, SECOND)
+        stage.reset(0.5)
+        self.assertEqual(0.5, stage.output)
+        # The time of the last update is forgotten too
+        self.assertEqual(0.5, stage.update(1, 100 * SECOND))
+        self.assertAlmostEqual(0.6, stage.update(1, 101 * SECOND))
+
+    def test_bad_rates(self):
+        with self.assertRaises(ValueError):
+            slew_limiter(up_per_s=0)
+        with self.assertRaises(ValueError):
+            slew_limiter(down_per_s=-1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,153 @@
+"""test_sweep - trace replay and the process pool sweep in host/"""
+
+import json
+import os
+import tempfile
+import unittest
+
+import run_on_host  # pylint: disable=unused-import # puts host/ on sys.path
+import closed_loop
+import sweep
+import traces
+from thermal import SCENARIOS, thermal_plant
+
+
+def write_data_log(path, scenario, duration_s=2 * 3600):
+    """Write the DATA lines code.py would print while running a scenario"""
+    with open(path, "w") as file:
+        file.write("Restored 30 temperature samples\n")
+        result = closed_loop.simulate(scenario, duration_s=duration_s, data_log=file)
+        file.write("DATA:  {'temp': 3")  # cut off by a reset
+    return result
+
+
+class TestTraces(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, "step.log")
+        self.step = SCENARIOS["step"]
+        write_data_log(self.path, self.step)
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_read_data_lines(self):
+        with open(self.path) as file:
+            samples = list(traces.read_data_lines(file))
+        self.assertEqual(2400, len(samples))
+        self.assertIn(traces.DUTY_KEY, samples[0])
+        # The slew limiter holds the fan below what the PID asks for
+        self.assertTrue(
+            any(s["fan_output_pid"] != s[traces.DUTY_KEY] for s in samples)
+        )
+
+    def test_infer_load(self):
+        scenario = traces.trace_scenario(self.path, thermal_plant())
+        self.assertEqual(7200, scenario.duration_s)
+        self.assertAlmostEqual(25, scenario.load_w(1800), delta=3)
+        self.assertAlmostEqual(80, scenario.load_w(5400), delta=5)
+
+    def test_csv(self):
+        path = os.path.join(self.dir.name, "step.csv")
+        with open(path, "w") as file:
+            file.write("time_s,temperature_c,duty,rpm,load_w\n")
+            file.write("0,22,0,0,25\n60,23,0,0,80\n")
+        scenario = traces.trace_scenario(path, thermal_plant())
+        self.assertEqual(120, scenario.duration_s)
+        self.assertEqual(80, scenario.load_w(90))
+
+    def test_repeated_timestamps(self):
+        path = os.path.join(self.dir.name, "repeated.csv")
+        with open(path, "w") as file:
+            file.write("time_s,temperature_c,duty\n")
+            file.write("0,30,0.5\n30,30.5,0.5\n60,31,0.5\n60,31,0.5\n60,31,0.5\n")
+        scenario = traces.trace_scenario(path, thermal_plant())
+        self.assertGreater(scenario.load_w(0), 0)
+        self.assertEqual(scenario.load_w(0), scenario.load_w(75))
+
+
+class TestSweep(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.trace = os.path.join(self.dir.name, "step.log")
+        write_data_log(self.trace, SCENARIOS["step"])
+        self.results = os.path.join(self.dir.name, "results.jsonl")
+        self.settings = sweep.settings_grid(kp=(0.05, 0.2), hysteresis_s=(0, 60))
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_sweep_and_resume(self):
+        ran = sweep.run_sweep([self.trace], self.settings, self.results, 2)
+        self.assertEqual(4, ran)
+        rows = sweep.read_results(self.results)
+        self.assertEqual(4, len(rows))
+        self.assertEqual(
+            set(sweep.job_key(self.trace, s) for s in self.settings),
+            set(row["key"] for row in rows),
+        )
+        # Complete, so nothing runs again
+        ran = sweep.run_sweep([self.trace], self.settings, self.results, 2)
+        self.assertEqual(0, ran)
+
+        # Interrupted after one job and part of a line
+        with open(self.results) as file:
+            first = file.readline()
+        with open(self.results, "w") as file:
+            file.write(first)
+            file.write(first[:20])
+        ran = sweep.run_sweep([self.trace], self.settings, self.results, 2)
+        self.assertEqual(3, ran)
+        rows = sweep.read_results(self.results)
+        self.assertEqual(4, len(rows))
+        with open(self.results) as file:
+            for line in file:
+                json.loads(line)
+
+    def test_key(self):
+        settings = self.settings[:2]
+        self.assertEqual(2, sweep.run_sweep([self.trace], settings, self.results, 2))
+        # Another ambient temperature is another sweep
+        self.assertEqual(
+            2, sweep.run_sweep([self.trace], settings, self.results, 2, 30.0)
+        )
+        self.assertEqual(
+            0, sweep.run_sweep([self.trace], settings, self.results, 2, 30.0)
+        )
+        rows = sweep.sweep_results(self.results, [self.trace], settings, 30.0)
+        self.assertEqual([30.0, 30.0], [row["ambient_c"] for row in rows])
+        # and so is a trace that has changed
+        with open(self.trace, "a") as file:
+            file.write("DATA:  {'temp': 30.0, 'fan_duty': 0.0}\n")
+        self.assertEqual(
+            0, len(sweep.sweep_results(self.results, [self.trace], settings))
+        )
+        self.assertEqual(2, sweep.run_sweep([self.trace], settings, self.results, 2))
+        self.assertEqual(6, len(sweep.read_results(self.results)))
+        rows = sweep.sweep_results(self.results, [self.trace], settings[:1])
+        self.assertEqual(1, len(rows))
+        self.assertEqual(settings[0]["kp"], rows[0]["kp"])
+
+    def test_matches_closed_loop(self):
+        settings = self.settings[0]
+        row = sweep.run_job(self.trace, settings)
+        scenario = traces.trace_scenario(self.trace, thermal_plant())
+        expected = closed_loop.simulate(
+            scenario, kp=settings["kp"], hysteresis_s=settings["hysteresis_s"]
+        )
+        self.assertEqual(expected.mean_duty, row["mean_duty"])
+
+    def test_slew_settings(self):
+        settings = sweep.settings_grid(min_on_s=(0,), min_off_s=(0,))[0]
+        row = sweep.run_job(self.trace, settings)
+        scenario = traces.trace_scenario(self.trace, thermal_plant())
+        expected = closed_loop.simulate(scenario, min_on_s=0, min_off_s=0)
+        self.assertEqual(expected.fan_starts_per_hour, row["fan_starts_per_hour"])
+        default = sweep.run_job(self.trace, sweep.settings_grid()[0])
+        self.assertNotEqual(default["key"], row["key"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,127 @@
+"""test_sysid - the FOPDT fit in host/sysid.py"""
+
+import math
+import os
+import tempfile
+import unittest
+
+import run_on_host  # pylint: disable=unused-import # puts host/ on sys.path
+from thermal import thermal_plant
+
+try:
+    import numpy as np
+    import sysid
+except ImportError:
+    np = None
+
+
+def fopdt_response(outputs, dt_s, gain, time_constant_s, delay, offset):
+    """Return the temperatures of an exact FOPDT system, quantized to 0.125"""
+    a = math.exp(-dt_s / time_constant_s)
+    y = offset + gain * outputs[0]
+    temperatures = []
+    for k in range(len(outputs)):
+        temperatures.append(round(y * 8) / 8)
+        y = a * y + (1 - a) * (offset + gain * outputs[max(k - delay, 0)])
+    return temperatures
+
+
+@unittest.skipUnless(np, "needs numpy")
+class TestFopdtFit(unittest.TestCase):
+
+    def setUp(self):
+        # The fan output steps between two values at random
+        rng = np.random.default_rng(1)
+        self.outputs = [float(u) for u in np.repeat(rng.choice([0.2, 0.8], 200), 100)]
+        self.temperatures = fopdt_response(self.outputs, 3, -10, 300, 3, 40)
+
+    def test_fit(self):
+        fit = sysid.fopdt_fit(3)
+        fit.add(self.temperatures, self.outputs)
+        model = fit.result()
+        self.assertAlmostEqual(-10, model.gain, delta=0.5)
+        self.assertAlmostEqual(300, model.time_constant_s, delta=20)
+        self.assertEqual(9, model.dead_time_s)
+        self.assertAlmostEqual(40, model.offset, delta=0.5)
+        self.assertLess(model.rmse, 0.1)
+
+    def test_chunks(self):
+        whole = sysid.fopdt_fit(3)
+        whole.add(self.temperatures, self.outputs)
+        chunked = sysid.fopdt_fit(3)
+        for i in range(0, len(self.outputs), 777):
+            chunked.add(self.temperatures[i : i + 777], self.outputs[i : i + 777])
+        self.assertAlmostEqual(whole.result().gain, chunked.result().gain, places=6)
+        self.assertEqual(whole.result().samples, chunked.result().samples)
+
+    def test_fit_log(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            paths = []
+            for half in range(2):
+                path = os.path.join(tmpdir, "%d.log" % half)
+                with open(path, "w") as file:
+                    for i in range(half * 10000, (half + 1) * 10000):
+                        sample = {
+                            "temp": self.temperatures[i],
+                            "fan_duty": self.outputs[i],
+                        }
+                        file.write("DATA:  %s\n" % sample)
+                paths.append(path)
+            model = sysid.fit_log(paths, chunk_size=1000)
+        # Each file is a segment, so one sample per delay is lost per file
+        self.assertEqual(20000 - 2 * 4, model.samples)
+        self.assertAlmostEqual(-10, model.gain, delta=0.5)
+
+    def test_thermal_plant(self):
+        # A step test on the simulated heatsink finds its time constant
+        plant = thermal_plant(temperature_c=33)
+        fit = sysid.fopdt_fit(3)
+        outputs = [0.25, 0.45] * 9
+        temperatures = []
+        duties = []
+        for duty in outputs:
+            for _ in range(400):
+                plant.step(3, duty, 55, 22)
+                temperatures.append(round(plant.temperature * 8) / 8)
+                duties.append(duty)
+        fit.add(temperatures, duties)
+        model = fit.result()
+        resistance = plant.thermal_resistance(plant.rpm_for_duty(0.35))
+        tau = resistance * plant.heat_capacity_j_per_c
+        self.assertAlmostEqual(tau, model.time_constant_s, delta=0.1 * tau)
+        gain = (
+            plant.steady_state(0.45, 55, 22) - plant.steady_state(0.25, 55, 22)
+        ) / 0.2
+        self.assertAlmostEqual(gain, model.gain, delta=0.1 * -gain)
+
+    def test_too_few(self):
+        with self.assertRaises(ValueError):
+            sysid.fopdt_fit(3).result()
+
+
+@unittest.skipUnless(np, "needs numpy")
+class TestSuggestGains(unittest.TestCase):
+
+    def test_simc(self):
+        model = sysid.fopdt_model(-10, 300, 9, 40, 0, 100)
+        gains = sysid.suggest_gains(model)
+        # Kc = tau / (K * (tau_c + theta)) with tau_c = theta
+        self.assertAlmostEqual(300 / (10 * 18), gains["kp"])
+        self.assertEqual(72, gains["ti_s"])
+        self.assertAlmostEqual(gains["kp"] / 72000, gains["ki"])
+
+    def test_ziegler_nichols(self):
+        model = sysid.fopdt_model(-10, 300, 9, 40, 0, 100)
+        gains = sysid.suggest_gains(model, "ziegler_nichols")
+        self.assertAlmostEqual(0.9 * 300 / (10 * 9), gains["kp"])
+        self.assertAlmostEqual(3.33 * 9, gains["ti_s"])
+
+    def test_fan_heats(self):
+        with self.assertRaises(ValueError):
+            sysid.suggest_gains(sysid.fopdt_model(10, 300, 9, 40, 0, 100))
+        with self.assertRaises(ValueError):
+            sysid.suggest_gains(sysid.fopdt_model(-10, 300, 9, 40, 0, 100), "pid")
+
+
+if __name__ == "__main__":
+    unittest.main()
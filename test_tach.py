@@ -0,0 +1,94 @@
+"""test_tach - some unit tests for the tach module"""
+
+import unittest
+from lib.tach import edge_tach, pulsein_source, simulated_pulse_source
+
+SECOND = 1000000000
+
+
+class FakePulseIn:
+    """Stands in for pulseio.PulseIn with a list of durations in us"""
+
+    def __init__(self):
+        self.durations = []
+
+    def __len__(self):
+        return len(self.durations)
+
+    def popleft(self):
+        return self.durations.pop(0)
+
+
+class TestEdgeTach(unittest.TestCase):
+
+    def test_period(self):
+        tach = edge_tach()
+        fan = simulated_pulse_source(tach, rpm=850)
+        fan.poll(0)
+        fan.poll(SECOND)
+        # Well within a count over 3 s, which is only good to 10 RPM
+        self.assertAlmostEqual(850, tach.rpm(SECOND), delta=1)
+
+    def test_speed_change(self):
+        tach = edge_tach()
+        fan = simulated_pulse_source(tach, rpm=1700)
+        for t in range(10):
+            fan.poll(t * SECOND // 10)
+        fan.rpm = 400
+        t = SECOND
+        while t < 2 * SECOND:
+            t += SECOND // 10
+            fan.poll(t)
+        # The last 8 periods are all at the new speed
+        self.assertAlmostEqual(400, tach.rpm(t), delta=1)
+
+    def test_slowing(self):
+        tach = edge_tach()
+        fan = simulated_pulse_source(tach, rpm=600)
+        fan.poll(0)
+        fan.poll(SECOND)
+        fan.rpm = 0
+        fan.poll(SECOND + SECOND // 2)
+        # No edges for half a second bounds the period
+        self.assertTrue(tach.rpm(SECOND + SECOND // 2) <= 60)
+
+    def test_count_fallback(self):
+        tach = edge_tach(window_s=3, min_edges=3)
+        self.assertEqual(0, tach.rpm(10 * SECOND))
+        # 2 edges in 3 s is below min_edges, so they are counted
+        tach.add_edge(8 * SECOND)
+        tach.add_edge(9 * SECOND)
+        self.assertEqual(20, tach.rpm(10 * SECOND))
+        self.assertEqual(0, tach.rpm(20 * SECOND))
+
+    def test_arguments(self):
+        with self.assertRaises(ValueError):
+            edge_tach(num_edges=2, min_edges=3)
+        with self.assertRaises(ValueError):
+            edge_tach(min_edges=1)
+
+
+class TestPulseInSource(unittest.TestCase):
+
+    def test_poll(self):
+        tach = edge_tach()
+        pulses = FakePulseIn()
+        source = pulsein_source(pulses, tach)
+        self.assertEqual(0, source.poll(0))
+        # 1000 RPM at 2 pulses per rev is a 30 ms period
+        pulses.durations = [10000, 20000] * 5
+        self.assertEqual(5, source.poll(SECOND))
+        pulses.durations = [10000, 20000] * 5
+        self.assertEqual(5, source.poll(SECOND + 150000000))
+        self.assertAlmostEqual(1000, tach.rpm(SECOND + 150000000), delta=1)
+
+    def test_saturated_pulses(self):
+        tach = edge_tach()
+        pulses = FakePulseIn()
+        source = pulsein_source(pulses, tach)
+        pulses.durations = [65535, 1000]
+        self.assertEqual(0, source.poll(SECOND))
+
+
+if __name__ == "__main__":
+    unittest.main()
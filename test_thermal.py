@@ -0,0 +1,230 @@
+"""test_thermal - the thermal model and the closed loop simulator in host/"""
+
+import ast
+import os
+import time
+import unittest
+
+import run_on_host  # pylint: disable=unused-import # puts host/ on sys.path
+import closed_loop
+from fan_curve import fan_curve
+import hardware
+from thermal import SCENARIOS, plant_temperature_source, scenario, thermal_plant
+import traces
+
+CODE_PY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "code.py")
+ARITHMETIC_NODES = (
+    ast.Expression,
+    ast.Constant,
+    ast.BinOp,
+    ast.UnaryOp,
+    ast.operator,
+    ast.unaryop,
+)
+
+
+def code_py_settings():
+    """Return the numbers assigned at the top level of code.py, by name"""
+    with open(CODE_PY) as file:
+        tree = ast.parse(file.read())
+    settings = {}
+    for node in tree.body:
+        if not isinstance(node, ast.Assign) or len(node.targets) != 1:
+            continue
+        if not isinstance(node.targets[0], ast.Name):
+            continue
+        # Only arithmetic on literals, such as Kp = 0.8 * 0.0666
+        expression = ast.Expression(node.value)
+        if all(isinstance(n, ARITHMETIC_NODES) for n in ast.walk(expression)):
+            code = compile(expression, CODE_PY, "eval")
+            # pylint: disable=eval-used
+            settings[node.targets[0].id] = eval(code, {"__builtins__": {}})
+    return settings
+
+
+class TestThermalPlant(unittest.TestCase):
+
+    def test_fan_cools(self):
+        plant = thermal_plant()
+        self.assertEqual(37, plant.steady_state(0, 25, 22))
+        fast = plant.steady_state(0.5, 25, 22)
+        self.assertLess(fast, plant.steady_state(0.2, 25, 22))
+        # Below the minimum duty the fan does not spin
+        self.assertEqual(0, plant.rpm_for_duty(0.01))
+
+    def test_step_size(self):
+        # Exact integration, so big steps land where small ones do
+        fine = thermal_plant()
+        coarse = thermal_plant()
+        for _ in range(600):
+            fine.step(1, 0.3, 60, 22)
+        for _ in range(10):
+            coarse.step(60, 0.3, 60, 22)
+        self.assertAlmostEqual(fine.temperature, coarse.temperature, delta=0.05)
+
+    def test_settles(self):
+        plant = thermal_plant()
+        for _ in range(100):
+            plant.step(600, 0, 25, 22)
+        self.assertAlmostEqual(37, plant.temperature, places=3)
+
+    def test_temperature_source(self):
+        sim = hardware.simulated_hardware()
+        plant = thermal_plant(temperature_c=22)
+        constant = scenario("hot", 60, lambda t_s: 100, lambda t_s: 22)
+        source = plant_temperature_source(plant, constant, sim.fan)
+        self.assertEqual(22, source(0))
+        self.assertGreater(source(60), 22)
+
+
+class TestClosedLoop(unittest.TestCase):
+
+    def test_day_in_seconds(self):
+        start = time.perf_counter()
+        result = closed_loop.simulate(SCENARIOS["office_day"])
+        self.assertLess(time.perf_counter() - start, 30)
+        self.assertEqual(86400, result.duration_s)
+        self.assertEqual(1440, len(result.temperatures_c))
+        self.assertGreater(result.mean_duty, 0)
+        # Far cooler than the 82 C the busiest hour reaches without a fan
+        self.assertLess(result.max_temperature_c, 45)
+
+    def test_hysteresis(self):
+        result = closed_loop.simulate(
+            SCENARIOS["step"],
+            hysteresis_s=300,
+            duration_s=3 * 3600,
+            up_per_s=None,
+            down_per_s=None,
+            dead_band=0,
+            min_on_s=0,
+            min_off_s=0,
+        )
+        self.assertLessEqual(result.duty_changes, 3 * 3600 / 300 + 1)
+
+    def test_slew_responds_faster_than_lockout(self):
+        hot = scenario("hot", 600, lambda t_s: 0 if t_s < 125 else 80, lambda t_s: 22)
+        plant = thermal_plant(temperature_c=31)
+        lockout = closed_loop.simulate(
+            hot,
+            hysteresis_s=60,
+            plant=plant,
+            record_every_s=1,
+            up_per_s=None,
+            down_per_s=None,
+            dead_band=0,
+            min_on_s=0,
+            min_off_s=0,
+        )
+        slewed = closed_loop.simulate(
+            hot, plant=thermal_plant(temperature_c=31), record_every_s=1
+        )
+        # The duty never rises faster than DUTY_UP_PER_SECOND
+        for before, after in zip(slewed.duties, slewed.duties[1:]):
+            self.assertLessEqual(
+                after - before, closed_loop.DUTY_UP_PER_SECOND + 1e-4
+            )
+        # and the slew limited fan does not wait out the lockout
+        self.assertLess(slewed.max_temperature_c, lockout.max_temperature_c)
+
+    def test_slew_starts_fan_no_more_than_lockout(self):
+        # The slew limiter must not make the fan hunt near the set point
+        for name in ("office_day", "step", "idle"):
+            lockout = closed_loop.simulate(
+                SCENARIOS[name],
+                hysteresis_s=60,
+                up_per_s=None,
+                down_per_s=None,
+                dead_band=0,
+                min_on_s=0,
+                min_off_s=0,
+            )
+            slewed = closed_loop.simulate(SCENARIOS[name])
+            self.assertLessEqual(
+                slewed.fan_starts_per_hour, lockout.fan_starts_per_hour, name
+            )
+
+    def test_spike_restarts_fan(self):
+        # The fan cools the heatsink from 34 C and stops, then the load jumps
+        def simulate(spike_s, **kwargs):
+            load = scenario(
+                "spike",
+                1200,
+                lambda t_s: 300 if spike_s is not None and t_s >= spike_s else 0,
+                lambda t_s: 22,
+            )
+            result = closed_loop.simulate(
+                load, plant=thermal_plant(temperature_c=34), record_every_s=1, **kwargs
+            )
+            return [
+                (t_s, before > 0, after > 0)
+                for t_s, before, after in zip(
+                    result.times_s[1:], result.duties, result.duties[1:]
+                )
+                if (before > 0) != (after > 0)
+            ]
+
+        stop_s = [t_s for t_s, running, _ in simulate(None) if running][0]
+        spike_s = stop_s + 5
+
+        def restart_s(**kwargs):
+            changes = simulate(spike_s, **kwargs)
+            return [t_s for t_s, _, running in changes if running and t_s > stop_s][0]
+
+        self.assertLess(restart_s(), spike_s + 60)
+        # Only full speed would end the hold early
+        self.assertGreaterEqual(restart_s(restart_above=1.0), spike_s + 60)
+
+    def test_controllers(self):
+        for controller in ("pid", "simple"):
+            result = closed_loop.simulate(
+                SCENARIOS["step"], controller, duration_s=3 * 3600
+            )
+            self.assertEqual(controller, result.controller)
+            self.assertLess(result.max_temperature_c, 45)
+        with self.assertRaises(ValueError):
+            closed_loop.simulate(SCENARIOS["step"], "bang_bang")
+
+    def test_feed_forward(self):
+        curve = fan_curve(((28, 0), (32, 0.3), (38, 1)), hysteresis_c=1)
+        plain = closed_loop.simulate(SCENARIOS["step"], duration_s=3 * 3600)
+        fed = closed_loop.simulate(
+            SCENARIOS["step"], duration_s=3 * 3600, feed_forward_curve=curve
+        )
+        self.assertLess(fed.mean_temperature_c, plain.mean_temperature_c)
+        self.assertGreater(fed.mean_duty, plain.mean_duty)
+
+    def test_no_fan(self):
+        # A set point above the reachable temperature never starts the fan
+        result = closed_loop.simulate(SCENARIOS["idle"], set_point=60)
+        self.assertEqual(0, result.fan_starts)
+        self.assertAlmostEqual(37, result.max_temperature_c, delta=0.1)
+
+
+class TestSettings(unittest.TestCase):
+
+    def test_match_code_py(self):
+        settings = code_py_settings()
+        self.assertEqual(settings["Kp"], closed_loop.KP)
+        self.assertEqual(settings["Ki"], closed_loop.KI)
+        for name in (
+            "SET_POINT_DEGREES_C",
+            "DUTY_UP_PER_SECOND",
+            "DUTY_DOWN_PER_SECOND",
+            "DUTY_DEAD_BAND",
+            "FAN_MIN_ON_SECONDS",
+            "FAN_MIN_OFF_SECONDS",
+            "FAN_RESTART_OUTPUT",
+            "CONTROL_SECONDS",
+            "TELEMETRY_SECONDS",
+            "NUM_TEMP_SAMPLES",
+        ):
+            self.assertEqual(settings[name], getattr(closed_loop, name), name)
+        self.assertEqual(settings["TELEMETRY_SECONDS"], traces.DATA_INTERVAL_SECONDS)
+        # code.py applies the fan output on every control update
+        self.assertNotIn("HYSTERESIS_SECONDS", settings)
+        self.assertEqual(0, closed_loop.HYSTERESIS_SECONDS)
+
+
+if __name__ == "__main__":
+    unittest.main()